@@ -8,4 +8,8 @@ __all__ = ['extern', 'errors', 'utils', 'loaders', 'writers', 'parsers', 'fixers
 from . import *
 
 from .ftp_client import *
+from .ledger import *
+from .matching import *
+from .parser_cache import *
 from .pmc_tables import *
+from .ingestion import *
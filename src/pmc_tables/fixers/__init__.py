@@ -1,9 +1,13 @@
 import logging
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
 
 import pandas as pd
 
 import pmc_tables
 
+from ._common import fixer
 from ._errors import _CouldNotApplyFixError, _FixDoesNotApplyError
 from .column_dtypes import fix_column_dtypes
 from .column_names import fix_column_names
@@ -14,35 +18,141 @@ logger = logging.getLogger(__name__)
 
 HDF5_WRITER_EXCEPTIONS = (Exception)
 
+#: Outcomes of `write_hdf5_table_with_fixes` calls which were not given a `stats` counter
+write_stats: Counter = Counter()
 
-def fix_and_write_hdf5_table(key: str, df: pd.DataFrame, store: pd.HDFStore, info: dict) -> None:
+#: Fixers applied to every DataFrame (``'default'``), and fixers applied only when an error
+#: is predicted or encountered (``'error'``), in the order in which they are applied
+FIXER_REGISTRY: Dict[str, List[Callable]] = {
+    'default': [fix_column_names, fix_subsections],
+    'error': [fix_extra_headers_and_footers, fix_column_dtypes, fix_column_names],
+}
+
+#: Number of times each fixer was skipped (``num_skipped``), called (``num_invocations``),
+#: applied (``num_applications``), did not apply (``num_not_applicable``) or failed
+#: (``num_failures``), and the time spent in it (``time``), keyed by ``(fixer_name, stat)``
+fixer_stats: Counter = Counter()
+
+
+def fix_and_write_hdf5_table(key: str, df: pd.DataFrame, store: pd.HDFStore,
+                             info: dict) -> pd.DataFrame:
+    df = fix_table(df, info)
+    return write_hdf5_table_with_fixes(key, df, store, info)
+
+
+def fix_table(df: pd.DataFrame, info: dict) -> pd.DataFrame:
+    """Apply fixes which do not require access to the HDF5 store.
+
+    If `df` is not expected to be serializable by PyTables, `error_fixers` are applied as well,
+    so that `write_hdf5_table_with_fixes` does not have to fail a write first. The predicted
+    error is recorded in ``info['predicted_error']``.
+    """
     # Easy fixes
     df = _apply_fixes(df, info, default_fixers)
+    # More involved fixes
+    predicted_error = get_hdf5_serialization_error(df)
+    if predicted_error is not None:
+        logger.debug("Predicted error `%s`", predicted_error)
+        info['predicted_error'] = predicted_error
+        df = _apply_fixes(df, info, error_fixers)
+    return df
+
+
+def get_hdf5_serialization_error(df: pd.DataFrame) -> Optional[str]:
+    """Return the error that writing `df` with PyTables is expected to raise, if any.
+
+    Uses the same rules as ``HDFStore.put``: column names have to be strings, and object columns
+    may contain only strings and missing values.
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        return "Cannot serialize MultiIndex columns"
+    for column in df.columns:
+        if not isinstance(column, str):
+            return f"Cannot serialize the column name [{column!r}] because it is not a string"
+    for i, dtype in enumerate(df.dtypes):
+        if dtype != object:
+            continue
+        values = df.iloc[:, i].values
+        inferred_type = pd.api.types.infer_dtype(values[pd.notnull(values)], skipna=False)
+        if inferred_type not in ['string', 'empty']:
+            return (f"Cannot serialize the column [{df.columns[i]}] because\n"
+                    f"its data contents are [{inferred_type}] object dtype")
+    return None
+
+
+def write_hdf5_table_with_fixes(key: str, df: pd.DataFrame, store: pd.HDFStore, info: dict,
+                                stats: Optional[Counter] = None) -> pd.DataFrame:
+    """Write `df` into `store`, applying `error_fixers` if the first attempt fails.
+
+    Tables processed by `fix_table` are usually written on the first attempt.
+
+    Args:
+        key: Key of the table in `store`.
+        df: DataFrame to be written.
+        store: Output HDF5 file.
+        info: Info dictionary of the table, which is updated with the errors encountered.
+        stats: Counter which is updated with the number of writes (``num_writes``),
+            failed writes (``num_failed_writes``) and failed writes which were avoided
+            by `fix_table` (``num_writes_avoided``, i.e. tables for which `fix_table` predicted
+            an error and which were written on the first attempt). Defaults to `write_stats`.
+
+    Returns:
+        The DataFrame that was written.
+    """
+    if stats is None:
+        stats = write_stats
     try:
-        return pmc_tables.writers.write_hdf5_table(key, df, store)  # type: ignore
+        stats['num_writes'] += 1
+        pmc_tables.writers.write_hdf5_table(key, df, store)  # type: ignore
+        if 'predicted_error' in info:
+            stats['num_writes_avoided'] += 1
+        return df
     except HDF5_WRITER_EXCEPTIONS as e:
+        stats['num_failed_writes'] += 1
         logger.warning("Encountered error `%s`", e)
         info['error_message'] = str(e)
     # More involved fixes
     df = _apply_fixes(df, info, error_fixers)
     try:
-        return pmc_tables.writers.write_hdf5_table(key, df, store)  # type: ignore
+        stats['num_writes'] += 1
+        pmc_tables.writers.write_hdf5_table(key, df, store)  # type: ignore
+        return df
     except HDF5_WRITER_EXCEPTIONS as e2:
+        stats['num_failed_writes'] += 1
         info['error_message_2'] = str(e2)
         raise e2
 
 
+def register_fixer(stage: str, fixer_fn: Callable, position: Optional[int] = None) -> None:
+    """Add a fixer to `FIXER_REGISTRY`.
+
+    Args:
+        stage: ``'default'`` or ``'error'``.
+        fixer_fn: Fixer function, optionally decorated with `fixer`.
+        position: Position of the fixer in the stage. Defaults to the end.
+    """
+    fixer_fns = FIXER_REGISTRY[stage]
+    fixer_fns.insert(len(fixer_fns) if position is None else position, fixer_fn)
+
+
 def default_fixers():
     """These fixers are applied to every DataFrame."""
-    yield fix_column_names
-    yield fix_subsections
+    yield from FIXER_REGISTRY['default']
 
 
 def error_fixers():
-    """These fixers are applied only when an error is encountered."""
-    yield fix_extra_headers_and_footers
-    yield fix_column_dtypes
-    yield fix_column_names
+    """These fixers are applied only when an error is predicted or encountered."""
+    yield from FIXER_REGISTRY['error']
+
+
+def get_fixer_summary(stats: Optional[Counter] = None) -> Dict[str, Dict[str, float]]:
+    """Return `fixer_stats` (or `stats`) as a dictionary of statistics for every fixer."""
+    if stats is None:
+        stats = fixer_stats
+    summary: Dict[str, Dict[str, float]] = {}
+    for (fixer_name, stat), value in sorted(stats.items()):
+        summary.setdefault(fixer_name, {})[stat] = value
+    return summary
 
 
 def _apply_fixes(df, info, fixer_fns):
@@ -50,12 +160,23 @@ def _apply_fixes(df, info, fixer_fns):
         info['fixers_applied'] = []
 
     for fixer_fn in fixer_fns():
+        name = fixer_fn.__name__
+        applies = getattr(fixer_fn, 'applies', None)
+        if applies is not None and not applies(df, info):
+            fixer_stats[(name, 'num_skipped')] += 1
+            continue
+        fixer_stats[(name, 'num_invocations')] += 1
+        start_time = time.perf_counter()
         try:
-            df = fixer_fn(df.copy(), info)
-            info['fixers_applied'] += [fixer_fn.__name__]
+            df = fixer_fn(df.copy() if getattr(fixer_fn, 'mutates', True) else df, info)
+            info['fixers_applied'] += [name]
+            fixer_stats[(name, 'num_applications')] += 1
         except _FixDoesNotApplyError:
-            continue
+            fixer_stats[(name, 'num_not_applicable')] += 1
         except _CouldNotApplyFixError as e2:
-            logger.debug("Could not apply fix `%s` because of an error. (%s: %s)")
-            continue
+            logger.debug("Could not apply fix `%s` because of an error. (%s: %s)", name,
+                         type(e2), e2)
+            fixer_stats[(name, 'num_failures')] += 1
+        finally:
+            fixer_stats[(name, 'time')] += time.perf_counter() - start_time
     return df
@@ -0,0 +1,31 @@
+import functools
+from typing import Callable, Optional
+
+import pandas as pd
+
+FixerPredicate = Callable[[pd.DataFrame, dict], bool]
+
+
+def fixer(fn: Optional[Callable] = None, *, applies: Optional[FixerPredicate] = None,
+          mutates: bool = True):
+    """Decorator for fixer functions.
+
+    Fixers accept a DataFrame and the info dictionary of the table, and return the fixed
+    DataFrame, or raise `_FixDoesNotApplyError` / `_CouldNotApplyFixError`.
+
+    Args:
+        fn: The fixer function.
+        applies: Function ``applies(df, info)`` which is called before the fixer.
+            If it returns ``False``, the fixer is skipped without copying the DataFrame.
+        mutates: Whether the fixer modifies the DataFrame it is given, in which case
+            it is given a copy.
+    """
+    if fn is None:
+        return functools.partial(fixer, applies=applies, mutates=mutates)
+    fn.applies = applies  # type: ignore
+    fn.mutates = mutates  # type: ignore
+    return fn
+
+
+def has_object_columns(df: pd.DataFrame, info: dict) -> bool:
+    return bool((df.dtypes == object).any())
@@ -1,25 +1,110 @@
 import logging
-from typing import List
+import re
+from typing import List, Optional
 
+import numpy as np
 import pandas as pd
 
+from ._common import fixer, has_object_columns
+
 logger = logging.getLogger(__name__)
 
+#: Values which are treated as missing in numeric columns (compared in lowercase)
+NA_VALUES = {'', '-', '--', '\u2013', '\u2014', 'na', 'n/a', 'nan', 'nd', 'n.d.', 'none', 'null'}
+
+_MINUS_SIGNS = str.maketrans({c: '-' for c in '\u2012\u2013\u2212\ufe63\uff0d'})
+_THOUSANDS_RE = re.compile(r'[-+]?\d{1,3}([,\u2009\u202f ]\d{3})+(\.\d*)?$')
+_THOUSANDS_SEPARATORS_RE = re.compile(r'[,\u2009\u202f ]')
+_TIMES_TEN_RE = re.compile(r'([-+]?(?:\d+\.?\d*|\.\d+))\s*[\u00d7xX*]\s*10\^?\s*([-+]?\d+)$')
+_NUMBER_RE = re.compile(r'[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$')
+_NUM_SAMPLE_VALUES = 20
+
 
+@fixer(applies=has_object_columns, mutates=False)
 def fix_column_dtypes(df: pd.DataFrame, info: dict) -> pd.DataFrame:
     df = _format_mixed_columns(df)
     return df
 
 
 def _format_mixed_columns(df: pd.DataFrame, columns: List[str] = None):
-    if columns is None:
-        columns = list(df.columns)
-    for c in columns:
-        if all(isinstance(v, int) for v in df[c].values):
-            df[c] = df[c].astype(int)
-        elif all(isinstance(v, (int, float, type(None))) for v in df[c].values):
-            df[c] = df[c].astype(float)
+    """Convert columns to numbers where possible, and to strings otherwise."""
+    data = {}
+    for i, c in enumerate(df.columns):
+        values = df.iloc[:, i]
+        if columns is not None and c not in columns:
+            data[i] = values
+            continue
+        numbers = _to_numeric(values)
+        if numbers is not None:
+            data[i] = numbers
         else:
-            logger.debug("Converting column `%s` with values `%s` to `str`.", c, df[c].values[:10])
-            df[c] = df[c].astype(str)
-    return df
+            logger.debug("Converting column `%s` with values `%s` to `str`.", c, values.values[:10])
+            data[i] = values.astype(str)
+    df_fixed = pd.DataFrame(data, index=df.index, columns=list(data))
+    df_fixed.columns = df.columns
+    return df_fixed
+
+
+def _to_numeric(values: pd.Series) -> Optional[pd.Series]:
+    """Convert `values` to numbers, returning ``None`` if some values are not numbers.
+
+    Strings are parsed using `parse_number`, so the common ways of writing numbers
+    in PMC tables are recognized.
+    """
+    if values.dtype.kind in 'biuf':
+        return values
+    inferred_dtype = pd.api.types.infer_dtype(values, skipna=True)
+    if inferred_dtype == 'boolean':
+        return values.astype(bool) if values.notnull().all() else None
+    if inferred_dtype in ['integer', 'floating', 'mixed-integer-float', 'empty']:
+        return pd.to_numeric(values)
+    if inferred_dtype not in ['string', 'mixed', 'mixed-integer']:
+        return None
+    # Coercing text is slow, so text columns are detected from the first few values
+    for value in values.values[:_NUM_SAMPLE_VALUES]:
+        if isinstance(value, str) and parse_number(value) is None:
+            return None
+    numbers = pd.to_numeric(values, errors='coerce')
+    is_failed = (numbers.isnull() & values.notnull()).values
+    if not is_failed.any():
+        return numbers
+    # Only values which `pd.to_numeric` could not parse have to be normalized
+    failed_values = values[is_failed]
+    normalized = {}
+    for value in pd.unique(failed_values.values):
+        number = parse_number(value) if isinstance(value, str) else None
+        if number is None:
+            return None
+        normalized[value] = number
+    values = values.astype(object)
+    values[is_failed] = failed_values.map(normalized).values
+    numbers = pd.to_numeric(values)
+    if numbers.isnull().all():
+        return None
+    return numbers
+
+
+def parse_number(value: str):
+    """Normalize a string representing a number, so that it can be parsed by `pd.to_numeric`.
+
+    Recognizes unicode minus signs, percentages, thousands separators and scientific notation
+    written as e.g. ``1.2 × 10-5``.
+
+    Returns:
+        The normalized string, ``np.nan`` if `value` represents a missing value,
+        or ``None`` if `value` is not a number.
+    """
+    value = value.strip()
+    if value.lower() in NA_VALUES:
+        return np.nan
+    value = value.translate(_MINUS_SIGNS)
+    if value.endswith('%'):
+        value = value[:-1].rstrip()
+    if _THOUSANDS_RE.match(value):
+        value = _THOUSANDS_SEPARATORS_RE.sub('', value)
+    match = _TIMES_TEN_RE.match(value)
+    if match:
+        value = f'{match.group(1)}e{match.group(2)}'
+    if not _NUMBER_RE.match(value):
+        return None
+    return value
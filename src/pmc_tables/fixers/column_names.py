@@ -1,22 +1,26 @@
-from typing import List
+from typing import Dict, List, Set
 
 import pandas as pd
 
+from ._common import fixer
 
+
+def _has_bad_column_names(df: pd.DataFrame, info: dict) -> bool:
+    return (not all(isinstance(c, str) and not c.startswith('Unnamed:') for c in df.columns)
+            or not df.columns.is_unique)
+
+
+@fixer(applies=_has_bad_column_names, mutates=True)
 def fix_column_names(df: pd.DataFrame, info: dict) -> pd.DataFrame:
     """Format all column names as strings."""
     new_columns: List[str] = []
-    for column_idx, column in enumerate(df.columns):
+    renamer = _DuplicateRenamer()
+    for column in df.columns:
         if isinstance(column, (list, tuple)):
-            new_column = ''
-            for col in column:
-                new_col = _format_column(col)
-                if new_col and pd.notnull(new_col):
-                    new_column = new_column + (' | ' if new_column else '') + new_col
+            new_column = ' | '.join(new_col for new_col in map(_format_column, column) if new_col)
         else:
             new_column = _format_column(column)
-        new_column = _rename_duplicate(new_column, new_columns)
-        new_columns.append(new_column)
+        new_columns.append(renamer.rename(new_column))
     df.columns = new_columns
     assert all(isinstance(c, str) for c in df.columns), df.columns
     return df
@@ -30,10 +34,24 @@ def _format_column(col: object) -> str:
         return col
 
 
-def _rename_duplicate(column: str, prev_columns: List[str]) -> str:
-    column_ref = column
-    idx = 0
-    while column in prev_columns:
-        idx += 1
-        column = f'{column_ref}_{idx}'
-    return column
+class _DuplicateRenamer:
+    """Rename duplicate columns by adding the smallest free suffix ``_1``, ``_2``, ...
+
+    Keeps track of the names that are taken, and of the last suffix used for every name,
+    so that renaming ``n`` columns takes ``O(n)`` time.
+    """
+
+    def __init__(self) -> None:
+        self.columns: Set[str] = set()
+        self._last_idxs: Dict[str, int] = {}
+
+    def rename(self, column: str) -> str:
+        column_ref = column
+        # Names are never released, so the first free suffix never decreases
+        idx = self._last_idxs.get(column_ref, 0)
+        while column in self.columns:
+            idx += 1
+            column = f'{column_ref}_{idx}'
+        self._last_idxs[column_ref] = idx
+        self.columns.add(column)
+        return column
@@ -1,20 +1,33 @@
 import logging
-from collections import Counter
-from typing import Tuple
+import re
+from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+from ._common import fixer, has_object_columns
 from ._errors import _FixDoesNotApplyError
 
 logger = logging.getLogger(__name__)
 
+# Footnote markers: lowercase letters, asterisks, daggers and similar symbols
+_FOOTNOTE_RE = re.compile(r'\s*(\*+|[\u2020\u2021\u00a7\u00b6#]|[a-z](?=[\s.),:]|[A-Z]))')
 
+_get_type = np.frompyfunc(type, 1, 1)
+
+
+@fixer(applies=has_object_columns, mutates=False)
 def fix_extra_headers_and_footers(df: pd.DataFrame, info: dict) -> pd.DataFrame:
     """Fix cases where the first / last row(s) in a DataFrame are actually headers / footers.
 
+    Headers and footers are detected in tables with mixed (i.e. not entirely string) columns,
+    in which the rows at the top and at the bottom are not numbers. Footnote rows
+    (e.g. ``"a Adjusted for age"`` or ``"* p < 0.05"``) at the bottom of the table are
+    always treated as footers.
+
     Args:
         df: DataFrame to be fixed.
-        info: Dictionary containing the error message encountered when trying to save `df`.
+        info: Dictionary containing information about `df`.
 
     Returns:
         Fixed DataFrame.
@@ -22,65 +35,107 @@ def fix_extra_headers_and_footers(df: pd.DataFrame, info: dict) -> pd.DataFrame:
     Raises:
         _FixDoesNotApplyError
     """
-    error_message = info.get('error_message', '')
-    if not error_message.startswith("Cannot serialize the column"):
-        raise _FixDoesNotApplyError(f"Unsupported error message: {error_message}.")
+    if df.empty:
+        raise _FixDoesNotApplyError("The DataFrame is empty.")
     # Get a mask for mixed columns
     is_number_mask = _get_is_number_mask(df)
-    # Make sure at least 90% of mixed columns are numbers
-    _check_mostly_numbers(is_number_mask)
+    if is_number_mask is None:
+        raise _FixDoesNotApplyError("The DataFrame does not have mixed columns.")
+    is_footnote_mask = _get_is_footnote_mask(df)
+    # Make sure at least 90% of mixed columns are numbers (not counting footnotes)
+    _check_mostly_numbers(is_number_mask[~is_footnote_mask])
     # Extract the header and / or the footer
-    header_range, footer_range = _find_header_and_footer(is_number_mask)
-    if header_range:
-        df = _add_rows_to_header(df, header_range)
+    header_range, footer_range = _find_header_and_footer(is_number_mask, is_footnote_mask)
+    # The footer is removed first, because the ranges refer to positions in the original `df`
     if footer_range:
         df = df.drop(df.index[footer_range], axis=0)
+    if header_range:
+        df = _add_rows_to_header(df, header_range)
     return df
 
 
-def _get_is_number_mask(df: pd.DataFrame) -> pd.Series:
-    """Return a boolean Series indicating whether all mixed columns are numbers."""
-    object_columns = df.dtypes[df.dtypes == object].index.tolist()
-    # Mixed columns are all columns taht are not entirely string or null
-    is_string_df = pd.DataFrame(
-        {c: [(isinstance(v, str) or pd.isnull(v)) for v in df[c].values]
-         for c in object_columns},
-        columns=object_columns)
-    is_string_s = is_string_df.all(axis=0)
+def _get_is_number_mask(df: pd.DataFrame) -> Optional[pd.Series]:
+    """Return a boolean Series indicating whether all mixed columns are numbers.
+
+    Returns ``None`` if `df` does not have any mixed columns.
+    """
+    object_idxs = np.flatnonzero((df.dtypes == object).values)
+    values = df.iloc[:, object_idxs].values
+    cell_types = _get_type(values)
+    is_string = pd.isnull(values)
+    is_number = np.zeros(values.shape, dtype=bool)
+    for cell_type in set(cell_types.ravel()):
+        # Wrapped in an array, because NumPy scalar types do not compare with arrays
+        is_type = cell_types == np.array([cell_type], dtype=object)
+        if issubclass(cell_type, str):
+            is_string |= is_type
+        elif issubclass(cell_type, (int, float)):
+            is_number |= is_type
+    # Mixed columns are all columns that are not entirely string or null
+    is_mixed = ~is_string.all(axis=0)
+    if not is_mixed.any():
+        return None
     # Number mask indicates whether all mixed columns in a given row are numbers
-    mixed_columns = is_string_s[~is_string_s].index.tolist()
-    is_number_df = pd.DataFrame(
-        {c: [isinstance(v, (int, float)) for v in df[c].values]
-         for c in object_columns},
-        columns=object_columns)
-    is_number_mask = is_number_df[mixed_columns].all(axis=1)
-    return is_number_mask
+    is_number_mask = is_number[:, is_mixed].all(axis=1)
+    return pd.Series(is_number_mask)
+
+
+def _get_is_footnote_mask(df: pd.DataFrame) -> pd.Series:
+    """Return a boolean Series indicating whether rows are footnotes.
+
+    Footnote rows contain a single value (which may span several columns),
+    starting with a footnote marker.
+    """
+    values = df.values.astype(object)
+    is_notnull = pd.notnull(values)
+    first_values = values[np.arange(len(values)), is_notnull.argmax(axis=1)]
+    is_single_value = ((values == first_values[:, None]) | ~is_notnull).all(axis=1)
+    is_footnote_mask = np.zeros(len(values), dtype=bool)
+    for i in np.flatnonzero(is_single_value & is_notnull.any(axis=1)):
+        value = first_values[i]
+        is_footnote_mask[i] = isinstance(value, str) and _FOOTNOTE_RE.match(value) is not None
+    return pd.Series(is_footnote_mask)
 
 
 def _check_mostly_numbers(is_number_mask: pd.Series, cutoff: float = 0.9) -> None:
-    is_number_count = Counter(is_number_mask.values)
-    frac_number = is_number_count[True] / (is_number_count[True] + is_number_count[False])
-    cutoff = min(cutoff, 1 - 1 / len(is_number_count))
+    num_numbers = int(np.count_nonzero(is_number_mask.values))
+    frac_number = num_numbers / len(is_number_mask)
+    num_distinct = int(num_numbers > 0) + int(num_numbers < len(is_number_mask))
+    cutoff = min(cutoff, 1 - 1 / num_distinct)
     if frac_number < cutoff:
         raise _FixDoesNotApplyError(
             f"The fraction of numbers in mixed columns is too low ({frac_number}).")
 
 
-def _find_header_and_footer(is_number_s: pd.Series) -> Tuple[range, range]:
+def _find_header_and_footer(is_number_s: pd.Series, is_footnote_s: Optional[pd.Series] = None
+                            ) -> Tuple[range, range]:
+    """Find the rows above and below the rows which contain numbers.
+
+    Headers and footers (not counting footnotes) may span at most a few rows.
+    """
+    is_data = np.asarray(is_number_s, dtype=bool)
+    if is_footnote_s is not None:
+        is_footnote = np.asarray(is_footnote_s, dtype=bool)
+        is_data = is_data & ~is_footnote
+    else:
+        is_footnote = np.zeros(len(is_data), dtype=bool)
     header_start = 0
     header_stop = None
     footer_start = None
-    footer_stop = len(is_number_s)
-    for i in range(len(is_number_s)):
-        if header_stop is None and is_number_s[i]:
-            header_stop = i
-        elif header_stop is not None and footer_start is None and not is_number_s[i]:
-            footer_start = i
-    max_permissible_offset = min(5, len(is_number_s) // 20 + 1)
+    footer_stop = len(is_data)
+    data_idxs = np.flatnonzero(is_data)
+    if len(data_idxs):
+        header_stop = int(data_idxs[0])
+        non_data_idxs = np.flatnonzero(~is_data[header_stop:])
+        if len(non_data_idxs):
+            footer_start = header_stop + int(non_data_idxs[0])
+    max_permissible_offset = min(5, len(is_data) // 20 + 1)
     if header_stop is None or (header_stop - header_start) > max_permissible_offset:
         header_stop = 0
-    if footer_start is None or (footer_stop - footer_start) > max_permissible_offset:
-        footer_start = len(is_number_s)
+    if footer_start is not None:
+        num_footer_rows = footer_stop - footer_start - np.count_nonzero(is_footnote[footer_start:])
+    if footer_start is None or num_footer_rows > max_permissible_offset:
+        footer_start = len(is_data)
     return range(header_start, header_stop), range(footer_start, footer_stop)
 
 
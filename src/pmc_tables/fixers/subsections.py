@@ -1,30 +1,69 @@
-from collections import Counter
-
+import numpy as np
 import pandas as pd
 
 import pmc_tables
 
+from ._common import fixer
 from ._errors import _FixDoesNotApplyError
 
 
+def _is_xml_table(df: pd.DataFrame, info: dict) -> bool:
+    return info.get('parser_name') == pmc_tables.parsers.xml_parser.__name__
+
+
+@fixer(applies=_is_xml_table, mutates=False)
 def fix_subsections(df: pd.DataFrame, info: dict) -> pd.DataFrame:
-    """Treat rows which contain only a single element as a second index."""
+    """Treat rows which contain only a single element as a second index.
+
+    Consecutive subsection rows are treated as a hierarchy: the last row of a run of ``k``
+    subsection rows is the deepest level, and the run sets the ``k`` deepest levels.
+    The index is stored in the first column(s) of the DataFrame, named ``index_`` if there is
+    a single level, or ``index_0``, ``index_1``, ... otherwise.
+    """
     applicable_parsers = [pmc_tables.parsers.xml_parser.__name__]
     if info['parser_name'] not in applicable_parsers:
         raise _FixDoesNotApplyError(f"This fix only applies to parsers {applicable_parsers}.")
-    index_ = []
-    keep_index = []
-    for i, row in enumerate(df.itertuples()):
-        row_items = Counter(v for v in row[1:] if pd.notnull(v))
-        if len(row_items) == 1 and row_items.most_common()[0][1] > 1:
-            index_.append(row_items.most_common()[0][0])
-        elif i > 0:
-            assert index_
-            index_.append(index_[-1])
-            keep_index.append(row.Index)
-        else:
-            return df
-    df['index_'] = index_
-    new_columns = ['index_'] + [c for c in df.columns if c != 'index_']
-    df = df.reindex(index=keep_index, columns=new_columns)
-    return df
+    if df.empty:
+        return df
+    is_subsection, labels = _find_subsection_rows(df)
+    if not is_subsection[0]:
+        return df
+    levels = _get_subsection_levels(is_subsection)
+    num_levels = levels.max() + 1
+    data_idxs = np.flatnonzero(~is_subsection)
+    df = df.iloc[data_idxs]
+    index_columns = []
+    for level in range(num_levels):
+        level_labels = pd.Series(np.where(levels == level, labels, None), dtype=object).ffill()
+        # Infer the dtype from all labels
+        index_column = pd.Series(level_labels.tolist()).iloc[data_idxs]
+        index_column.index = df.index
+        index_column.name = 'index_' if num_levels == 1 else f'index_{level}'
+        index_columns.append(index_column)
+    return pd.concat(index_columns + [df], axis=1)
+
+
+def _find_subsection_rows(df: pd.DataFrame):
+    """Find rows in which all non-null values are the same, and there is more than one.
+
+    Returns:
+        A boolean mask of subsection rows, and the first non-null value of every row.
+    """
+    values = df.values.astype(object)
+    is_notnull = pd.notnull(values)
+    first_values = values[np.arange(len(values)), is_notnull.argmax(axis=1)]
+    is_same = (values == first_values[:, None]) | ~is_notnull
+    is_subsection = is_same.all(axis=1) & (is_notnull.sum(axis=1) > 1)
+    return is_subsection, first_values
+
+
+def _get_subsection_levels(is_subsection: np.ndarray) -> np.ndarray:
+    """Return the level of every subsection row, and ``-1`` for all other rows."""
+    idxs = np.flatnonzero(is_subsection)
+    is_run_start = np.r_[True, np.diff(idxs) > 1]
+    run_ids = np.cumsum(is_run_start) - 1
+    run_ends = np.r_[np.flatnonzero(is_run_start)[1:] - 1, len(idxs) - 1]
+    depths = run_ends[run_ids] - np.arange(len(idxs))
+    levels = np.full(len(is_subsection), -1)
+    levels[idxs] = depths.max() - depths
+    return levels
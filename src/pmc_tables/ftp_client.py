@@ -1,4 +1,12 @@
+import contextlib
+import ftplib
+import logging
+import queue
+import threading
 from ftplib import FTP
+from typing import BinaryIO, Iterator
+
+logger = logging.getLogger(__name__)
 
 NCBI_FTP_URL = 'ftp://ftp.ncbi.nlm.nih.gov'
 EBI_FTP_URL = 'ftp.ebi.ac.uk'
@@ -16,3 +24,93 @@ def get_ftp_client(host: str) -> FTP:
         ftp = FTP(EBI_FTP_URL)
         ftp.login()
     return ftp
+
+
+class FTPConnectionPool:
+    """Pool of persistent, logged-in FTP connections to a single server.
+
+    Connections are opened lazily, up to `size` at a time, and are returned to the pool
+    after use so that they can be reused for subsequent downloads. A connection which
+    raises a transport or protocol error is closed and discarded, while connections which
+    only received an error reply from the server (e.g. ``550 No such file``) are reused.
+
+    Args:
+        host: Host name of the FTP server.
+        port: Port of the FTP server.
+        user: User name used to log in.
+        passwd: Password used to log in.
+        size: Maximum number of simultaneous connections.
+        timeout: Timeout (in seconds) for blocking operations on each connection.
+    """
+
+    def __init__(self, host: str, port: int = 21, user: str = 'anonymous',
+                 passwd: str = 'anonymous', size: int = 4, timeout: float = 60) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.passwd = passwd
+        self.size = size
+        self.timeout = timeout
+        self.num_connects = 0
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._semaphore = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'FTPConnectionPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[FTP]:
+        """Borrow a connection from the pool, blocking if all connections are in use."""
+        with self._semaphore:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                ftp = self._connect()
+            try:
+                yield ftp
+            except (ftplib.error_perm, ftplib.error_temp):
+                # The server rejected the command, but the connection is still usable
+                self._idle.put(ftp)
+                raise
+            except BaseException:
+                _close_quietly(ftp)
+                raise
+            self._idle.put(ftp)
+
+    def retrieve(self, path: str, fout: BinaryIO) -> None:
+        """Download the file at `path` on the server into `fout`."""
+        with self.connection() as ftp:
+            ftp.retrbinary(f'RETR {path}', fout.write)
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        while True:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            _close_quietly(ftp, quit=True)
+
+    def _connect(self) -> FTP:
+        logger.debug("Opening a new FTP connection to %s:%s.", self.host, self.port)
+        ftp = FTP(timeout=self.timeout)
+        ftp.connect(self.host, self.port)
+        ftp.login(self.user, self.passwd)
+        with self._lock:
+            self.num_connects += 1
+        return ftp
+
+
+def _close_quietly(ftp: FTP, quit: bool = False) -> None:
+    try:
+        if quit:
+            ftp.quit()
+        else:
+            ftp.close()
+    except ftplib.all_errors as e:
+        logger.debug("Error closing FTP connection (%s: %s).", type(e), e)
+        ftp.close()
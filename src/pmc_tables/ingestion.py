@@ -0,0 +1,394 @@
+"""
+Parallel Ingestion
+------------------
+
+Save many PMC archives into a single HDF5 file using a pool of worker processes.
+
+Parsing and fixing tables, and compressing their raw markup, is CPU-bound and is done by the
+worker processes. A single writer process owns the HDF5 file and serializes all writes to it,
+since PyTables does not support concurrent writers. Both queues are bounded,
+so that fast workers cannot run too far ahead of the writer.
+"""
+import logging
+import multiprocessing as mp
+import os
+import queue
+import time
+import zipfile
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+import pmc_tables
+from pmc_tables.ledger import DEFAULT_SKIP_LIST, IngestionLedger, get_archive_hash, get_ledger_file
+from pmc_tables.parser_cache import ParserCache
+from pmc_tables.pmc_tables import _node_exists
+
+logger = logging.getLogger(__name__)
+
+_STOP = None
+
+# Time (in seconds) to wait for processes to exit before terminating them
+_JOIN_TIMEOUT = 60
+
+
+class _Result(NamedTuple):
+    archive_file: str
+    info: Optional[dict]
+    tables: Optional[list]
+    content_hash: Optional[str]
+    runtime: float
+    error: Optional[str]
+    fixer_stats: Counter
+    # Compression dictionaries trained by the worker, used by the blobs in `tables`
+    dictionaries: Dict[int, bytes]
+
+
+def save_archives_to_hdf5(archive_files: Iterable[Union[str, Path]],
+                          hdf5_file: Union[str, Path],
+                          num_workers: Optional[int] = None,
+                          max_queue_size: Optional[int] = None,
+                          swallow_errors: bool = True,
+                          use_ledger: bool = True,
+                          num_shards: Optional[int] = None,
+                          store_format: str = 'hdf5',
+                          store_kwargs: Optional[dict] = None,
+                          sink_factories: Sequence[Callable] = (),
+                          use_blob_store: bool = True,
+                          parser_cache_dir: Optional[Union[str, Path]] = None,
+                          commit_interval: int = 1000,
+                          compact_sinks: bool = True) -> dict:
+    """Save tables from many ZIP archives into an HDF5 file using multiple processes.
+
+    Args:
+        archive_files: Locations of ZIP archives created by `loaders.get_pmc_archive`.
+        hdf5_file: Location of the output HDF5 file. The file is opened in append mode.
+            If `num_shards` is provided, this is the directory of a `writers.ShardedHDFStore`.
+            If `store_format` is ``'parquet'``, this is the directory of a `writers.ParquetStore`.
+        num_workers: Number of processes used to parse and fix tables.
+            Defaults to the number of CPUs.
+        max_queue_size: Maximum number of archives waiting to be parsed
+            and the maximum number of parsed archives waiting to be written.
+            Defaults to ``4 * num_workers``.
+        swallow_errors: If ``False``, abort ingestion on the first error.
+        use_ledger: Keep track of finished archives in an `IngestionLedger` stored next to
+            `hdf5_file`, so that an interrupted ingestion can be resumed.
+        num_shards: Write into a `writers.ShardedHDFStore` with this many shards.
+        store_format: Format of the output (``'hdf5'`` or ``'parquet'``).
+        store_kwargs: Extra arguments passed to `pd.HDFStore` (e.g. ``complib``),
+            or to `writers.ParquetStore`.
+        sink_factories: Picklable callables (e.g. ``functools.partial(TableCatalog, path)``)
+            which are called in the writer process to create the `sinks` that are passed to
+            `write_archive_tables`. Sinks are flushed on every commit, and closed when
+            ingestion finishes.
+        use_blob_store: Store the raw markup of tables in a `writers.TableBlobStore` next to
+            `hdf5_file`, instead of in the metadata of every table.
+        parser_cache_dir: Directory of a `ParserCache` shared by the worker processes,
+            so that files which have been parsed before are not parsed again.
+        commit_interval: Number of archives written between commits. On every commit,
+            the store and the sinks are flushed, and the archives written since the previous
+            commit are marked as finished in the ledger together. Archives which were written
+            but not committed before a crash are written again on restart. Every commit adds
+            new files to the sinks, so larger intervals leave fewer, larger files.
+        compact_sinks: Once all archives have been written, call the ``compact`` method of
+            the sinks which have one (e.g. `writers.CellTableWriter`), merging the files added
+            by every commit.
+
+    Returns:
+        A dictionary summarizing the ingestion, including the table write statistics
+        collected by `fixers.write_hdf5_table_with_fixes`, and the statistics of every fixer
+        under ``'fixers'`` (see `fixers.get_fixer_summary`).
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if max_queue_size is None:
+        max_queue_size = 4 * num_workers
+
+    ledger_file = get_ledger_file(hdf5_file).as_posix() if use_ledger else None
+    blob_store_file = (pmc_tables.writers.get_blob_store_file(hdf5_file).as_posix()
+                       if use_blob_store else None)
+    if ledger_file is not None:
+        with IngestionLedger(ledger_file) as ledger:
+            completed_archive_files = ledger.completed_archive_files()
+            skip_list = ledger.get_skip_list()
+    else:
+        completed_archive_files = {}
+        skip_list = DEFAULT_SKIP_LIST
+    blob_dictionary = None
+    if blob_store_file is not None and Path(blob_store_file).is_file():
+        with pmc_tables.writers.TableBlobStore(blob_store_file) as blob_store:
+            blob_dictionary = blob_store.get_dictionary()
+
+    ctx = mp.get_context()
+    task_queue = ctx.Queue(max_queue_size)
+    result_queue = ctx.Queue(max_queue_size)
+    summary_queue = ctx.Queue()
+
+    writer = ctx.Process(
+        target=_writer,
+        args=(Path(hdf5_file).as_posix(), num_shards, store_format, ledger_file, result_queue,
+              summary_queue, num_workers, swallow_errors, store_kwargs or {}, sink_factories,
+              blob_store_file, commit_interval, compact_sinks),
+        name='pmc_tables-writer')
+    workers = [
+        ctx.Process(
+            target=_worker,
+            args=(task_queue, result_queue, skip_list, ledger_file is not None, swallow_errors,
+                  Path(parser_cache_dir).as_posix() if parser_cache_dir is not None else None,
+                  use_blob_store, blob_dictionary),
+            name=f'pmc_tables-worker-{i}') for i in range(num_workers)
+    ]
+    processes = [writer] + workers
+    for process in processes:
+        process.start()
+
+    num_completed = 0
+    try:
+        for archive_file in archive_files:
+            archive_file = Path(archive_file).as_posix()
+            if archive_file in completed_archive_files:
+                num_completed += 1
+                continue
+            _put(task_queue, archive_file, processes)
+        for _ in workers:
+            _put(task_queue, _STOP, processes)
+        summary = _get(summary_queue, processes, writer)
+        if 'fatal_error' in summary:
+            raise RuntimeError(f"Writer process failed: {summary['fatal_error']}")
+    except BaseException:
+        # Workers may be blocked forever on the full result queue if the writer is gone
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        _join(processes)
+
+    summary['num_archives'] = summary.get('num_archives', 0) + num_completed
+    summary['num_skipped'] = summary.get('num_skipped', 0) + num_completed
+    return summary
+
+
+def _worker(task_queue: mp.Queue, result_queue: mp.Queue, skip_list: Dict[str, str],
+            compute_hash: bool, swallow_errors: bool, parser_cache_dir: Optional[str],
+            use_blob_store: bool, blob_dictionary: Optional[Tuple[int, bytes]]) -> None:
+    """Parse and fix archives from `task_queue` and send the results to `result_queue`.
+
+    The raw markup of the tables is compressed for the blob store of the writer if
+    `use_blob_store` is ``True`` (see `writers.compress_table_html`).
+    """
+    parser_cache = ParserCache(parser_cache_dir) if parser_cache_dir is not None else None
+    compressor = (pmc_tables.writers.BlobCompressor(dictionary=blob_dictionary)
+                  if use_blob_store else None)
+    fixer_stats = pmc_tables.fixers.fixer_stats
+    fixer_stats.clear()
+    try:
+        while True:
+            archive_file = task_queue.get()
+            if archive_file is _STOP:
+                break
+            start_time = time.perf_counter()
+            error = None
+            try:
+                info, tables, content_hash = _extract_archive(
+                    archive_file, skip_list, compute_hash, swallow_errors, parser_cache)
+                for _, table_info, _ in tables or []:
+                    pmc_tables.writers.compress_table_html(table_info, compressor)
+            except Exception as e:
+                logger.error("Failed to process archive `%s` (%s: %s).", archive_file,
+                             type(e), e)
+                info, tables, content_hash, error = None, None, None, f"{type(e)}: {e}"
+            runtime = time.perf_counter() - start_time
+            dictionaries = compressor.pop_dictionaries() if compressor is not None else {}
+            result_queue.put(
+                _Result(archive_file, info, tables, content_hash, runtime, error,
+                        Counter(fixer_stats), dictionaries))
+            fixer_stats.clear()
+    finally:
+        if parser_cache is not None:
+            parser_cache.close()
+    result_queue.put(_STOP)
+
+
+def _extract_archive(archive_file: str, skip_list: Dict[str, str], compute_hash: bool,
+                     swallow_errors: bool, parser_cache: Optional[ParserCache]):
+    with zipfile.ZipFile(archive_file) as archive:
+        info = pmc_tables.read_archive_info(archive)
+        content_hash = get_archive_hash(archive) if compute_hash else None
+        if info['pmc_id'] in skip_list:
+            logger.info("Skipping PMC ID `%s` found in the skip list...", info['pmc_id'])
+            return info, None, content_hash
+        tables = pmc_tables.extract_archive_tables(archive, info, swallow_errors, parser_cache)
+    return info, tables, content_hash
+
+
+def _writer(hdf5_file: str, num_shards: Optional[int], store_format: str,
+            ledger_file: Optional[str], result_queue: mp.Queue, summary_queue: mp.Queue,
+            num_workers: int, swallow_errors: bool, store_kwargs: dict,
+            sink_factories: Sequence[Callable], blob_store_file: Optional[str],
+            commit_interval: int, compact_sinks: bool) -> None:
+    """Write results produced by the workers into `hdf5_file`.
+
+    Runs until every worker has signalled that it is done.
+    """
+    counts: Counter = Counter()
+    fixer_stats = pmc_tables.fixers.fixer_stats
+    fixer_stats.clear()
+    failed_archives: List[str] = []
+    ledger = IngestionLedger(ledger_file) if ledger_file is not None else None
+    blob_store = (pmc_tables.writers.TableBlobStore(blob_store_file)
+                  if blob_store_file is not None else None)
+    sinks: list = []
+    # (pmc_id, status, runtime) of the archives written since the last commit
+    uncommitted: List[Tuple[str, str, float]] = []
+    try:
+        sinks = [sink_factory() for sink_factory in sink_factories]
+        with _open_store(hdf5_file, num_shards, store_format, store_kwargs) as store:
+            num_running = num_workers
+            while num_running:
+                result = result_queue.get()
+                if result is _STOP:
+                    num_running -= 1
+                    continue
+                counts['num_archives'] += 1
+                fixer_stats.update(result.fixer_stats)
+                # Later results of the same worker may use the dictionaries
+                for dict_id, dict_data in result.dictionaries.items():
+                    blob_store.add_dictionary(dict_id, dict_data)
+                if result.error is not None:
+                    counts['num_failed'] += 1
+                    failed_archives.append(result.archive_file)
+                    if not swallow_errors:
+                        raise pmc_tables.errors.MalformedArchiveError(result.error)
+                    continue
+                if _should_skip(result, store, ledger):
+                    logger.info("Skipping PMC id `%s`...", result.info['pmc_id'])
+                    counts['num_skipped'] += 1
+                    continue
+                uncommitted.append(
+                    _write_result(result, store, ledger, swallow_errors, sinks, counts,
+                                  blob_store))
+                counts['num_tables'] += len(result.tables)
+                counts[f"num_{result.info['status']}"] += 1
+                if len(uncommitted) >= commit_interval:
+                    _commit(store, ledger, sinks, uncommitted)
+                    uncommitted = []
+            _commit(store, ledger, sinks, uncommitted)
+        if compact_sinks:
+            for sink in sinks:
+                if hasattr(sink, 'compact'):
+                    sink.compact()
+    except BaseException as e:
+        summary_queue.put({'fatal_error': f"{type(e)}: {e}"})
+        raise
+    finally:
+        for sink in sinks:
+            sink.close()
+        if ledger is not None:
+            ledger.close()
+        if blob_store is not None:
+            blob_store.close()
+    summary_queue.put({
+        **counts, 'failed_archives': failed_archives,
+        'fixers': pmc_tables.fixers.get_fixer_summary(fixer_stats)
+    })
+
+
+def _open_store(hdf5_file: str, num_shards: Optional[int], store_format: str,
+                store_kwargs: dict):
+    if store_format == 'parquet':
+        return pmc_tables.writers.ParquetStore(hdf5_file, **store_kwargs)
+    assert store_format == 'hdf5', store_format
+    if num_shards is not None:
+        return pmc_tables.writers.ShardedHDFStore(hdf5_file, num_shards, **store_kwargs)
+    return pd.HDFStore(hdf5_file, mode='a', **store_kwargs)
+
+
+def _should_skip(result: _Result, store: pd.HDFStore,
+                 ledger: Optional[IngestionLedger]) -> bool:
+    if result.tables is None:
+        return True
+    if ledger is None:
+        return _node_exists(result.info['pmc_id'], store) is not None
+    return ledger.is_completed(result.info['pmc_id'], result.content_hash)
+
+
+def _write_result(result: _Result, store: pd.HDFStore, ledger: Optional[IngestionLedger],
+                  swallow_errors: bool, sinks: list, counts: Counter,
+                  blob_store: Optional['pmc_tables.writers.TableBlobStore']
+                  ) -> Tuple[str, str, float]:
+    """Write `result` into `store`, returning the PMC id, status and runtime of the archive."""
+    pmc_id = result.info['pmc_id']
+    start_time = time.perf_counter()
+    if ledger is None:
+        pmc_tables.write_archive_tables(
+            result.tables, result.info, store, swallow_errors, sinks=sinks, stats=counts,
+            blob_store=blob_store)
+    else:
+        ledger.start(pmc_id, result.archive_file, result.content_hash)
+        try:
+            pmc_tables.write_archive_tables(
+                result.tables, result.info, store, swallow_errors, overwrite=True, sinks=sinks,
+                stats=counts, blob_store=blob_store)
+        except Exception as e:
+            ledger.fail(pmc_id, f"{type(e)}: {e}")
+            raise
+    return pmc_id, result.info['status'], result.runtime + time.perf_counter() - start_time
+
+
+def _commit(store: pd.HDFStore, ledger: Optional[IngestionLedger], sinks: list,
+            archives: List[Tuple[str, str, float]]) -> None:
+    """Make sure that `archives` are on disk, and mark them as finished in the ledger.
+
+    Blobs are committed by `write_archive_tables` already.
+    """
+    if not archives:
+        return
+    store.flush()
+    # Sinks buffer rows in memory, which would be lost for good after a crash
+    for sink in sinks:
+        sink.flush()
+    if ledger is not None:
+        ledger.finish_many(archives)
+
+
+def _put(q: mp.Queue, item, processes: List[mp.Process], timeout: float = 1) -> None:
+    """Put `item` into `q`, making sure that the processes consuming it are still alive."""
+    while True:
+        try:
+            q.put(item, timeout=timeout)
+            return
+        except queue.Full:
+            _check_alive(processes)
+
+
+def _get(q: mp.Queue, processes: List[mp.Process], producer: mp.Process, timeout: float = 1):
+    """Get an item from `q`, making sure that the processes producing it are still alive."""
+    while True:
+        # Check before waiting, so that items sent right before exiting are not lost
+        producer_alive = producer.is_alive()
+        try:
+            return q.get(timeout=timeout)
+        except queue.Empty:
+            _check_alive(processes)
+            if not producer_alive:
+                raise RuntimeError(f"Process {producer.name} exited without sending a result.")
+
+
+def _join(processes: List[mp.Process], timeout: float = _JOIN_TIMEOUT) -> None:
+    """Wait for `processes` to exit, terminating those still running after `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(deadline - time.monotonic(), 0))
+        if process.is_alive():
+            logger.warning("Terminating process %s.", process.name)
+            process.terminate()
+            process.join()
+
+
+def _check_alive(processes: List[mp.Process]) -> None:
+    """Raise an error if any of the `processes` has crashed."""
+    crashed = [p.name for p in processes if p.exitcode not in (None, 0)]
+    if crashed:
+        raise RuntimeError(f"Processes {crashed} exited unexpectedly.")
@@ -0,0 +1,238 @@
+"""
+Ingestion Ledger
+----------------
+
+Keep track of which archives have been saved into an HDF5 file.
+
+The ledger is an SQLite database stored next to the HDF5 file. An archive is marked as
+``started`` before any of its tables are written, and as ``success`` or ``error`` once
+all of its tables and metadata have been written (``error`` meaning that some of its tables
+could not be fixed). Archives which are still ``started`` after a crash, and archives marked
+as ``failed`` because writing them raised an error, have been only partially written,
+and are re-done on restart.
+
+Archives whose tables were also passed to sinks (e.g. `writers.TableCatalog`) can be finished
+with `IngestionLedger.defer_finish`, so that sinks do not have to be flushed after every archive.
+They stay ``started`` until `IngestionLedger.commit` is called, once the sinks have been flushed.
+"""
+import hashlib
+import logging
+import sqlite3
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SKIP_LIST = {
+    'PMC5421321': "Blacklisted",
+}
+
+COMPLETED_STATUSES = ('success', 'error')
+
+FAILED_STATUS = 'failed'
+
+_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS archives (
+    pmc_id TEXT PRIMARY KEY,
+    archive_file TEXT,
+    content_hash TEXT,
+    status TEXT NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    runtime REAL,
+    error_message TEXT
+);
+CREATE INDEX IF NOT EXISTS archives_archive_file ON archives (archive_file);
+CREATE TABLE IF NOT EXISTS pending (
+    pmc_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    runtime REAL
+);
+CREATE TABLE IF NOT EXISTS skip_list (
+    pmc_id TEXT PRIMARY KEY,
+    reason TEXT
+);
+"""
+
+
+def get_ledger_file(hdf5_file: Union[str, Path]) -> Path:
+    """Return the location of the ledger corresponding to `hdf5_file`."""
+    hdf5_file = Path(hdf5_file)
+    return hdf5_file.with_name(hdf5_file.name + '.ledger.sqlite')
+
+
+def get_archive_hash(archive: zipfile.ZipFile) -> str:
+    """Return a hash of the contents of `archive`.
+
+    The hash is calculated from the names, CRCs and sizes of the files in the archive,
+    so the archive does not have to be decompressed.
+    """
+    h = hashlib.sha1()
+    for zip_info in sorted(archive.infolist(), key=lambda zi: zi.filename):
+        h.update(f"{zip_info.filename}\0{zip_info.CRC}\0{zip_info.file_size}\n".encode('utf-8'))
+    return h.hexdigest()
+
+
+class IngestionLedger:
+    """Persistent record of the ingestion status of every archive.
+
+    Args:
+        ledger_file: Location of the SQLite database. Created if it does not exist.
+        skip_list: PMC ids which should never be ingested, mapped to the reason why.
+            Added to the skip list stored in the ledger when the ledger is created.
+    """
+
+    def __init__(self, ledger_file: Union[str, Path],
+                 skip_list: Optional[Dict[str, str]] = None) -> None:
+        self.ledger_file = Path(ledger_file)
+        is_new = not self.ledger_file.is_file()
+        self._conn = sqlite3.connect(self.ledger_file.as_posix())
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            # Archives which were not committed before a crash are written again
+            self._conn.execute('DELETE FROM pending')
+        if is_new:
+            skip_list = {**DEFAULT_SKIP_LIST, **(skip_list or {})}
+        for pmc_id, reason in (skip_list or {}).items():
+            self.add_to_skip_list(pmc_id, reason)
+
+    def __enter__(self) -> 'IngestionLedger':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # === Archives ===
+
+    def get_status(self, pmc_id: str) -> Optional[str]:
+        row = self._conn.execute('SELECT status FROM archives WHERE pmc_id = ?',
+                                 (pmc_id, )).fetchone()
+        return row[0] if row is not None else None
+
+    def is_completed(self, pmc_id: str, content_hash: Optional[str] = None) -> bool:
+        """Return ``True`` if `pmc_id` has been fully written.
+
+        If `content_hash` is provided, the archive must also be unchanged since it was written.
+        """
+        row = self._conn.execute('SELECT status, content_hash FROM archives WHERE pmc_id = ?',
+                                 (pmc_id, )).fetchone()
+        if row is None or row[0] not in COMPLETED_STATUSES:
+            return False
+        return content_hash is None or row[1] == content_hash
+
+    def completed_archive_files(self) -> Dict[str, str]:
+        """Return a mapping from archive files which have been fully written to PMC ids."""
+        rows = self._conn.execute(
+            'SELECT archive_file, pmc_id FROM archives WHERE status IN (?, ?)',
+            COMPLETED_STATUSES)
+        return dict(rows)
+
+    def start(self, pmc_id: str, archive_file: Optional[str] = None,
+              content_hash: Optional[str] = None) -> None:
+        """Mark `pmc_id` as being written."""
+        with self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO archives '
+                '(pmc_id, archive_file, content_hash, status, started_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (pmc_id, archive_file, content_hash, 'started', time.time()))
+            self._conn.execute('DELETE FROM pending WHERE pmc_id = ?', (pmc_id, ))
+
+    def finish(self, pmc_id: str, status: str, error_message: Optional[str] = None,
+               runtime: Optional[float] = None) -> None:
+        """Mark `pmc_id` as fully written.
+
+        Args:
+            pmc_id: PMC id of the archive.
+            status: One of `COMPLETED_STATUSES`.
+            error_message: Error message, if `status` is ``'error'``.
+            runtime: Time (in seconds) it took to process the archive.
+                Defaults to the time since `start` was called.
+        """
+        assert status in COMPLETED_STATUSES, status
+        self._set_status([(pmc_id, status, error_message, runtime)])
+
+    def finish_many(self, archives: Iterable[Tuple[str, str, Optional[float]]]) -> None:
+        """Mark many archives as fully written, in a single transaction.
+
+        Args:
+            archives: Tuples of the PMC id, status and runtime of every archive
+                (see `finish`).
+        """
+        rows = []
+        for pmc_id, status, runtime in archives:
+            assert status in COMPLETED_STATUSES, status
+            rows.append((pmc_id, status, None, runtime))
+        self._set_status(rows)
+
+    def defer_finish(self, pmc_id: str, status: str, runtime: Optional[float] = None) -> None:
+        """Mark `pmc_id` as fully written on the next `commit`.
+
+        Archives stay ``started`` until then, so they are written again if the process
+        crashes before `commit` is called.
+
+        Args:
+            pmc_id: PMC id of the archive.
+            status: One of `COMPLETED_STATUSES`.
+            runtime: Time (in seconds) it took to process the archive.
+                Defaults to the time since `start` was called.
+        """
+        assert status in COMPLETED_STATUSES, status
+        with self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pending (pmc_id, status, runtime) '
+                'SELECT pmc_id, ?, coalesce(?, ? - started_at) FROM archives WHERE pmc_id = ?',
+                (status, runtime, time.time(), pmc_id))
+
+    def commit(self) -> int:
+        """Mark all archives passed to `defer_finish` as fully written, in a single transaction.
+
+        Returns:
+            The number of archives which were marked as fully written.
+        """
+        rows = self._conn.execute('SELECT pmc_id, status, runtime FROM pending').fetchall()
+        self._set_status([(pmc_id, status, None, runtime) for pmc_id, status, runtime in rows],
+                         clear_pending=True)
+        return len(rows)
+
+    def fail(self, pmc_id: str, error_message: Optional[str] = None) -> None:
+        """Mark `pmc_id` as failed, so that it is written again on the next run."""
+        self._set_status([(pmc_id, FAILED_STATUS, error_message, None)])
+
+    def _set_status(self, rows: List[Tuple[str, str, Optional[str], Optional[float]]],
+                    clear_pending: bool = False) -> None:
+        finished_at = time.time()
+        with self._conn:
+            self._conn.executemany(
+                'UPDATE archives SET status = ?, finished_at = ?, '
+                'runtime = coalesce(?, ? - started_at), error_message = ? WHERE pmc_id = ?',
+                [(status, finished_at, runtime, finished_at, error_message, pmc_id)
+                 for pmc_id, status, error_message, runtime in rows])
+            if clear_pending:
+                self._conn.executemany('DELETE FROM pending WHERE pmc_id = ?',
+                                       [(row[0], ) for row in rows])
+
+    # === Skip list ===
+
+    def is_skipped(self, pmc_id: str) -> bool:
+        row = self._conn.execute('SELECT 1 FROM skip_list WHERE pmc_id = ?',
+                                 (pmc_id, )).fetchone()
+        return row is not None
+
+    def get_skip_list(self) -> Dict[str, str]:
+        return dict(self._conn.execute('SELECT pmc_id, reason FROM skip_list'))
+
+    def add_to_skip_list(self, pmc_id: str, reason: str = '') -> None:
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO skip_list (pmc_id, reason) VALUES (?, ?)',
+                               (pmc_id, reason))
+
+    def remove_from_skip_list(self, pmc_id: str) -> None:
+        with self._conn:
+            self._conn.execute('DELETE FROM skip_list WHERE pmc_id = ?', (pmc_id, ))
@@ -1,7 +1,9 @@
 """
 Downlaod data from PubMed Central.
 """
+import concurrent.futures
 import datetime
+import ftplib
 import json
 import logging
 import os
@@ -10,19 +12,30 @@ import shutil
 import socket
 import tarfile
 import tempfile
+import time
+import urllib.parse
 import urllib.request
 import zipfile
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Union
 
+import pandas as pd
+
+from pmc_tables.ftp_client import FTPConnectionPool
 from pmc_tables.utils import recursive_listdir
 
 logger = logging.getLogger(__name__)
 
 EXTENSIONS_TO_KEEP = ['.nxml', '.xml', '.csv', '.csv.gz', '.tsv', '.tsv.gz', '.xls', '.xlsx']
 
+INFO_COLUMNS = ['pmc_type', 'pmc_id', 'source_url']
+
+_PERMANENT_ERRORS = (ftplib.error_perm, FileNotFoundError)
+_RETRYABLE_ERRORS = (ftplib.error_temp, ftplib.error_reply, ftplib.error_proto, OSError, EOFError)
+
 
 def get_pmc_archive(archive_file: str, output_file: str, global_tmp_dir: str = '/dev/shm',
+                    streaming: bool = True, ftp_pool: Optional[FTPConnectionPool] = None,
                     **kwargs) -> Dict[str, str]:
     """Download a PMC archive file from a remote FTP server or a local mirror.
 
@@ -31,34 +44,119 @@ def get_pmc_archive(archive_file: str, output_file: str, global_tmp_dir: str = '
         output_file: Location where to save the processed archive file.
         global_temp_dir: Temporary directory where all temporary files should be stored.
             Change this to point to a RAM disk or '/dev/shm' to speed up computation.
+        streaming: If ``True``, copy files which should be kept from a *.tar.gz source archive
+            directly into a *.zip output archive, without extracting the source archive.
+        ftp_pool: Pool of FTP connections used to download `archive_file`.
+            If not provided, a new connection is opened for every file.
 
     Returns:
         A dictionary containing information about the created file.
     """
     with tempfile.TemporaryDirectory(dir=global_tmp_dir) as tmp_dir:
-        archive_path = _get_archive(archive_file, tmp_dir)
+        archive_path = _get_archive(archive_file, tmp_dir, ftp_pool)
         info = {
             **kwargs,
             'created_on': datetime.datetime.now().isoformat(),
             'archive_file': archive_file,
         }
-        _create_archive_subset(archive_path, Path(output_file), Path(tmp_dir), info)
+        if streaming and _can_stream_archive_subset(archive_path, Path(output_file)):
+            _stream_archive_subset(archive_path, Path(output_file), info)
+        else:
+            _create_archive_subset(archive_path, Path(output_file), Path(tmp_dir), info)
 
     return info
 
 
-def _get_archive(archive_file: str, tmp_dir: str) -> Path:
+def get_pmc_archives(manifest: Union[str, pd.DataFrame], output_dir: str,
+                     num_connections: int = 4, max_retries: int = 3, backoff: float = 1,
+                     timeout: float = 60, info_columns: Sequence[str] = INFO_COLUMNS,
+                     **kwargs) -> pd.DataFrame:
+    """Download many PMC archive files, reusing a pool of persistent FTP connections.
+
+    Args:
+        manifest: A DataFrame, or the location of a CSV file (e.g. ``to_download.csv.gz``),
+            with `source_url` and `output_file_path` columns.
+        output_dir: Directory relative to which `output_file_path` is resolved.
+        num_connections: Number of simultaneous downloads (and FTP connections per server).
+        max_retries: Number of times a failed download is retried.
+        backoff: Delay (in seconds) before the first retry. The delay doubles after every retry.
+        timeout: Timeout (in seconds) for blocking operations on each FTP connection.
+        info_columns: Columns in `manifest` which should be saved in the `info.json` file.
+        kwargs: Additional arguments passed to `get_pmc_archive`.
+
+    Returns:
+        A DataFrame with the status of every download in `manifest`.
+    """
+    if isinstance(manifest, str):
+        manifest = pd.read_csv(manifest)
+    pools = {}
+    for source_url in manifest['source_url']:
+        url = urllib.parse.urlparse(source_url)
+        if url.scheme == 'ftp' and url.netloc not in pools:
+            pools[url.netloc] = FTPConnectionPool(
+                url.hostname, url.port or 21, size=num_connections, timeout=timeout)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(num_connections) as executor:
+            futures = [
+                executor.submit(_get_pmc_archive_with_retries, row, output_dir, pools,
+                                max_retries, backoff, info_columns, kwargs)
+                for row in manifest.to_dict('records')
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        for pool in pools.values():
+            pool.close()
+    return pd.DataFrame(
+        results, columns=['output_file_path', 'status', 'num_attempts', 'error_message'])
+
+
+def _get_pmc_archive_with_retries(row: dict, output_dir: str, pools: Dict[str, FTPConnectionPool],
+                                  max_retries: int, backoff: float, info_columns: Sequence[str],
+                                  kwargs: dict) -> tuple:
+    source_url = row['source_url']
+    output_file = op.join(output_dir, row['output_file_path'])
+    ftp_pool = pools.get(urllib.parse.urlparse(source_url).netloc)
+    info_kwargs = {c: row[c] for c in info_columns if c in row}
+    error_message = None
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(backoff * 2**(attempt - 1))
+        try:
+            get_pmc_archive(source_url, output_file, ftp_pool=ftp_pool, **info_kwargs, **kwargs)
+        except _PERMANENT_ERRORS as e:
+            error_message = f"{type(e)}: {e}"
+            break
+        except _RETRYABLE_ERRORS as e:
+            error_message = f"{type(e)}: {e}"
+            logger.warning("Failed to download `%s` on attempt %s (%s).", source_url, attempt + 1,
+                           error_message)
+            continue
+        except Exception as e:
+            # E.g. a corrupted source archive, which should not abort the other downloads
+            error_message = f"{type(e)}: {e}"
+            break
+        return row['output_file_path'], 'success', attempt + 1, None
+    logger.error("Could not download `%s` (%s).", source_url, error_message)
+    return row['output_file_path'], 'error', attempt + 1, error_message
+
+
+def _get_archive(archive_file: str, tmp_dir: str,
+                 ftp_pool: Optional[FTPConnectionPool] = None) -> Path:
     """Return a `Path` object to the archive file.
 
     If `archive_file` is a URL, download the file first. In this case,
     the user is responsible for deleting the file when they are done with it.
     """
-    socket.setdefaulttimeout(60)
     if archive_file.startswith('ftp://'):
         suffix = op.basename(archive_file).partition('.')[-1]
         archive_file_obj = tempfile.NamedTemporaryFile(
             dir=tmp_dir, suffix=f'.{suffix}', delete=False)
-        urllib.request.urlretrieve(archive_file, archive_file_obj.name)
+        if ftp_pool is not None:
+            with archive_file_obj:
+                ftp_pool.retrieve(urllib.parse.urlparse(archive_file).path, archive_file_obj)
+        else:
+            socket.setdefaulttimeout(60)
+            urllib.request.urlretrieve(archive_file, archive_file_obj.name)
         archive_path = Path(archive_file_obj.name)
     elif op.isfile(archive_file):
         archive_path = Path(archive_file)
@@ -85,6 +183,52 @@ def _create_archive_subset(archive_path: Path, output_path: Path, tmp_path: Path
     _write_to_archive(kept_files, output_path)
 
 
+def _can_stream_archive_subset(archive_path: Path, output_path: Path) -> bool:
+    return '.tar' in archive_path.suffixes and '.zip' in output_path.suffixes
+
+
+def _stream_archive_subset(archive_path: Path, output_path: Path, info: dict,
+                           extensions_to_keep: List[str] = EXTENSIONS_TO_KEEP) -> None:
+    """Create a new *.zip archive which contains only a subset of files from a *.tar.gz archive.
+
+    Unlike `_create_archive_subset`, this function does not extract the input archive.
+    Members are filtered based on their tar header, and only the members which should be
+    kept are decompressed and written into the output archive.
+    """
+    all_files = []
+    kept_files = []
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write into a temporary file, so that no output is left behind if the input is corrupted
+    tmp_output_path = output_path.with_name(f'.{output_path.name}.tmp')
+    try:
+        with tarfile.open(archive_path.as_posix(), 'r|*') as tar_file, \
+                zipfile.ZipFile(tmp_output_path.as_posix(), 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for member in tar_file:
+                if not member.isfile():
+                    continue
+                all_files.append(member.name)
+                if not _keep_file(member.name, extensions_to_keep):
+                    continue
+                kept_files.append(member.name)
+                zip_info = zipfile.ZipInfo(
+                    op.basename(member.name), date_time=time.localtime(member.mtime)[:6])
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+                force_zip64 = member.size >= zipfile.ZIP64_LIMIT
+                with tar_file.extractfile(member) as fin, \
+                        zip_file.open(zip_info, 'w', force_zip64=force_zip64) as fout:
+                    shutil.copyfileobj(fin, fout)
+            info.update({
+                'all_files': all_files,
+                'kept_files': kept_files,
+            })
+            zip_file.writestr('info.json', json.dumps(info))
+        os.replace(tmp_output_path.as_posix(), output_path.as_posix())
+    except BaseException:
+        if tmp_output_path.exists():
+            tmp_output_path.unlink()
+        raise
+
+
 def _extract_archive(archive_path: Path, tmp_path: Path):
     """Extract all files from a .zip or .tar.gz archive."""
     if '.tar' in archive_path.suffixes or '.zip' in archive_path.suffixes:
@@ -102,12 +246,16 @@ def _remove_unkept_files(file_list: List[Path],
     for filepath in file_list:
         if not op.isfile(filepath):
             continue
-        elif not any(filepath.name.endswith(ext) for ext in extensions_to_keep):
+        elif not _keep_file(filepath.name, extensions_to_keep):
             os.remove(filepath)
             removed_files.append(filepath)
     return removed_files
 
 
+def _keep_file(filename: str, extensions_to_keep: List[str] = EXTENSIONS_TO_KEEP) -> bool:
+    return any(filename.endswith(ext) for ext in extensions_to_keep)
+
+
 def _write_info_file(info: dict, tmp_path: Path) -> Path:
     """Save `info` dictionary to a file."""
     info_file = tmp_path.joinpath('info.json')
@@ -0,0 +1,266 @@
+"""
+Entity Matching
+---------------
+
+Find genes and mutations mentioned in the cells of extracted tables.
+
+An `EntityMatcher` is compiled from dictionaries mapping terms (gene symbols, synonyms,
+Ensembl, RefSeq, UniProt and COSMIC ids, ...) to the entity they refer to, together with
+regular expressions for mutation notations (``V600E``, ``p.Val600Glu``, ``c.1799T>A``, ...).
+Tables are scanned column by column, and every distinct value of a column is matched only once:
+values are split into tokens, and the tokens of all values are looked up at once in a hash
+index of the dictionary terms, which finds all terms in a value in a single pass, like an
+Aho-Corasick automaton restricted to token boundaries.
+
+Compiling the dictionaries takes a while, so compiled matchers can be saved with
+`EntityMatcher.save` and loaded with `EntityMatcher.load`. `EntityMatcher.summarize` returns
+a summary of the matches in a table, which can be written together with the metadata of the
+table (e.g. using `writers.write_hdf5_metadata`).
+"""
+import logging
+import pickle
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_AA1 = 'ACDEFGHIKLMNPQRSTVWY'
+_AA3 = 'Ala|Arg|Asn|Asp|Cys|Gln|Glu|Gly|His|Ile|Leu|Lys|Met|Phe|Pro|Ser|Thr|Trp|Tyr|Val|Ter'
+
+#: Regular expressions matching mutation notations. They must not contain capturing groups.
+MUTATION_PATTERNS = {
+    'protein_mutation_3': (rf'\bp\.\(?(?:{_AA3})\d+(?:_(?:{_AA3})\d+)?'
+                           rf'(?:{_AA3}|\*|=|fs(?:Ter|\*)?\d*|delins(?:{_AA3})+|del|dup'
+                           rf'|ins(?:{_AA3})+)\)?(?![\w*])'),
+    'protein_mutation': (rf'\b(?:p\.)?[{_AA1}]\d+(?:_[{_AA1}]\d+)?'
+                         rf'(?:[{_AA1}*X]|fs\*?\d*|del|dup|ins[{_AA1}]+)(?![\w*])'),
+    'cdna_mutation': (r'\bc\.[-*]?\d+(?:[-+]\d+)?(?:_[-*]?\d+(?:[-+]\d+)?)?'
+                      r'(?:[ACGT]>[ACGT]|delins[ACGT]+|del[ACGT]*|ins[ACGT]+|dup[ACGT]*)(?![\w>])'),
+    'rsid': r'\brs\d+\b',
+}
+
+#: Columns of the HGNC table of protein-coding genes used by `get_hgnc_dictionaries`
+HGNC_COLUMNS = {
+    'gene_symbol': ['symbol'],
+    'gene_synonym': ['alias_symbol', 'prev_symbol'],
+    'ensembl_gene_id': ['ensembl_gene_id'],
+    'refseq_accession': ['refseq_accession'],
+    'uniprot_ids': ['uniprot_ids'],
+    'cosmic': ['cosmic'],
+}
+
+_TOKEN_RE = re.compile(r'[A-Za-z0-9](?:[\w\-.]*[A-Za-z0-9])?')
+_TOKEN_PART_RE = re.compile(r'[A-Za-z0-9](?:[\w.]*[A-Za-z0-9])?')
+_VERSION_RE = re.compile(r'\.\d+$')
+
+_VALUE_HIT_COLUMNS = ['value_idx', 'entity_type', 'text', 'entity']
+_HIT_COLUMNS = ['row', 'col', 'entity_type', 'text', 'entity']
+
+
+def get_hgnc_dictionaries(hgnc_df: pd.DataFrame) -> Dict[str, Dict[str, str]]:
+    """Return dictionaries mapping gene identifiers to gene symbols.
+
+    Args:
+        hgnc_df: The HGNC table of protein-coding genes (``protein-coding_gene.txt``),
+            in which multiple values in a cell are separated by ``'|'``.
+
+    Returns:
+        A mapping from the types of identifiers in `HGNC_COLUMNS` to dictionaries
+        mapping identifiers to gene symbols. Types of identifiers without columns
+        in `hgnc_df` are left out.
+    """
+    dictionaries: Dict[str, Dict[str, str]] = {}
+    for entity_type, columns in HGNC_COLUMNS.items():
+        columns = [column for column in columns if column in hgnc_df]
+        if not columns:
+            logger.debug("No columns for entity type %s in the HGNC table.", entity_type)
+            continue
+        terms: Dict[str, str] = {}
+        for column in columns:
+            for symbol, values in hgnc_df[['symbol', column]].dropna().values:
+                for value in str(values).split('|'):
+                    terms.setdefault(value, symbol)
+        dictionaries[entity_type] = terms
+    return dictionaries
+
+
+class EntityMatcher:
+    """Find dictionary terms and mutations in the cells of tables.
+
+    Args:
+        dictionaries: Mapping from entity types (e.g. ``'gene_synonym'``) to dictionaries
+            mapping terms to the entities they refer to (e.g. synonyms to gene symbols).
+            Terms given as a set refer to themselves. Terms are case-sensitive.
+        mutation_patterns: Mapping from mutation types to regular expressions.
+            Defaults to `MUTATION_PATTERNS`.
+    """
+
+    def __init__(self, dictionaries: Mapping[str, Union[Mapping[str, str], Iterable[str]]],
+                 mutation_patterns: Optional[Mapping[str, str]] = None) -> None:
+        terms = []
+        for entity_type, entity_terms in dictionaries.items():
+            if not isinstance(entity_terms, dict):
+                entity_terms = {term: term for term in entity_terms}
+            terms.extend((term, entity_type, entity) for term, entity in entity_terms.items()
+                         if isinstance(term, str) and term)
+        terms.sort()
+        terms_df = pd.DataFrame(terms, columns=['term', 'entity_type', 'entity']).drop_duplicates()
+        # Entries of `_term_index[i]` are `_entity_types[j]`, `_entities[j]`,
+        # for `_term_offsets[i] <= j < _term_offsets[i + 1]`
+        unique_terms, counts = np.unique(terms_df['term'].values.astype(object), return_counts=True)
+        self._term_index = pd.Index(unique_terms, dtype=object)
+        self._term_offsets = np.r_[0, np.cumsum(counts)]
+        self._entity_types = terms_df['entity_type'].values.astype(object)
+        self._entities = terms_df['entity'].values.astype(object)
+        self.mutation_patterns = dict(
+            mutation_patterns if mutation_patterns is not None else MUTATION_PATTERNS)
+        self._mutation_re = re.compile('|'.join(
+            f'(?P<{name}>{pattern})' for name, pattern in self.mutation_patterns.items()))
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Pickle the compiled matcher into `path`."""
+        with Path(path).open('wb') as fout:
+            pickle.dump(self, fout, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'EntityMatcher':
+        """Load a matcher saved using `save`."""
+        with Path(path).open('rb') as fin:
+            matcher = pickle.load(fin)
+        if not isinstance(matcher, cls):
+            raise TypeError(f"File {path} does not contain an {cls.__name__}.")
+        return matcher
+
+    def match_values(self, values: Iterable) -> pd.DataFrame:
+        """Find entities in `values`.
+
+        Returns:
+            A DataFrame with one row per match, and the columns ``value_idx``
+            (position of the value in `values`), ``entity_type``, ``text`` (the matching text)
+            and ``entity``. Mutations refer to themselves.
+        """
+        hits = self._match_values([str(value) for value in values])
+        return pd.DataFrame(hits, columns=_VALUE_HIT_COLUMNS)
+
+    def match_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Find entities in the cells of `df`.
+
+        Cells of numeric, boolean and datetime columns are skipped.
+
+        Returns:
+            A DataFrame with one row per match, and the columns ``row`` and ``col``
+            (position of the cell in `df`), ``entity_type``, ``text`` and ``entity``.
+        """
+        # Match every distinct value of every column only once
+        columns, codes, uniques = [], [], []
+        num_uniques = 0
+        for col in range(df.shape[1]):
+            values = df.iloc[:, col]
+            if values.dtype.kind in 'biufcmM':
+                continue
+            col_codes, col_uniques = pd.factorize(values)
+            columns.append(col)
+            codes.append(np.where(col_codes >= 0, col_codes + num_uniques, -1))
+            uniques.extend(str(value) for value in col_uniques)
+            num_uniques += len(col_uniques)
+        hits = self._match_values(uniques)
+        if not hits:
+            return pd.DataFrame(columns=_HIT_COLUMNS)
+        value_idxs, entity_types, texts, entities = (np.array(a, dtype=object) for a in zip(*hits))
+        # Find the cells holding every value: cell `i` is in row `i % len(df)` of column
+        # `columns[i // len(df)]`
+        cell_codes = np.concatenate(codes)
+        order = np.argsort(cell_codes, kind='mergesort')
+        sorted_codes = cell_codes[order]
+        starts = np.searchsorted(sorted_codes, value_idxs.astype(np.int64), 'left')
+        counts = np.searchsorted(sorted_codes, value_idxs.astype(np.int64), 'right') - starts
+        cell_idxs = order[_expand_ranges(starts, counts)]
+        hit_idxs = np.repeat(np.arange(len(hits)), counts)
+        rows = cell_idxs % len(df)
+        cols = np.array(columns)[cell_idxs // len(df)]
+        idxs = np.lexsort((hit_idxs, cols, rows))
+        return pd.DataFrame({
+            'row': rows[idxs],
+            'col': cols[idxs],
+            'entity_type': entity_types[hit_idxs[idxs]],
+            'text': texts[hit_idxs[idxs]],
+            'entity': entities[hit_idxs[idxs]],
+        }, columns=_HIT_COLUMNS)
+
+    def summarize(self, df: pd.DataFrame, min_column_fraction: float = 0.8) -> dict:
+        """Summarize the entities found in `df`.
+
+        Args:
+            df: The table.
+            min_column_fraction: Minimum fraction of the non-null cells of a column which
+                have to match an entity for the column to be reported as a gene or
+                mutation column.
+
+        Returns:
+            A dictionary with the number of matches of every entity type
+            (``entity_hit_counts``), the genes (``entity_genes``) and mutations
+            (``entity_mutations``) which were found, and the names of the columns
+            containing genes (``entity_gene_columns``) and mutations
+            (``entity_mutation_columns``).
+        """
+        hits = self.match_frame(df)
+        num_values = df.notnull().sum().values
+        entities: Dict[str, Set[str]] = {'gene': set(), 'mutation': set()}
+        rows: Dict[str, Dict[int, Set[int]]] = {
+            'gene': defaultdict(set), 'mutation': defaultdict(set)}
+        for row, col, entity_type, entity in zip(hits['row'].tolist(), hits['col'].tolist(),
+                                                 hits['entity_type'].tolist(),
+                                                 hits['entity'].tolist()):
+            name = 'mutation' if entity_type in self.mutation_patterns else 'gene'
+            entities[name].add(entity)
+            rows[name][col].add(row)
+        summary = {
+            'entity_hit_counts': dict(Counter(hits['entity_type'].tolist()).most_common()),
+            'entity_genes': sorted(entities['gene']),
+            'entity_mutations': sorted(entities['mutation']),
+        }
+        for name in ['gene', 'mutation']:
+            summary[f'entity_{name}_columns'] = [
+                str(df.columns[col]) for col, col_rows in sorted(rows[name].items())
+                if len(col_rows) >= min_column_fraction * num_values[col]
+            ]
+        return summary
+
+    def _match_values(self, values: List[str]) -> List[Tuple[int, str, str, str]]:
+        # Look up whole tokens (e.g. "NKX2-1"), and also the parts of hyphenated tokens
+        # (e.g. "BRAF" in "BRAF-mutant"), all at once
+        value_idxs, candidates = [], []
+        for value_idx, value in enumerate(values):
+            tokens = _TOKEN_RE.findall(value)
+            if any('-' in token for token in tokens):
+                tokens += _TOKEN_PART_RE.findall(value)
+            value_idxs.extend([value_idx] * len(tokens))
+            candidates.extend(tokens)
+        hits = []
+        if candidates:
+            codes = self._term_index.get_indexer(np.array(candidates, dtype=object))
+            # Look up accessions without their version (e.g. "NM_004333.4")
+            missing_idxs = [
+                i for i in np.flatnonzero(codes < 0) if _VERSION_RE.search(candidates[i])
+            ]
+            if missing_idxs:
+                codes[missing_idxs] = self._term_index.get_indexer(np.array(
+                    [_VERSION_RE.sub('', candidates[i]) for i in missing_idxs], dtype=object))
+            for i in np.flatnonzero(codes >= 0):
+                for j in range(self._term_offsets[codes[i]], self._term_offsets[codes[i] + 1]):
+                    hits.append(
+                        (value_idxs[i], self._entity_types[j], candidates[i], self._entities[j]))
+        for value_idx, value in enumerate(values):
+            for match in self._mutation_re.finditer(value):
+                hits.append((value_idx, match.lastgroup, match.group(), match.group()))
+        return sorted(dict.fromkeys(hits), key=lambda hit: hit[0])
+
+
+def _expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Return the concatenation of ``range(start, start + count)`` for every start and count."""
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
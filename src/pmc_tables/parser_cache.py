@@ -0,0 +1,222 @@
+"""
+Parser Cache
+------------
+
+Keep the output of parsers on disk, so that archives can be re-ingested
+(e.g. after the fixers have changed) without parsing their files again.
+
+Results are keyed by the name, CRC and size of the file in the archive, together with
+the name and version of the parser, so files do not have to be decompressed to be looked up.
+Every result is stored in its own directory, with the table ids and table infos in a pickle
+and each DataFrame in an Arrow IPC file. DataFrames which do not survive the round trip
+through Arrow unchanged (e.g. because of duplicate column names) are pickled instead.
+
+An SQLite index keeps track of the size and last access time of every result, and of the total
+size of the cache, and the least recently used results are evicted once the cache grows beyond
+`max_size` bytes.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import sqlite3
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = 'index.sqlite'
+
+_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access);
+CREATE TABLE IF NOT EXISTS stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total_size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (id, total_size) SELECT 0, coalesce(sum(size), 0) FROM results;
+"""
+
+ParserResult = List[Tuple[str, dict, pd.DataFrame]]
+
+
+def get_cache_key(zip_info: zipfile.ZipInfo, parser: Callable) -> str:
+    """Return the key under which the result of running `parser` on a file is stored.
+
+    Args:
+        zip_info: Description of the file in the archive.
+        parser: Parser returned by `parsers.get_parser`.
+    """
+    h = hashlib.sha1()
+    h.update(f"{parser.__name__}\0{getattr(parser, 'version', 1)}\0"
+             f"{zip_info.filename}\0{zip_info.CRC}\0{zip_info.file_size}".encode('utf-8'))
+    return h.hexdigest()
+
+
+class ParserCache:
+    """Size-limited, on-disk cache of parser results.
+
+    It can be shared by several processes.
+
+    Args:
+        cache_dir: Directory containing the cache. Created if it does not exist.
+        max_size: Maximum size of the cache, in bytes.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_size: int = 10 * 1024**3) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.num_hits = 0
+        self.num_misses = 0
+        self._conn = sqlite3.connect(
+            self.cache_dir.joinpath(INDEX_FILE_NAME).as_posix(), timeout=60)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> 'ParserCache':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __contains__(self, key: str) -> bool:
+        return self._conn.execute('SELECT 1 FROM results WHERE key = ?',
+                                  (key, )).fetchone() is not None
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get(self, key: str) -> Optional[ParserResult]:
+        """Return the parser result stored under `key`, or ``None`` if there is none."""
+        if key not in self:
+            self.num_misses += 1
+            return None
+        result_dir = self._get_result_dir(key)
+        try:
+            result = _read_result(result_dir)
+        except (OSError, EOFError, pickle.UnpicklingError, pa.ArrowException) as e:
+            # Evicted by another process, or incompletely written
+            logger.debug("Could not read cached result `%s` (%s: %s).", key, type(e), e)
+            self.num_misses += 1
+            return None
+        with self._conn:
+            self._conn.execute('UPDATE results SET last_access = ? WHERE key = ?',
+                               (time.time(), key))
+        self.num_hits += 1
+        return result
+
+    def put(self, key: str, result: ParserResult) -> None:
+        """Store `result` under `key`, evicting old results if the cache is too large."""
+        result_dir = self._get_result_dir(key)
+        tmp_dir = result_dir.with_name(f'.{key}.{os.getpid()}.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir.as_posix())
+        tmp_dir.mkdir(parents=True)
+        _write_result(tmp_dir, result)
+        size = sum(f.stat().st_size for f in tmp_dir.iterdir())
+        if result_dir.exists():
+            shutil.rmtree(result_dir.as_posix(), ignore_errors=True)
+        try:
+            tmp_dir.rename(result_dir)
+        except OSError:
+            # Written concurrently by another process
+            shutil.rmtree(tmp_dir.as_posix(), ignore_errors=True)
+        with self._conn:
+            # The total size is updated in the same transaction as the index
+            self._conn.execute(
+                'UPDATE stats SET total_size = total_size + ? - '
+                'coalesce((SELECT size FROM results WHERE key = ?), 0)', (size, key))
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (key, size, last_access) VALUES (?, ?, ?)',
+                (key, size, time.time()))
+        self._evict()
+
+    def remove(self, key: str) -> None:
+        with self._conn:
+            self._conn.execute(
+                'UPDATE stats SET total_size = total_size - '
+                'coalesce((SELECT size FROM results WHERE key = ?), 0)', (key, ))
+            self._conn.execute('DELETE FROM results WHERE key = ?', (key, ))
+        shutil.rmtree(self._get_result_dir(key).as_posix(), ignore_errors=True)
+
+    def get_size(self) -> int:
+        """Return the total size of all results in the cache, in bytes."""
+        return self._conn.execute('SELECT total_size FROM stats').fetchone()[0]
+
+    def _evict(self) -> None:
+        """Remove the least recently used results until the cache fits into `max_size`."""
+        excess_size = self.get_size() - self.max_size
+        if excess_size <= 0:
+            return
+        rows = self._conn.execute('SELECT key, size FROM results ORDER BY last_access')
+        keys = []
+        for key, size in rows:
+            if excess_size <= 0:
+                break
+            keys.append(key)
+            excess_size -= size
+        for key in keys:
+            logger.debug("Evicting cached result `%s`.", key)
+            self.remove(key)
+
+    def _get_result_dir(self, key: str) -> Path:
+        return self.cache_dir.joinpath(key[:2], key)
+
+
+def _write_result(result_dir: Path, result: ParserResult) -> None:
+    tables = []
+    for i, (table_id, table_info, table_df) in enumerate(result):
+        if _write_arrow(result_dir.joinpath(f'{i}.arrow'), table_df):
+            table_format = 'arrow'
+        else:
+            with result_dir.joinpath(f'{i}.pickle').open('wb') as fout:
+                pickle.dump(table_df, fout, protocol=pickle.HIGHEST_PROTOCOL)
+            table_format = 'pickle'
+        tables.append((table_id, table_info, table_format))
+    with result_dir.joinpath('tables.pickle').open('wb') as fout:
+        pickle.dump(tables, fout, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_result(result_dir: Path) -> ParserResult:
+    with result_dir.joinpath('tables.pickle').open('rb') as fin:
+        tables = pickle.load(fin)
+    result = []
+    for i, (table_id, table_info, table_format) in enumerate(tables):
+        if table_format == 'arrow':
+            with pa.OSFile(result_dir.joinpath(f'{i}.arrow').as_posix(), 'rb') as fin:
+                table_df = pa.RecordBatchFileReader(fin).read_all().to_pandas()
+        else:
+            with result_dir.joinpath(f'{i}.pickle').open('rb') as fin:
+                table_df = pickle.load(fin)
+        result.append((table_id, table_info, table_df))
+    return result
+
+
+def _write_arrow(arrow_file: Path, df: pd.DataFrame) -> bool:
+    """Write `df` to `arrow_file` if it can be read back unchanged, returning ``True`` if so."""
+    try:
+        table = pa.Table.from_pandas(df)
+        df_ = table.to_pandas()
+    except (pa.ArrowException, ValueError, TypeError):
+        return False
+    if not df.equals(df_) or list(df.dtypes) != list(df_.dtypes):
+        return False
+    if not df.columns.equals(df_.columns) or not df.index.equals(df_.index):
+        return False
+    with pa.OSFile(arrow_file.as_posix(), 'wb') as fout:
+        writer = pa.RecordBatchFileWriter(fout, table.schema)
+        writer.write_table(table)
+        writer.close()
+    return True
@@ -1,18 +1,52 @@
 import functools
+import io
 from pathlib import Path
-from typing import Callable, List, Tuple
+from typing import BinaryIO, Callable, List, Optional, Tuple, Union
 
 import pandas as pd
 
+ParserInput = Union[str, Path, bytes, BinaryIO]
 
-def parser(fn: Callable):
+
+def parser(fn: Optional[Callable] = None, *, version: int = 1):
+    """Decorator for parser functions.
+
+    Parsers accept either a path or the contents of the file (as bytes or as
+    a binary file-like object). In the latter case, `name` must be provided,
+    since it is used to construct table ids.
+
+    Args:
+        fn: The parser function.
+        version: Version of the parser, which should be incremented whenever the output
+            of the parser changes, so that results stored in a `ParserCache` are not reused.
+    """
+    if fn is None:
+        return functools.partial(parser, version=version)
 
     @functools.wraps(fn)
-    def wraped(filepath: Path) -> List[Tuple[str, dict, pd.DataFrame]]:
-        results = fn(filepath)
+    def wraped(file: ParserInput,
+               name: Optional[str] = None) -> List[Tuple[str, dict, pd.DataFrame]]:
+        if isinstance(file, (str, Path)):
+            file = Path(file)
+            name = name if name is not None else file.name
+            file = file.as_posix()
+        elif isinstance(file, (bytes, bytearray)):
+            file = io.BytesIO(file)
+        if name is None:
+            raise ValueError("`name` is required when parsing file contents.")
+        results = fn(file, name)
         for result in results:
             assert 'label' in result[1]
             result[1]['parser_name'] = fn.__name__
         return results
 
+    wraped.version = version  # type: ignore
     return wraped
+
+
+def read_bytes(file: Union[str, BinaryIO]) -> bytes:
+    """Read the contents of a file given its path or a file-like object."""
+    if isinstance(file, str):
+        with open(file, 'rb') as fin:
+            return fin.read()
+    return file.read()
@@ -7,12 +7,13 @@ import numbers
 import os
 import re
 from distutils.version import LooseVersion
+from itertools import chain
 
 import numpy as np
 from pandas import Series
-from pandas.compat import (binary_type, iteritems, lfilter, lmap, lrange, raise_with_traceback,
-                           string_types, u)
-from pandas.core.common import AbstractMethodError, flatten
+from pandas.compat import (binary_type, iteritems, lmap, lrange, raise_with_traceback, string_types,
+                           u)
+from pandas.core.common import AbstractMethodError
 from pandas.core.dtypes.common import is_list_like
 from pandas.errors import EmptyDataError
 from pandas.io.common import _is_url, _validate_header_arg, parse_url, urlopen
@@ -444,47 +445,15 @@ class _HtmlFrameParser(object):
             respecting colspan/rowspan
         """
 
-        res = []
-        saved_span = []
+        cells = []
         for row in rows:
             extracted_row = self._extract_td(row)
-            cols_text = [_remove_whitespace(
-                self._text_getter(col)) for col in extracted_row]
-            col_colspans = [int(col.get('colspan', 1))
-                            for col in extracted_row]
-            col_rowspans = [int(col.get('rowspan', 1))
-                            for col in extracted_row]
-            # expand cols using col_colspans
-            # maybe this can be done with a list comprehension, dunno
-            cols = list(zip(
-                list(flatten(
-                    lmap(lambda text_nc: [text_nc[0]] * text_nc[1],
-                         list(zip(cols_text, col_colspans))))),
-                list(flatten(
-                    lmap(lambda nc_nr: [nc_nr[1]] * nc_nr[0],
-                         list(zip(col_colspans, col_rowspans))))))
-            )
-            # cols is now a list of (text, number of rows)
-            # now insert any previous rowspans
-            for (col, (text, nr)) in saved_span:
-                cols.insert(col, (text, nr))
-
-            # save next saved_span
-            def advance_item_to_next_row(item):
-                (col, (text, nr)) = item
-                if nr == 1:
-                    return None
-                else:
-                    # only keep the text around if fill_rowspan is set
-                    return (col, (text if fill_rowspan else '', nr - 1))
-            saved_span = lfilter(lambda i: i is not None,
-                                 lmap(advance_item_to_next_row,
-                                      list(enumerate(cols))))
-            cols = [text for (text, nr) in cols]
-            # generate cols with text only
-            if any([col != '' for col in cols]):
-                res.append(cols)
-        return res
+            cells.append((
+                [_remove_whitespace(self._text_getter(col))
+                 for col in extracted_row],
+                [int(col.get('colspan', 1)) for col in extracted_row],
+                [int(col.get('rowspan', 1)) for col in extracted_row]))
+        return _expand_spans(cells, fill_rowspan=fill_rowspan)
 
     def _parse_raw_tfoot(self, table_html):
         tfoot = self._extract_tfoot(table_html)
@@ -739,6 +708,96 @@ class _LxmlFrameParser(_HtmlFrameParser):
                 table.xpath(expr)]
 
 
+def _expand_spans(rows, fill_rowspan=True):
+    """Expand colspans and rowspans using a preallocated occupancy grid.
+
+    Cells carried over from previous rows by their rowspan are placed at
+    the same positions as successive ``list.insert`` calls would place them
+    (i.e. at the end of the row if the row is too short), and rows without
+    any text are dropped, so this is a drop-in replacement for the
+    original implementation of ``_expand_colspan_rowspan``, in O(cells).
+
+    Parameters
+    ----------
+    rows : list of rows, each of which is a tuple of three lists: the
+        text, the colspan and the rowspan of every element in that row
+
+    fill_rowspan : boolean
+        Should a rowspan fill every item in the rowspan (True) or only the
+        topmost element (False)? Default is True.
+
+    Returns
+    -------
+    res : list of rows, each of which is a list of strings
+    """
+    num_rows = len(rows)
+    colspans = np.fromiter(chain.from_iterable(row[1] for row in rows),
+                           dtype=np.int64)
+    rowspans = np.fromiter(chain.from_iterable(row[2] for row in rows),
+                           dtype=np.int64)
+    if (colspans == 1).all() and (rowspans == 1).all():
+        return [list(texts) for texts, _, _ in rows
+                if any(text != '' for text in texts)]
+
+    # expand colspans: one entry per occupied cell of the grid
+    cell_texts = np.empty(len(colspans), dtype=object)
+    cell_texts[:] = list(chain.from_iterable(row[0] for row in rows))
+    repeats = np.maximum(colspans, 0)
+    cell_rows = np.repeat(np.repeat(np.arange(num_rows),
+                                    [len(row[0]) for row in rows]), repeats)
+    cell_ids = np.repeat(np.arange(len(colspans)), repeats)
+    cell_rowspans = rowspans[cell_ids]
+    num_new = np.bincount(cell_rows, minlength=num_rows)
+    row_starts = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(num_new, out=row_starts[1:])
+    cell_cols = (np.arange(len(cell_ids)) - row_starts[cell_rows]).tolist()
+
+    # cells spanning several rows, grouped by row
+    span_cells = np.flatnonzero(cell_rowspans != 1)
+    span_cell_starts = np.searchsorted(span_cells, row_starts).tolist()
+    span_cells = span_cells.tolist()
+    cell_rowspans = cell_rowspans.tolist()
+    row_starts = row_starts.tolist()
+
+    # place the cells carried over by rowspans, merging them into every row
+    # which they reach
+    widths = num_new.copy()
+    spans = []  # (column, cell carried over, number of rows left)
+    carried_rows, carried_cols, carried_cells = [], [], []
+    for i in range(num_rows):
+        start, end = row_starts[i], row_starts[i + 1]
+        row_span_cells = span_cells[span_cell_starts[i]:span_cell_starts[i + 1]]
+        if not spans:
+            spans = [(j - start, j, cell_rowspans[j] - 1) for j in row_span_cells]
+            continue
+        num_new_cells = end - start
+        width = num_new_cells + len(spans)
+        widths[i] = width
+        # where successive `list.insert` calls would put the carried cells
+        span_cols = [min(col, num_new_cells + k) for k, (col, _, _) in enumerate(spans)]
+        is_carried = set(span_cols)
+        new_cols = [col for col in range(width) if col not in is_carried]
+        cell_cols[start:end] = new_cols
+        carried_rows += [i] * len(spans)
+        carried_cols += span_cols
+        carried_cells += [j for _, j, _ in spans]
+        next_spans = [(col, j, nr - 1)
+                      for col, (_, j, nr) in zip(span_cols, spans) if nr != 1]
+        next_spans += [(new_cols[j - start], j, cell_rowspans[j] - 1)
+                       for j in row_span_cells]
+        spans = sorted(next_spans)
+
+    grid = np.full((num_rows, max(int(widths.max()), 1)), '', dtype=object)
+    grid[cell_rows, cell_cols] = cell_texts[cell_ids]
+    if carried_rows:
+        if fill_rowspan:
+            grid[carried_rows, carried_cols] = cell_texts[cell_ids[carried_cells]]
+        else:
+            grid[carried_rows, carried_cols] = ''
+    is_not_empty = (grid != '').any(axis=1)
+    return [grid[i, :widths[i]].tolist() for i in np.flatnonzero(is_not_empty)]
+
+
 def _expand_elements(body):
     lens = Series(lmap(len, body))
     lens_max = lens.max()
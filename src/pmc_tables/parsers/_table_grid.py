@@ -0,0 +1,272 @@
+"""
+Table Grid
+----------
+
+Build a DataFrame directly from an `lxml.etree` ``<table>`` element.
+
+This produces the same result as ``read_html`` (i.e. ``_LxmlFrameParser`` followed by
+``_data_to_frame`` and ``TextParser``), but the DOM is walked only once and types are inferred
+column by column.
+Tables which use features that the fast path does not handle (multi-row headers, footers,
+boolean columns, ambiguous thousands separators, very large integers) are passed on to
+``_data_to_frame``. Tables on which ``_LxmlFrameParser`` fails, so that ``read_html`` falls back
+to BeautifulSoup, are passed on to ``read_html``.
+"""
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+import lxml.html
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+from ._pandas.io.html import _data_to_frame, _expand_spans, _remove_whitespace, read_html
+
+try:
+    from pandas._libs.parsers import STR_NA_VALUES as _NA_VALUES
+except ImportError:
+    from pandas.io.common import _NA_VALUES
+
+logger = logging.getLogger(__name__)
+
+_BOOL_VALUES = {'True', 'TRUE', 'true', 'False', 'FALSE', 'false'}
+
+# Values which `TextParser` strips of thousands separators. The rules differ between
+# pandas versions, so the fast path is only used when both rules agree.
+_NONNUM_RE = re.compile(r'[^-^0-9^,^.]+')
+_NUM_RE = re.compile(r'^[\-\+]?[0-9]*(,[0-9]+)*(\.[0-9]*)?([0-9]?(E|e)\-?[0-9]+)?$')
+
+# Values which cannot be parsed as numbers do not match this
+_MAYBE_NUMERIC_RE = re.compile(r'\s*[-+]?(\d|\.\d|inf|nan)', re.IGNORECASE)
+
+# Integers which may not fit into an int64, which `TextParser` handles inconsistently
+_LARGE_INTEGER_RE = re.compile(r'\s*[-+]?\d{19,}\s*$')
+
+# Whether the HTML parser of libxml2 accepts elements with a given tag (see `_is_html_tag`)
+_HTML_TAGS: Dict[str, bool] = dict.fromkeys(
+    ['table', 'caption', 'colgroup', 'col', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td'], True)
+
+
+class _Unsupported(Exception):
+    """Raised when a table has to be converted by `_data_to_frame`."""
+
+
+def table_element_to_frame(table: etree._Element) -> pd.DataFrame:
+    """Convert a ``<table>`` element into a DataFrame.
+
+    Raises:
+        ValueError: If the table does not contain any text.
+    """
+    if not all(_is_html_tag(element.tag) for element in table.iter('*')):
+        return _read_html(table)
+    if not _has_text(table):
+        raise ValueError("No tables found matching regex '.+'")
+    try:
+        header, body, footer = read_table_grid(table)
+    except IndexError:
+        # ``_LxmlFrameParser`` fails on tables in which all rows are header rows
+        return _read_html(table)
+    try:
+        return grid_to_frame(header, body, footer)
+    except _Unsupported:
+        return _data_to_frame(
+            data=(header, body, footer), header=None, index_col=None, skiprows=None,
+            parse_dates=False, tupleize_cols=False, thousands=',', decimal='.', converters=None,
+            na_values=None, keep_default_na=True)
+
+
+def _read_html(table: etree._Element) -> pd.DataFrame:
+    return read_html(etree.tostring(table))[0]
+
+
+def _is_html_tag(tag: str) -> bool:
+    """Return whether ``_LxmlFrameParser`` can parse tables containing `tag` elements.
+
+    Older versions of libxml2 reject tags which are not part of HTML 4 (such as ``<bold>``),
+    in which case ``read_html`` parses the table with BeautifulSoup instead.
+    """
+    try:
+        return _HTML_TAGS[tag]
+    except KeyError:
+        pass
+    probe = etree.Element('table')
+    etree.SubElement(etree.SubElement(etree.SubElement(probe, 'tr'), 'td'), tag).tail = '1'
+    try:
+        lxml.html.fromstring(etree.tostring(probe), parser=lxml.html.HTMLParser(recover=False))
+    except etree.XMLSyntaxError:
+        _HTML_TAGS[tag] = False
+    else:
+        _HTML_TAGS[tag] = True
+    return _HTML_TAGS[tag]
+
+
+def _has_text(table: etree._Element) -> bool:
+    """Return whether `table` is found by ``_LxmlFrameParser``.
+
+    That is the case if the first text node of any element in the table contains a character
+    other than a newline. Text nodes include the tails of child elements.
+    """
+    for element in table.iterdescendants('*'):
+        text = element.text
+        if text is None:
+            text = next((child.tail for child in element if child.tail is not None), None)
+        if text is not None and text.strip('\n'):
+            return True
+    return False
+
+
+def read_table_grid(table: etree._Element) -> Tuple[List[List[str]], List[List[str]], list]:
+    """Return the header rows, body rows and footer cells of `table`.
+
+    Rows are split into header and body in the same way as ``_HtmlFrameParser``:
+    ``<thead>`` and ``<tbody>`` are used if the table has both, otherwise rows containing only
+    ``<th>`` cells are moved from the top of the body into the header.
+    """
+    if table.find('thead') is not None and table.find('tbody') is not None:
+        header_rows = _extract_rows(next(table.iter('thead')))
+        body_rows = _extract_rows(next(table.iter('tbody')))
+    else:
+        header_rows = []
+        body_rows = _extract_rows(table)
+        if not body_rows:
+            return [], [], []
+        while all(tag == 'th' for tag in body_rows[0][3]):
+            header_rows.append(body_rows.pop(0))
+        # Rows of `<th>` cells at the bottom of the table are dropped
+        while all(tag == 'th' for tag in body_rows[-1][3]):
+            body_rows.pop()
+    header = _expand_spans([row[:3] for row in header_rows], fill_rowspan=False)
+    body = _expand_spans([row[:3] for row in body_rows], fill_rowspan=True)
+    footer: list = [
+        _remove_whitespace(_get_text(cell)) for cell in table.xpath('.//tfoot//th|.//tfoot//td')
+    ]
+    if len(footer) == 1:
+        footer = np.atleast_1d(np.array(footer).squeeze())
+    return header, body, footer
+
+
+def grid_to_frame(header: List[List[str]], body: List[List[str]], footer: list
+                  ) -> pd.DataFrame:
+    """Construct a DataFrame from the output of `read_table_grid`.
+
+    Raises:
+        _Unsupported: If the table has to be converted by `_data_to_frame` instead.
+    """
+    if len(header) > 1 or len(footer) or not body:
+        raise _Unsupported()
+    rows = header + body
+    num_columns = max(len(row) for row in rows)
+    grid = np.full((len(rows), num_columns), '', dtype=object)
+    for i, row in enumerate(rows):
+        grid[i, :len(row)] = row
+
+    if header:
+        columns: Optional[List[str]] = _get_column_names(grid[0])
+        grid = grid[1:]
+    else:
+        columns = None
+    grid = _replace_thousands(grid)
+    na_mask = np.array([value in _NA_VALUES for value in grid.flat], dtype=bool)
+    na_mask = na_mask.reshape(grid.shape)
+    grid[na_mask] = np.nan
+    data = {i: _infer_column(grid[:, i], na_mask[:, i]) for i in range(num_columns)}
+    df = pd.DataFrame(data, columns=range(num_columns))
+    if columns is not None:
+        df.columns = columns
+    return df
+
+
+def _extract_rows(element: etree._Element
+                  ) -> List[Tuple[List[str], List[int], List[int], List[str]]]:
+    """Return the non-empty ``<tr>`` elements under `element`.
+
+    Each row is described by the texts, colspans, rowspans and tags of the
+    ``<td>`` and ``<th>`` elements in the row.
+    """
+    rows = []
+    for tr in element.iter('tr'):
+        cells = list(tr.iter('td', 'th'))
+        texts = [_get_text(cell) for cell in cells]
+        # The text of the cells is part of the text of the row
+        is_empty = not any(text.strip(' \t\r\n') for text in texts)
+        if is_empty and not _get_text(tr).strip(' \t\r\n'):
+            continue
+        rows.append(([_remove_whitespace(text) for text in texts],
+                     [int(cell.get('colspan', 1)) for cell in cells],
+                     [int(cell.get('rowspan', 1)) for cell in cells],
+                     [cell.tag for cell in cells]))
+    return rows
+
+
+def _get_text(element: etree._Element) -> str:
+    if not len(element):
+        return element.text or ''
+    return ''.join(element.itertext())
+
+
+def _get_column_names(names: np.ndarray) -> List[str]:
+    """Name unnamed columns and rename duplicate columns, like `TextParser` does."""
+    columns = []
+    counts: dict = {}
+    for i, name in enumerate(names):
+        if name == '':
+            name = f'Unnamed: {i}'
+        elif ',' in name and _strips_thousands(name) is not False:
+            raise _Unsupported()
+        cur_count = counts.get(name, 0)
+        while cur_count > 0:
+            counts[name] = cur_count + 1
+            name = f'{name}.{cur_count}'
+            cur_count = counts.get(name, 0)
+        columns.append(name)
+        counts[name] = cur_count + 1
+    return columns
+
+
+def _strips_thousands(value: str) -> Optional[bool]:
+    """Return whether `TextParser` removes thousands separators from `value`.
+
+    Returns ``None`` if this depends on the version of pandas.
+    """
+    value = value.strip()
+    old_rule = _NONNUM_RE.search(value) is None
+    new_rule = _NUM_RE.search(value) is not None
+    if old_rule != new_rule:
+        return None
+    return old_rule
+
+
+def _replace_thousands(grid: np.ndarray) -> np.ndarray:
+    """Remove thousands separators from numbers, like `TextParser` does."""
+    idxs = np.flatnonzero([',' in value for value in grid.flat])
+    if not len(idxs):
+        return grid
+    grid = grid.copy()
+    for idx in idxs:
+        value = grid.flat[idx]
+        strip = _strips_thousands(value)
+        if strip is None:
+            raise _Unsupported()
+        if strip:
+            grid.flat[idx] = value.replace(',', '')
+    return grid
+
+
+def _infer_column(values: np.ndarray, na_mask: np.ndarray):
+    """Convert a column of strings, in which missing values are ``NaN``, into numbers.
+
+    Returns a list of strings if the column is not numeric, so that the DataFrame constructor
+    infers the same type as `TextParser`.
+    """
+    non_na_values = values[~na_mask]
+    if all(_MAYBE_NUMERIC_RE.match(value) for value in non_na_values):
+        if any(_LARGE_INTEGER_RE.match(value) for value in non_na_values):
+            raise _Unsupported()
+        try:
+            return pd.to_numeric(values)
+        except (ValueError, TypeError):
+            pass
+    if all(value in _BOOL_VALUES for value in non_na_values):
+        raise _Unsupported()
+    return values.tolist()
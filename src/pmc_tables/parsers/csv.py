@@ -1,28 +1,32 @@
+import gzip
+import io
 import logging
-from pathlib import Path
-from typing import List, Tuple
+from typing import BinaryIO, List, Tuple, Union
 
 import pandas as pd
 
 import pmc_tables.errors
 
-from ._common import parser
+from ._common import parser, read_bytes
 
 logger = logging.getLogger(__name__)
 
 
 @parser
-def csv_parser(csv_file: Path) -> List[Tuple[str, dict, pd.DataFrame]]:
+def csv_parser(csv_file: Union[str, BinaryIO], name: str) -> List[Tuple[str, dict, pd.DataFrame]]:
+    data = read_bytes(csv_file)
+    if name.endswith('.gz'):
+        data = gzip.decompress(data)
     df = None
     for sep in [',', '\t']:
         try:
-            df = pd.read_csv(csv_file.as_posix(), sep=sep)
+            df = pd.read_csv(io.BytesIO(data), sep=sep)
         except (UnicodeDecodeError, pd.errors.ParserError) as e:
             logger.debug("Encountered error parsing CSV file: %s", e)
             continue
         if len(df.columns) > 1:
             break
     if df is None:
-        raise pmc_tables.errors.ParserError(f"Could not parse file: {csv_file}.")
-    data = [(f"/{csv_file.name}/sheet_0", {'label': None}, df)]
+        raise pmc_tables.errors.ParserError(f"Could not parse file: {name}.")
+    data = [(f"/{name}/sheet_0", {'label': None}, df)]
     return data
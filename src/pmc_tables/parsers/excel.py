@@ -1,18 +1,18 @@
 import sys
-from pathlib import Path
-from typing import List, Tuple
+from typing import BinaryIO, List, Tuple, Union
 
 import pandas as pd
 import xlrd
 
-from ._common import parser
+from ._common import parser, read_bytes
 
 
 @parser
-def excel_parser(excel_file: Path) -> List[Tuple[str, dict, pd.DataFrame]]:
-    wb = xlrd.open_workbook(excel_file.as_posix(), logfile=sys.stderr)
+def excel_parser(excel_file: Union[str, BinaryIO], name: str
+                 ) -> List[Tuple[str, dict, pd.DataFrame]]:
+    wb = xlrd.open_workbook(file_contents=read_bytes(excel_file), logfile=sys.stderr)
     sheets = pd.read_excel(wb, sheet_name=None)
     data = []
     for i, (key, df) in enumerate(sheets.items()):
-        data.append((f"/{excel_file.name}/sheet_{i}", {'label': key}, df))
+        data.append((f"/{name}/sheet_{i}", {'label': key}, df))
     return data
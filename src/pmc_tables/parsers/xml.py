@@ -6,20 +6,22 @@ Extract tables found in PubMed Central XML files.
 """
 import logging
 import re
-import xml.etree.ElementTree as ET
-from pathlib import Path
-from typing import List, NamedTuple, Tuple
+from typing import BinaryIO, List, NamedTuple, Tuple, Union
 
 import pandas as pd
+from lxml import etree
 
 import pmc_tables
-from pmc_tables.utils import compress_to_b85
 
 from ._common import parser
 from ._pandas.io.html import read_html
+from ._table_grid import table_element_to_frame
 
 logger = logging.getLogger(__name__)
 
+# Elements which are cleared once they have been parsed, to limit memory usage
+_CLEARED_TAGS = ('p', 'sec', 'ref', 'ref-list')
+
 
 class TableWrapRow(NamedTuple):
     id_: str
@@ -35,24 +37,43 @@ def read_xml(table: bytes) -> pd.DataFrame:
     return table_df[0]
 
 
-@parser
-def xml_parser(xml_file: Path) -> List[Tuple[str, dict, pd.DataFrame]]:
-    tree = ET.parse(xml_file.as_posix())
-    table_wraps = tree.findall('.//table-wrap')
-    num_tables = len(tree.findall('.//table'))
+def read_table_element(table: etree._Element) -> pd.DataFrame:
+    """Convert a ``<table>`` element into a DataFrame.
+
+    Produces the same result as `read_xml`, without serializing and re-parsing the table.
+    """
+    return table_element_to_frame(table)
+
+
+@parser(version=2)
+def xml_parser(xml_file: Union[str, BinaryIO], name: str) -> List[Tuple[str, dict, pd.DataFrame]]:
+    """Extract tables from a PubMed Central XML file in a single streaming pass.
 
+    ``<table-wrap>`` elements are processed as soon as they are closed, and elements
+    which are no longer needed are cleared, so the whole article is never held in memory.
+    The markup of every table is returned, uncompressed, in ``table_info['table_html']``
+    (see `writers.store_table_html`).
+    """
     data = []
-    for table_wrap in table_wraps:
-        tw_row, tables = _process_table_wrap(table_wrap)
-        for i, table in enumerate(tables):
-            table_bytes = _process_table(table)
-            table_df = read_xml(table_bytes)
-            data.append(
-                (f"/{xml_file.name}/{tw_row.id_}-{i}",
-                 {**tw_row._asdict(),
-                  'table_html': compress_to_b85(table_bytes).decode('ascii')},
-                 table_df,
-            ))
+    num_tables = 0
+    events = etree.iterparse(
+        xml_file, events=('end', ), tag=('table-wrap', 'table') + _CLEARED_TAGS)
+    for _, element in events:
+        if element.tag == 'table':
+            num_tables += 1
+            continue
+        if element.tag == 'table-wrap':
+            tw_row, tables = _process_table_wrap(element)
+            for i, table in enumerate(tables):
+                table_bytes = _process_table(table)
+                table_df = read_table_element(table)
+                data.append(
+                    (f"/{name}/{tw_row.id_}-{i}",
+                     {**tw_row._asdict(), 'table_html': table_bytes},
+                     table_df,
+                ))
+        if not _is_in_table_wrap(element):
+            _clear_element(element)
     if len(data) != num_tables:
         raise pmc_tables.errors.ParserError(  # type: ignore
             "Number of data points is different than the number of tables."
@@ -60,7 +81,18 @@ def xml_parser(xml_file: Path) -> List[Tuple[str, dict, pd.DataFrame]]:
     return data
 
 
-def _process_table_wrap(table_wrap: ET.Element) -> Tuple[TableWrapRow, List[ET.Element]]:
+def _is_in_table_wrap(element: etree._Element) -> bool:
+    return next(element.iterancestors('table-wrap'), None) is not None
+
+
+def _clear_element(element: etree._Element) -> None:
+    """Free the memory used by `element`, its children, and its preceding siblings."""
+    element.clear(keep_tail=True)
+    while element.getprevious() is not None:
+        del element.getparent()[0]
+
+
+def _process_table_wrap(table_wrap: etree._Element) -> Tuple[TableWrapRow, List[etree._Element]]:
     """
     To do:
         - Figure out what `alternatives`, `graphic`, `object-id` stands for.
@@ -88,7 +120,7 @@ def _process_table_wrap(table_wrap: ET.Element) -> Tuple[TableWrapRow, List[ET.E
     footer = table_wrap.find('table-wrap-foot')
     footer_text = caption_to_string(footer)
     # Other children
-    children_set = {e.tag for e in table_wrap.getchildren()}
+    children_set = {e.tag for e in table_wrap.iterchildren() if isinstance(e.tag, str)}
     children_set -= {'label', 'caption', 'table', 'table-wrap-foot'}
     if children_set:
         logger.warning("Unexpected table-wrap `children_set`: %s", children_set)
@@ -96,16 +128,16 @@ def _process_table_wrap(table_wrap: ET.Element) -> Tuple[TableWrapRow, List[ET.E
     return TableWrapRow(id_, label_text, caption_text, footer_text, orientation_text), tables
 
 
-def caption_to_string(element: ET.Element) -> str:
+def caption_to_string(element: etree._Element) -> str:
     if element is None:
         return ""
-    element_text = ET.tostring(element, encoding='utf8', method='text').decode('utf-8')
+    element_text = etree.tostring(element, encoding='unicode', method='text')
     element_text = element_text.strip().replace('\n', ' ')
     element_text = re.sub(' +', ' ', element_text)
     return element_text
 
 
-def _process_table(table: ET.Element) -> bytes:
+def _process_table(table: etree._Element) -> bytes:
     """
     To do:
         - Figure out what `summary` tag contains.
@@ -116,11 +148,11 @@ def _process_table(table: ET.Element) -> bytes:
     if attrib_set:
         logger.warning("Unexpected table `attrib_set`: %s", attrib_set)
     # Children
-    children_set = {e.tag for e in table.getchildren()}
+    children_set = {e.tag for e in table.iterchildren() if isinstance(e.tag, str)}
     children_set -= {'thead', 'tbody'}
     if children_set:
         raise pmc_tables.errors.ParserError(  # type: ignore
             f"Unexpected table `children_set`: {children_set}")
     # DataFrame
-    table_bytes = ET.tostring(table)
+    table_bytes = etree.tostring(table, with_tail=False)
     return table_bytes
@@ -1,9 +1,9 @@
 """Main module."""
 import json
 import logging
-import tempfile
 import zipfile
-from pathlib import Path
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
 
 import pandas as pd
 
@@ -12,53 +12,200 @@ import pmc_tables
 logger = logging.getLogger(__name__)
 
 
-def save_archive_to_hdf5(archive: zipfile.ZipFile, store: pd.HDFStore, swallow_errors=True) -> dict:
-    """Save file from an open ZIP archive into an open HDF5 file."""
-    # Info
+def save_archive_to_hdf5(archive: zipfile.ZipFile, store: pd.HDFStore, swallow_errors=True,
+                         ledger: Optional['pmc_tables.IngestionLedger'] = None,
+                         sinks: Sequence = (),
+                         parser_cache: Optional['pmc_tables.ParserCache'] = None,
+                         blob_store: Optional['pmc_tables.writers.TableBlobStore'] = None
+                         ) -> dict:
+    """Save file from an open ZIP archive into an open HDF5 file.
+
+    Args:
+        archive: Archive created by `loaders.get_pmc_archive`.
+        store: Output HDF5 file, or a `writers.ShardedHDFStore`.
+        swallow_errors: If ``False``, raise errors encountered while fixing or writing tables.
+        ledger: Ledger used to keep track of which archives have been written.
+            If provided, archives are skipped based on the ledger, and archives which were only
+            partially written (e.g. because of a crash) are written again.
+        sinks: Objects (e.g. `writers.TableCatalog`) with an ``add_archive(tables, info)``
+            method, which is called after the tables of the archive have been written,
+            and a ``flush`` method. Sinks are not flushed here: if `ledger` is provided,
+            the archive is only marked as finished by the next call to `commit_archives`.
+        parser_cache: Cache used to avoid parsing the same files again.
+        blob_store: Store for the raw markup of tables (see `write_archive_tables`).
+
+    Returns:
+        The `info` dictionary of the archive, or ``None`` if the archive was skipped.
+    """
+    info = read_archive_info(archive)
+    pmc_id = info['pmc_id']
+    logger.debug("pmc_id: `%s`", pmc_id)
+    if ledger is None:
+        if pmc_id in pmc_tables.ledger.DEFAULT_SKIP_LIST:
+            logger.info("Skipping blacklisted PMC ID `%s`...", pmc_id)
+            return
+        # Don't process a PMC node if it already exists
+        if _node_exists(pmc_id, store):
+            logger.info("PMC id `%s` already exists. Skipping...", pmc_id)
+            return
+        tables = extract_archive_tables(archive, info, swallow_errors, parser_cache)
+        write_archive_tables(
+            tables, info, store, swallow_errors, sinks=sinks, blob_store=blob_store)
+        return info
+
+    if ledger.is_skipped(pmc_id):
+        logger.info("Skipping PMC ID `%s` found in the skip list...", pmc_id)
+        return
+    content_hash = pmc_tables.ledger.get_archive_hash(archive)
+    if ledger.is_completed(pmc_id, content_hash):
+        logger.info("PMC id `%s` already exists. Skipping...", pmc_id)
+        return
+    ledger.start(pmc_id, archive.filename, content_hash)
+    try:
+        tables = extract_archive_tables(archive, info, swallow_errors, parser_cache)
+        write_archive_tables(tables, info, store, swallow_errors, overwrite=True, sinks=sinks,
+                             blob_store=blob_store)
+    except Exception as e:
+        ledger.fail(pmc_id, f"{type(e)}: {e}")
+        raise
+    if sinks:
+        # Sinks are flushed for many archives at once, by `commit_archives`
+        ledger.defer_finish(pmc_id, info['status'])
+    else:
+        # Make sure that the data is on disk before it is marked as finished
+        store.flush()
+        ledger.finish(pmc_id, info['status'])
+    return info
+
+
+def commit_archives(store: pd.HDFStore, ledger: 'pmc_tables.IngestionLedger',
+                    sinks: Sequence = ()) -> int:
+    """Flush `store` and `sinks`, and mark the archives written into them as finished.
+
+    Call this every so often (e.g. every 1000 archives) and once all archives have been
+    written, when passing `sinks` to `save_archive_to_hdf5` together with a `ledger`.
+    Archives which were written but not committed before a crash are written again on restart.
+
+    Returns:
+        The number of archives which were marked as finished in `ledger`.
+    """
+    store.flush()
+    for sink in sinks:
+        sink.flush()
+    return ledger.commit()
+
+
+def read_archive_info(archive: zipfile.ZipFile) -> dict:
+    """Read the `info.json` file describing the contents of `archive`."""
     try:
         with archive.open('info.json') as fin:
             info = json.load(fin)  # type: ignore
     except KeyError as e:
         raise pmc_tables.errors.MalformedArchiveError(str(e))
     info['status'] = 'success'
+    return info
+
+
+def extract_archive_tables(archive: zipfile.ZipFile, info: dict, swallow_errors=True,
+                           parser_cache: Optional['pmc_tables.ParserCache'] = None
+                           ) -> List[Tuple[str, dict, Optional[pd.DataFrame]]]:
+    """Parse and fix all tables in `archive`, without writing anything.
+
+    This is the CPU-bound part of `save_archive_to_hdf5`, and it does not require
+    access to the output file. If `parser_cache` is provided, files which have already been
+    parsed (by the same version of the parser) are not parsed again.
+
+    Returns:
+        A list of ``(key, table_info, table_df)`` tuples. ``table_df`` is ``None``
+        for tables which could not be fixed.
+    """
     pmc_id = info['pmc_id']
-    logger.debug("pmc_id: `%s`", pmc_id)
-    if pmc_id == 'PMC5421321':
-        logger.info("Skipping blacklisted PMC ID `%s`...", pmc_id)
-        return
-    # Don't process a PMC node if it already exists
-    if _node_exists(pmc_id, store):
-        logger.info("PMC id `%s` already exists. Skipping...", pmc_id)
-        return
-    # Tables
+    data = []
     names = [n for n in archive.namelist() if n not in ['info.json']]
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        for name in names:
-            table_file = _extract_file(archive, name, tmp_dir)
-            parser = pmc_tables.parsers.get_parser(name)
+    for name in names:
+        parser = pmc_tables.parsers.get_parser(name)
+        try:
+            tables = _parse_file(archive, name, parser, parser_cache)
+        except Exception as e:
+            logger.debug("Failed to parse file `%s` (%s: %s).", name, type(e), e)
+            info['status'] = 'error'
+            continue
+        for table_id, table_info, table_df in tables:
+            assert table_id.startswith(f'/{name}')
+            # if 'table_html' in table_info:
+            #     del table_info['table_html']
+            key = f"/{pmc_id}{table_id}"
+            table_info['status'] = 'success'
             try:
-                tables = parser(table_file)
+                table_df = pmc_tables.fixers.fix_table(table_df, table_info)
             except Exception as e:
-                info['status'] = 'error'
-                continue
-            for table_id, table_info, table_df in tables:
-                assert table_id.startswith(f'/{name}')
-                # if 'table_html' in table_info:
-                #     del table_info['table_html']
-                key = f"/{pmc_id}{table_id}"
-                table_info['status'] = 'success'
-                try:
-                    pmc_tables.fixers.fix_and_write_hdf5_table(key, table_df, store, table_info)
-                except Exception as e:
-                    info['status'] = 'error'
-                    table_info['status'] = 'error'
-                    table_info['final_error'] = str(type(e))
-                    table_info['final_error_message'] = str(e)
-                    if not swallow_errors:
-                        raise e
-                pmc_tables.writers.write_hdf5_metadata(key, table_info, store)
-    pmc_tables.writers.write_hdf5_metadata(f"/{pmc_id}", info, store)
-    return info
+                _set_table_error(info, table_info, e)
+                if not swallow_errors:
+                    raise e
+                table_df = None
+            data.append((key, table_info, table_df))
+    return data
+
+
+def write_archive_tables(tables: List[Tuple[str, dict, Optional[pd.DataFrame]]], info: dict,
+                         store: pd.HDFStore, swallow_errors=True, overwrite=False,
+                         sinks: Sequence = (), stats: Optional[Counter] = None,
+                         blob_store: Optional['pmc_tables.writers.TableBlobStore'] = None
+                         ) -> None:
+    """Write tables produced by `extract_archive_tables` into an open HDF5 file.
+
+    If `overwrite` is ``True``, any data previously written for the same PMC id
+    (e.g. during an interrupted run) is removed first. The tables, as they were written,
+    are then passed to the ``add_archive`` method of every sink in `sinks`.
+    Write statistics are added to `stats` (see `fixers.write_hdf5_table_with_fixes`).
+    The raw markup of the tables is moved into `blob_store`, or stored in the metadata of the
+    tables if `blob_store` is not provided (see `writers.store_table_html`). `blob_store` is
+    committed before any metadata referencing it is written.
+    """
+    if overwrite and pmc_tables.writers.delete_hdf5_node(f"/{info['pmc_id']}", store):
+        logger.info("Removed existing data for PMC id `%s`.", info['pmc_id'])
+    for _, table_info, _ in tables:
+        pmc_tables.writers.store_table_html(table_info, blob_store)
+    if blob_store is not None:
+        blob_store.flush()
+    written_tables = []
+    for key, table_info, table_df in tables:
+        if table_df is not None:
+            try:
+                table_df = pmc_tables.fixers.write_hdf5_table_with_fixes(
+                    key, table_df, store, table_info, stats)
+            except Exception as e:
+                _set_table_error(info, table_info, e)
+                if not swallow_errors:
+                    raise e
+                table_df = None
+        pmc_tables.writers.write_hdf5_metadata(key, table_info, store)
+        written_tables.append((key, table_info, table_df))
+    pmc_tables.writers.write_hdf5_metadata(f"/{info['pmc_id']}", info, store)
+    for sink in sinks:
+        sink.add_archive(written_tables, info)
+
+
+def _parse_file(archive: zipfile.ZipFile, name: str, parser,
+                parser_cache: Optional['pmc_tables.ParserCache']
+                ) -> List[Tuple[str, dict, pd.DataFrame]]:
+    if parser_cache is None:
+        with archive.open(name) as fin:
+            return parser(fin, name)
+    key = pmc_tables.parser_cache.get_cache_key(archive.getinfo(name), parser)
+    tables = parser_cache.get(key)
+    if tables is None:
+        with archive.open(name) as fin:
+            tables = parser(fin, name)
+        parser_cache.put(key, tables)
+    return tables
+
+
+def _set_table_error(info: dict, table_info: dict, e: Exception) -> None:
+    info['status'] = 'error'
+    table_info['status'] = 'error'
+    table_info['final_error'] = str(type(e))
+    table_info['final_error_message'] = str(e)
 
 
 def _node_exists(pmc_id, store):
@@ -68,11 +215,3 @@ def _node_exists(pmc_id, store):
     except Exception:
         pass
     return node
-
-
-def _extract_file(archive, name, tmp_dir):
-    with archive.open(name) as fin:
-        table_file = Path(tmp_dir).joinpath(name)
-        with table_file.open('wb') as fout:
-            fout.write(fin.read())
-    return table_file
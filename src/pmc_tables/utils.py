@@ -25,9 +25,14 @@ def decompress_from_b85(table_gz_b85: bytes) -> bytes:
 
 
 def df_to_arrow(df, integer_columns=None, integer_dtypes=None):
+    """Convert a DataFrame to an Arrow table, storing `integer_columns` as integers.
+
+    Pandas cannot represent missing values in integer columns, so such columns are stored
+    as floats. This function converts them back to the integer types in `integer_dtypes`,
+    with missing values stored as nulls.
     """
-    Not sure what this does yet...
-    """
+    integer_columns = integer_columns or []
+    integer_dtypes = integer_dtypes or []
     extra_columns = {}
     for column, dtype in zip(integer_columns, integer_dtypes):
         extra_columns[column] = {
@@ -42,7 +47,11 @@ def df_to_arrow(df, integer_columns=None, integer_dtypes=None):
     for column_name, column_attrib in sorted(extra_columns.items(), key=lambda c: c[1]['idx']):
         array = pa.Array.from_pandas(column_attrib['data'], column_attrib['data'].isnull(),
                                      column_attrib['dtype'])
-        column = pa.Column.from_array(column_name, array)
-        table = table.add_column(column_attrib['idx'], column)
+        if hasattr(pa, 'Column'):
+            # pyarrow < 0.15
+            column = pa.Column.from_array(column_name, array)
+            table = table.add_column(column_attrib['idx'], column)
+        else:
+            table = table.add_column(column_attrib['idx'], column_name, array)
 
     return table
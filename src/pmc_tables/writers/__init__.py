@@ -1 +1,9 @@
+from .batch_reader import *
+from .blob_store import *
+from .catalog import *
+from .cell_table import *
 from .hdf5 import *
+from .inverted_index import *
+from .parquet import *
+from .sharded import *
+from .table_handle import *
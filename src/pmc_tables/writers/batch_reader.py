@@ -0,0 +1,162 @@
+"""
+Batch Reader
+------------
+
+Read many tables from a store in a single pass.
+
+Reading tables one at a time with `read_hdf5_table` pays the overhead of `pd.HDFStore.select`
+for every table. `read_hdf5_tables` groups the requested keys by file, reads them in sorted
+order, so that consecutive tables share their parent groups in the PyTables node cache, and
+reads only the raw records and attributes of every table from the file. The records are
+converted into DataFrames in a thread pool.
+
+PyTables is not thread-safe, so all reads from HDF5 files happen in the thread consuming the
+iterator; worker threads only run NumPy and pandas code.
+"""
+import concurrent.futures
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+import tables
+
+from .hdf5 import _RESERVED_ATTRIBUTES, _get_store
+from .parquet import ParquetStore, _arrow_to_df, _normalize_key
+
+logger = logging.getLogger(__name__)
+
+# (key, metadata, function converting the data read from the file into a DataFrame, arguments)
+_Task = Tuple[str, dict, Callable[..., pd.DataFrame], tuple]
+
+
+def read_hdf5_tables(keys: Iterable[str], store, num_threads: int = 4,
+                     max_pending: int = 64) -> Iterator[Tuple[str, dict, pd.DataFrame]]:
+    """Read tables `keys` from `store`, together with their metadata.
+
+    Args:
+        keys: Keys of the tables to read.
+        store: A `pd.HDFStore`, `ShardedHDFStore` or `ParquetStore`.
+        num_threads: Number of threads converting the data read from the store into DataFrames.
+        max_pending: Maximum number of tables which have been read from the store,
+            but not yet yielded.
+
+    Yields:
+        Tuples of the key, metadata (see `read_hdf5_metadata`) and DataFrame of every table,
+        ordered by file and then by key, rather than in the order of `keys`.
+    """
+    if isinstance(store, ParquetStore):
+        tasks = _iter_parquet_tasks(keys, store)
+    else:
+        tasks = _iter_hdf5_tasks(keys, store)
+    pending: Deque[Tuple[str, dict, concurrent.futures.Future]] = deque()
+    with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+        for key, metadata, fn, args in tasks:
+            pending.append((key, metadata, executor.submit(fn, *args)))
+            if len(pending) >= max_pending:
+                key, metadata, future = pending.popleft()
+                yield key, metadata, future.result()
+        while pending:
+            key, metadata, future = pending.popleft()
+            yield key, metadata, future.result()
+
+
+def _iter_hdf5_tasks(keys: Iterable[str], store) -> Iterator[_Task]:
+    keys_by_file: Dict[str, Tuple[pd.HDFStore, List[str]]] = {}
+    for key in keys:
+        key = _normalize_key(key)
+        hdf_store = _get_store(key, store)
+        keys_by_file.setdefault(hdf_store.filename, (hdf_store, []))[1].append(key)
+    for filename in sorted(keys_by_file):
+        hdf_store, file_keys = keys_by_file[filename]
+        for key in sorted(file_keys):
+            node = hdf_store.get_node(key)
+            if node is None:
+                raise KeyError(f"No object named {key} in the file.")
+            metadata, storer_attrs = {}, {}
+            attrs = node._v_attrs
+            for name in attrs._v_attrnamesuser:
+                if name in _RESERVED_ATTRIBUTES:
+                    storer_attrs[name] = attrs[name]
+                else:
+                    metadata[name] = attrs[name]
+            try:
+                table = node._f_get_child('table')
+            except tables.NoSuchNodeError:
+                table = None
+            if table is not None:
+                table_attrs = {name: table.attrs[name] for name in table.attrs._v_attrnamesuser}
+                if _can_convert_records(storer_attrs, table_attrs):
+                    yield key, metadata, _records_to_df, (table.read(), storer_attrs, table_attrs)
+                    continue
+            # Let pandas read tables in any other format
+            yield key, metadata, _identity, (hdf_store.select(key), )
+
+
+def _iter_parquet_tasks(keys: Iterable[str], store: ParquetStore) -> Iterator[_Task]:
+    for record, row_group in store.read_row_groups(keys):
+        yield (record['key'], store.get_metadata(record['key']), _arrow_to_df,
+               (row_group, record))
+
+
+def _identity(df: pd.DataFrame) -> pd.DataFrame:
+    return df
+
+
+def _can_convert_records(storer_attrs: dict, table_attrs: dict) -> bool:
+    """Return whether `_records_to_df` supports the table described by the attributes.
+
+    This is the case for tables written by `write_hdf5_table`, with an integer index and
+    numeric, boolean or string columns.
+    """
+    info = storer_attrs.get('info') or {}
+    if (storer_attrs.get('pandas_type') != 'frame_table' or storer_attrs.get('levels', 1) != 1
+            or storer_attrs.get('data_columns') or info.get('index')
+            or info.get(1, {}).get('type', 'Index') != 'Index'
+            or any(name is not None for name in info.get(1, {}).get('names', []))
+            or table_attrs.get('index_kind') != 'integer'):
+        return False
+    for block in storer_attrs.get('values_cols', []):
+        dtype = str(table_attrs.get(f'{block}_dtype'))
+        meta = table_attrs.get(f'{block}_meta')
+        if dtype.startswith('bytes'):
+            if meta not in [None, 'str']:
+                return False
+        elif dtype not in ['bool', 'float32', 'float64', 'int8', 'int16', 'int32', 'int64',
+                           'uint8', 'uint16', 'uint32', 'uint64'] or meta is not None:
+            return False
+    return True
+
+
+def _records_to_df(records: np.ndarray, storer_attrs: dict, table_attrs: dict) -> pd.DataFrame:
+    """Convert the records of a table written by `pd.HDFStore` into a DataFrame.
+
+    Builds the DataFrame in the same way as `pd.HDFStore.select`, so that both return
+    the same DataFrame.
+    """
+    index = pd.Index(records['index'])
+    nan_rep = storer_attrs.get('nan_rep') or 'nan'
+    encoding = storer_attrs.get('encoding') or 'utf-8'
+    errors = storer_attrs.get('errors') or 'strict'
+    frames = []
+    for block in storer_attrs['values_cols']:
+        values = records[block]
+        if values.dtype.kind == 'S':
+            values = _decode_strings(values, nan_rep, encoding, errors)
+        else:
+            values = values.astype(str(table_attrs[f'{block}_dtype']), copy=False)
+        frames.append(
+            pd.DataFrame(values, columns=table_attrs[f'{block}_kind'], index=index, copy=False))
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, axis=1)
+    columns = pd.Index(storer_attrs['non_index_axes'][0][1])
+    if not df.columns.equals(columns):
+        df = df.loc[:, columns]
+    return df
+
+
+def _decode_strings(values: np.ndarray, nan_rep: str, encoding: str, errors: str) -> np.ndarray:
+    decoded = np.array([value.decode(encoding, errors) for value in values.ravel().tolist()],
+                       dtype=object)
+    decoded[decoded == nan_rep] = np.nan
+    return decoded.reshape(values.shape)
@@ -0,0 +1,271 @@
+"""
+Table Blob Store
+----------------
+
+Keep the raw markup of every table (e.g. the ``<table>`` element of a JATS XML file)
+outside of the HDF5 file, so that table metadata only has to hold a reference to it.
+
+The blob store is an SQLite database stored next to the HDF5 file. Blobs are addressed by
+the SHA-1 hash of their contents, so identical tables are stored only once, and they are
+compressed with Zstandard. Table markup is small and repetitive, so once enough tables have
+been written, a compression dictionary is trained on them and used for all subsequent blobs.
+
+Compression is done by a `BlobCompressor`, which can run in a different process than the one
+writing the blob store (e.g. in the worker processes of `save_archives_to_hdf5`), so that
+only inserting the compressed blobs is left to the writer.
+"""
+import hashlib
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import zstandard as zstd
+
+from pmc_tables.utils import compress_to_b85, decompress_from_b85
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    dict_id INTEGER,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dictionaries (
+    dict_id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL
+);
+"""
+
+
+def get_blob_store_file(hdf5_file: Union[str, Path]) -> Path:
+    """Return the location of the blob store corresponding to `hdf5_file`."""
+    hdf5_file = Path(hdf5_file)
+    return hdf5_file.with_name(hdf5_file.name + '.blobs.sqlite')
+
+
+def get_blob_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class CompressedBlob(NamedTuple):
+    hash: str
+    dict_id: Optional[int]
+    data: bytes
+
+
+class BlobCompressor:
+    """Compress blobs for a `TableBlobStore`.
+
+    Once `num_training_samples` blobs have been compressed, a compression dictionary is
+    trained on them and used for all subsequent blobs. New dictionaries are returned by
+    `pop_dictionaries`, and have to be added to the blob store (see
+    `TableBlobStore.add_dictionary`) together with the blobs compressed using them.
+
+    Args:
+        compression_level: Zstandard compression level.
+        num_training_samples: Number of blobs to collect before training a compression
+            dictionary. Set to ``0`` to disable dictionary compression.
+        dict_size: Maximum size of the compression dictionary, in bytes.
+        dictionary: Id and data of a dictionary to use (see `TableBlobStore.get_dictionary`),
+            instead of training a new one.
+    """
+
+    def __init__(self, compression_level: int = 3, num_training_samples: int = 1000,
+                 dict_size: int = 112_640,
+                 dictionary: Optional[Tuple[int, bytes]] = None) -> None:
+        self.compression_level = compression_level
+        self.num_training_samples = num_training_samples
+        self.dict_size = dict_size
+        self._training_samples: List[bytes] = []
+        self._new_dictionaries: Dict[int, bytes] = {}
+        if dictionary is not None:
+            self._dict_id: Optional[int] = dictionary[0]
+            self._compressor = zstd.ZstdCompressor(
+                level=compression_level, dict_data=zstd.ZstdCompressionDict(dictionary[1]))
+        else:
+            self._dict_id = None
+            self._compressor = zstd.ZstdCompressor(level=compression_level)
+
+    def compress(self, data: bytes) -> CompressedBlob:
+        blob = CompressedBlob(get_blob_hash(data), self._dict_id, self._compressor.compress(data))
+        if self._dict_id is None and self.num_training_samples:
+            self._training_samples.append(data)
+            if len(self._training_samples) >= self.num_training_samples:
+                self._train_dictionary()
+        return blob
+
+    def pop_dictionaries(self) -> Dict[int, bytes]:
+        """Return the dictionaries trained since the last call, mapped by their ids."""
+        dictionaries, self._new_dictionaries = self._new_dictionaries, {}
+        return dictionaries
+
+    def _train_dictionary(self) -> None:
+        try:
+            dict_data = zstd.train_dictionary(self.dict_size, self._training_samples)
+        except zstd.ZstdError as e:
+            logger.warning("Could not train a compression dictionary (%s: %s).", type(e), e)
+            self.num_training_samples *= 2
+            return
+        self._training_samples = []
+        self._dict_id = dict_data.dict_id()
+        self._new_dictionaries[self._dict_id] = dict_data.as_bytes()
+        self._compressor = zstd.ZstdCompressor(level=self.compression_level, dict_data=dict_data)
+        logger.info("Trained compression dictionary %s.", self._dict_id)
+
+
+class TableBlobStore:
+    """Content-addressed, compressed store of raw table markup.
+
+    Blobs are committed on `flush` and on `close`.
+
+    Args:
+        path: Location of the SQLite database. Created if it does not exist.
+        compression_level: Zstandard compression level.
+        num_training_samples: Number of blobs to collect before training a compression
+            dictionary. Set to ``0`` to disable dictionary compression.
+        dict_size: Maximum size of the compression dictionary, in bytes.
+    """
+
+    def __init__(self, path: Union[str, Path], compression_level: int = 3,
+                 num_training_samples: int = 1000, dict_size: int = 112_640) -> None:
+        self.path = Path(path)
+        self._conn = sqlite3.connect(self.path.as_posix(), timeout=60)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Committed blobs survive a crash of the process, which is what `flush` is for
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        self._decompressors: Dict[Optional[int], zstd.ZstdDecompressor] = {
+            None: zstd.ZstdDecompressor()
+        }
+        self._compressor = BlobCompressor(compression_level, num_training_samples, dict_size,
+                                          self.get_dictionary())
+
+    def __enter__(self) -> 'TableBlobStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __contains__(self, blob_hash: str) -> bool:
+        return self._conn.execute('SELECT 1 FROM blobs WHERE hash = ?',
+                                  (blob_hash, )).fetchone() is not None
+
+    def put(self, data: bytes) -> str:
+        """Add `data` to the store, returning its hash."""
+        blob_hash = get_blob_hash(data)
+        if blob_hash in self:
+            return blob_hash
+        blob = self._compressor.compress(data)
+        for dict_id, dict_data in self._compressor.pop_dictionaries().items():
+            self.add_dictionary(dict_id, dict_data)
+        return self.put_compressed(blob)
+
+    def put_compressed(self, blob: CompressedBlob) -> str:
+        """Add a blob compressed by a `BlobCompressor` to the store, returning its hash.
+
+        The dictionary used to compress the blob must have been added to the store.
+        """
+        self._conn.execute('INSERT OR IGNORE INTO blobs (hash, dict_id, data) VALUES (?, ?, ?)',
+                           blob)
+        return blob.hash
+
+    def add_dictionary(self, dict_id: int, dict_data: bytes) -> None:
+        """Add a compression dictionary trained by a `BlobCompressor` to the store."""
+        self._conn.execute('INSERT OR IGNORE INTO dictionaries (dict_id, data) VALUES (?, ?)',
+                           (dict_id, dict_data))
+
+    def get_dictionary(self) -> Optional[Tuple[int, bytes]]:
+        """Return the id and data of a compression dictionary, or ``None`` if there is none.
+
+        Pass it to `BlobCompressor`, so that new blobs are compressed with it.
+        """
+        row = self._conn.execute(
+            'SELECT dict_id, data FROM dictionaries ORDER BY dict_id DESC LIMIT 1').fetchone()
+        return tuple(row) if row is not None else None
+
+    def get(self, blob_hash: str) -> bytes:
+        """Return the blob with hash `blob_hash`.
+
+        Raises:
+            KeyError: If the store does not contain the blob.
+        """
+        row = self._conn.execute('SELECT dict_id, data FROM blobs WHERE hash = ?',
+                                 (blob_hash, )).fetchone()
+        if row is None:
+            raise KeyError(blob_hash)
+        dict_id, data = row
+        return self._get_decompressor(dict_id).decompress(data)
+
+    def flush(self) -> None:
+        self._conn.commit()
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def _get_decompressor(self, dict_id: Optional[int]) -> zstd.ZstdDecompressor:
+        if dict_id not in self._decompressors:
+            dict_data, = self._conn.execute('SELECT data FROM dictionaries WHERE dict_id = ?',
+                                            (dict_id, )).fetchone()
+            self._decompressors[dict_id] = zstd.ZstdDecompressor(
+                dict_data=zstd.ZstdCompressionDict(dict_data))
+        return self._decompressors[dict_id]
+
+
+def compress_table_html(table_info: dict, compressor: Optional[BlobCompressor]) -> None:
+    """Compress the raw markup of a table in `table_info`, ahead of `store_table_html`.
+
+    The markup is compressed into a `CompressedBlob` if `compressor` is provided,
+    and using `utils.compress_to_b85` otherwise.
+    """
+    table_html = table_info.get('table_html')
+    if not isinstance(table_html, bytes):
+        return
+    if compressor is None:
+        table_info['table_html'] = compress_to_b85(table_html).decode('ascii')
+    else:
+        table_info['table_html'] = compressor.compress(table_html)
+
+
+def store_table_html(table_info: dict, blob_store: Optional[TableBlobStore]) -> None:
+    """Move the raw markup of a table out of `table_info`.
+
+    Parsers return the markup as bytes in ``table_info['table_html']``. It is replaced by its
+    hash (``table_info['table_html_hash']``) if `blob_store` is provided, and by the markup
+    compressed using `utils.compress_to_b85` otherwise. Markup which has already been
+    compressed by `compress_table_html` is only inserted into `blob_store`.
+    """
+    table_html = table_info.get('table_html')
+    if isinstance(table_html, CompressedBlob):
+        assert blob_store is not None
+        table_info['table_html_hash'] = blob_store.put_compressed(table_html)
+        del table_info['table_html']
+        return
+    if not isinstance(table_html, bytes):
+        return
+    if blob_store is None:
+        table_info['table_html'] = compress_to_b85(table_html).decode('ascii')
+    else:
+        table_info['table_html_hash'] = blob_store.put(table_html)
+        del table_info['table_html']
+
+
+def read_table_html(table_info: dict, blob_store: Optional[TableBlobStore] = None) -> bytes:
+    """Return the raw markup of a table, given the metadata that was written for it.
+
+    Args:
+        table_info: Metadata of the table (e.g. read using `read_hdf5_metadata`).
+        blob_store: Blob store holding the markup. Required if the markup is referenced
+            by ``table_html_hash`` rather than stored in ``table_html``.
+    """
+    if 'table_html_hash' in table_info:
+        if blob_store is None:
+            raise ValueError("`blob_store` is required to read `table_html_hash`.")
+        return blob_store.get(table_info['table_html_hash'])
+    table_html = table_info['table_html']
+    if isinstance(table_html, bytes):
+        return table_html
+    return decompress_from_b85(table_html.encode('ascii'))
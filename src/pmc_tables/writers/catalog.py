@@ -0,0 +1,155 @@
+"""
+Table Catalog
+-------------
+
+A columnar catalog with one row per extracted table, so that tables can be searched
+(e.g. by caption keyword or by `parser_name`) without opening every node of the HDF5 file.
+
+The catalog is a directory of Parquet files. Rows are buffered in memory and appended
+to the catalog as a new Parquet file whenever the buffer fills up, and on `close`.
+If an archive is written more than once, the most recent rows for each key take precedence.
+`TableCatalog.compact` merges the files of the catalog into one, dropping superseded rows.
+"""
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SCHEMA = pa.schema([
+    pa.field('pmc_id', pa.string()),
+    pa.field('key', pa.string()),
+    pa.field('label', pa.string()),
+    pa.field('caption', pa.string()),
+    pa.field('footer', pa.string()),
+    pa.field('orientation', pa.string()),
+    pa.field('parser_name', pa.string()),
+    pa.field('num_rows', pa.int64()),
+    pa.field('num_columns', pa.int64()),
+    pa.field('dtypes', pa.list_(pa.string())),
+    pa.field('status', pa.string()),
+    pa.field('fixers_applied', pa.list_(pa.string())),
+])
+
+
+def get_catalog_dir(hdf5_file: Union[str, Path]) -> Path:
+    """Return the location of the catalog corresponding to `hdf5_file`."""
+    hdf5_file = Path(hdf5_file)
+    return hdf5_file.with_name(hdf5_file.name + '.catalog')
+
+
+class TableCatalog:
+    """Appendable catalog of the tables written into a store.
+
+    Pass it in `sinks` to `save_archive_to_hdf5` or `write_archive_tables`
+    to add the tables of every archive to the catalog.
+
+    Args:
+        path: Directory containing the catalog. Created if it does not exist.
+        max_buffer_size: Number of rows to keep in memory before writing them to disk.
+    """
+
+    def __init__(self, path: Union[str, Path], max_buffer_size: int = 10_000) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_buffer_size = max_buffer_size
+        self._buffer: List[dict] = []
+
+    def __enter__(self) -> 'TableCatalog':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add_archive(self, tables: List[Tuple[str, dict, Optional[pd.DataFrame]]],
+                    info: dict) -> None:
+        """Add tables produced by `extract_archive_tables` to the catalog."""
+        for key, table_info, table_df in tables:
+            self._buffer.append(_get_catalog_row(key, table_info, table_df, info['pmc_id']))
+        if len(self._buffer) >= self.max_buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append buffered rows to the catalog as a new Parquet file."""
+        if not self._buffer:
+            return
+        df = pd.DataFrame(self._buffer, columns=CATALOG_SCHEMA.names)
+        part_ids = _get_part_ids(self.path)
+        self._write_part(max(part_ids) + 1 if part_ids else 0, df)
+        self._buffer = []
+
+    def compact(self) -> None:
+        """Merge the files of the catalog into one, dropping rows which were superseded."""
+        self.flush()
+        part_ids = _get_part_ids(self.path)
+        if len(part_ids) <= 1:
+            return
+        df = read_catalog(self.path)
+        # The merged file takes the place of the last one, so that it takes precedence over
+        # the other files if the compaction is interrupted
+        self._write_part(max(part_ids), df)
+        for part_id in part_ids[:-1]:
+            self.path.joinpath(f'part-{part_id:05d}.parquet').unlink()
+
+    def close(self) -> None:
+        self.flush()
+
+    def _write_part(self, part_id: int, df: pd.DataFrame) -> None:
+        table = pa.Table.from_pandas(df, schema=CATALOG_SCHEMA, preserve_index=False)
+        tmp_file = self.path.joinpath(f'.part-{part_id:05d}.parquet.tmp')
+        pq.write_table(table, tmp_file.as_posix())
+        tmp_file.replace(self.path.joinpath(f'part-{part_id:05d}.parquet'))
+
+
+def read_catalog(path: Union[str, Path], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read the catalog in `path`.
+
+    Args:
+        path: Directory containing the catalog.
+        columns: Columns to read. Reading only the required columns is much faster.
+
+    Returns:
+        A DataFrame with one row per table.
+    """
+    parts = []
+    for part_file in sorted(Path(path).glob('part-*.parquet')):
+        read_columns = None if columns is None else list(dict.fromkeys(['key'] + columns))
+        parts.append(pq.read_table(part_file.as_posix(), columns=read_columns).to_pandas())
+    if not parts:
+        return pd.DataFrame(columns=columns or CATALOG_SCHEMA.names)
+    df = pd.concat(parts, ignore_index=True)
+    df = df.drop_duplicates('key', keep='last').reset_index(drop=True)
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def _get_part_ids(path: Path) -> List[int]:
+    return sorted(int(part_file.stem.partition('-')[-1])
+                  for part_file in path.glob('part-*.parquet'))
+
+
+def _get_catalog_row(key: str, table_info: dict, table_df: Optional[pd.DataFrame],
+                     pmc_id: str) -> dict:
+    row = {
+        'pmc_id': pmc_id,
+        'key': key,
+        'label': table_info.get('label'),
+        'caption': table_info.get('caption'),
+        'footer': table_info.get('footer'),
+        'orientation': table_info.get('orientation'),
+        'parser_name': table_info.get('parser_name'),
+        'num_rows': None,
+        'num_columns': None,
+        'dtypes': None,
+        'status': table_info.get('status'),
+        'fixers_applied': list(table_info.get('fixers_applied', [])),
+    }
+    if table_df is not None:
+        row['num_rows'], row['num_columns'] = table_df.shape
+        row['dtypes'] = [str(dtype) for dtype in table_df.dtypes]
+    return row
@@ -0,0 +1,294 @@
+"""
+Cell Table
+----------
+
+A single long-format table holding every cell of every extracted table, so that cell-level
+queries over the whole corpus (e.g. find all cells mentioning ``p.V600E``) take a single scan
+instead of opening every node of the HDF5 file.
+
+Every non-null cell is stored as one row with the columns:
+
+- ``table_key``: Key of the table in the store.
+- ``row``, ``col``: Position of the cell in the table.
+- ``header_path``: Name of the column, with the levels of multi-level headers joined by
+  ``' | '``.
+- ``value_text``: The value, formatted as a string.
+- ``value_num``: The value, for cells in numeric columns.
+
+The cell table is a Parquet dataset partitioned by the prefix of the PMC id
+(``pmc_prefix=PMC12/part-00000.parquet``), and the rows of every file are sorted by
+``table_key``, so that filters on the PMC id and on the table key only read the matching
+partitions and row groups.
+
+Every flush appends one file to each partition it touches, and the cells in it are tagged with
+the number of the file (``write_id``). If a table is written more than once, only the cells
+from its most recent write are returned. `CellTableWriter.compact` merges the files of every
+partition into one, dropping the cells which were superseded.
+"""
+import logging
+import operator
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+CELL_TABLE_SCHEMA = pa.schema([
+    pa.field('table_key', pa.string()),
+    pa.field('row', pa.int32()),
+    pa.field('col', pa.int32()),
+    pa.field('header_path', pa.string()),
+    pa.field('value_text', pa.string()),
+    pa.field('value_num', pa.float64()),
+])
+
+# Schema of the Parquet files, which also record the write that every cell comes from
+_FILE_SCHEMA = CELL_TABLE_SCHEMA.append(pa.field('write_id', pa.int32()))
+
+_FILTER_OPERATORS: Dict[str, Callable] = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda values, value: values.isin(value),
+    'not in': lambda values, value: ~values.isin(value),
+}
+
+
+def get_cell_table_dir(hdf5_file: Union[str, Path]) -> Path:
+    """Return the location of the cell table corresponding to `hdf5_file`."""
+    hdf5_file = Path(hdf5_file)
+    return hdf5_file.with_name(hdf5_file.name + '.cells')
+
+
+def get_cell_table_partition(pmc_id: str, prefix_length: int = 2) -> str:
+    """Return the partition holding the cells of `pmc_id` (e.g. ``'PMC22'``)."""
+    return pmc_id[:len('PMC') + prefix_length]
+
+
+def get_table_cells(key: str, table_df: pd.DataFrame) -> pd.DataFrame:
+    """Return the non-null cells of `table_df`, with the columns of `CELL_TABLE_SCHEMA`."""
+    data: Dict[str, list] = defaultdict(list)
+    for col, column in enumerate(table_df.columns):
+        values = table_df.iloc[:, col]
+        is_notnull = values.notnull().values
+        if not is_notnull.any():
+            continue
+        values = values[is_notnull]
+        data['row'].append(np.flatnonzero(is_notnull).astype(np.int32))
+        data['col'].append(np.full(len(values), col, dtype=np.int32))
+        data['header_path'].append(np.full(len(values), _get_header_path(column), dtype=object))
+        data['value_text'].append(values.astype(str).values.astype(object))
+        if values.dtype.kind in 'iuf':
+            data['value_num'].append(values.values.astype(np.float64))
+        else:
+            data['value_num'].append(np.full(len(values), np.nan))
+    if not data:
+        return pd.DataFrame(columns=CELL_TABLE_SCHEMA.names)
+    df = pd.DataFrame({column: np.concatenate(arrays) for column, arrays in data.items()},
+                      columns=CELL_TABLE_SCHEMA.names[1:])
+    df.insert(0, 'table_key', key)
+    return df
+
+
+class CellTableWriter:
+    """Add the cells of every table written into a store to the cell table in `path`.
+
+    Pass it in `sinks` to `save_archive_to_hdf5` or `write_archive_tables`.
+
+    Args:
+        path: Directory containing the cell table. Created if it does not exist.
+        prefix_length: Number of digits of the PMC id used to partition the cell table.
+        max_buffer_size: Number of cells to keep in memory before writing them to disk.
+        row_group_size: Number of cells in every Parquet row group. Smaller row groups
+            allow more of the cell table to be skipped when filtering by ``table_key``.
+    """
+
+    def __init__(self, path: Union[str, Path], prefix_length: int = 2,
+                 max_buffer_size: int = 1_000_000, row_group_size: int = 100_000) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.prefix_length = prefix_length
+        self.max_buffer_size = max_buffer_size
+        self.row_group_size = row_group_size
+        self._buffer: Dict[str, Dict[str, pd.DataFrame]] = defaultdict(dict)
+        self._buffer_size = 0
+
+    def __enter__(self) -> 'CellTableWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add_archive(self, tables: List[Tuple[str, dict, Optional[pd.DataFrame]]],
+                    info: dict) -> None:
+        partition = get_cell_table_partition(info['pmc_id'], self.prefix_length)
+        for key, table_info, table_df in tables:
+            if table_df is None or table_df.empty:
+                continue
+            cells = get_table_cells(key, table_df)
+            if len(cells):
+                # A table which is written again before the buffer is flushed replaces its cells
+                if key in self._buffer[partition]:
+                    self._buffer_size -= len(self._buffer[partition][key])
+                self._buffer[partition][key] = cells
+                self._buffer_size += len(cells)
+        if self._buffer_size >= self.max_buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append buffered cells to every partition as a new Parquet file."""
+        for partition, dfs in sorted(self._buffer.items()):
+            if not dfs:
+                continue
+            df = pd.concat([dfs[key] for key in sorted(dfs)], ignore_index=True)
+            partition_dir = self.path.joinpath(f'pmc_prefix={partition}')
+            partition_dir.mkdir(exist_ok=True)
+            part_files = _get_part_files(partition_dir)
+            write_id = max(part_files) + 1 if part_files else 0
+            self._write_part(partition_dir, write_id, df)
+        self._buffer = defaultdict(dict)
+        self._buffer_size = 0
+
+    def compact(self) -> None:
+        """Merge the files of every partition into one, dropping superseded cells.
+
+        This rewrites every partition made up of more than one file, so it is best done once
+        all archives have been written.
+        """
+        self.flush()
+        for partition_dir in sorted(self.path.glob('pmc_prefix=*')):
+            part_files = _get_part_files(partition_dir)
+            if len(part_files) <= 1:
+                continue
+            df = pq.read_table(partition_dir.as_posix()).to_pandas()
+            df = df[_get_latest_mask(df, _get_latest_write_ids(partition_dir))]
+            df = df.sort_values('table_key', kind='mergesort')
+            # The merged file takes the place of the last one, so that a partial compaction
+            # leaves cells which are superseded by the merged file
+            write_id = max(part_files)
+            self._write_part(partition_dir, write_id, df[CELL_TABLE_SCHEMA.names])
+            for part_id, part_file in part_files.items():
+                if part_id != write_id:
+                    part_file.unlink()
+
+    def close(self) -> None:
+        self.flush()
+
+    def _write_part(self, partition_dir: Path, write_id: int, df: pd.DataFrame) -> None:
+        df = df.assign(write_id=np.int32(write_id))
+        table = pa.Table.from_pandas(df, schema=_FILE_SCHEMA, preserve_index=False)
+        tmp_file = partition_dir.joinpath(f'.part-{write_id:05d}.parquet.tmp')
+        pq.write_table(table, tmp_file.as_posix(), row_group_size=self.row_group_size)
+        tmp_file.replace(partition_dir.joinpath(f'part-{write_id:05d}.parquet'))
+
+
+def read_cell_table(path: Union[str, Path], columns: Optional[List[str]] = None,
+                    filters: Optional[list] = None) -> pd.DataFrame:
+    """Read the cell table in `path`.
+
+    Args:
+        path: Directory containing the cell table.
+        columns: Columns to read. Reading only the required columns is much faster.
+        filters: Predicates on the columns of the cell table and on ``pmc_prefix``
+            (e.g. ``[('pmc_prefix', '=', 'PMC22'), ('value_num', '>', 0.5)]``;
+            see `pyarrow.parquet.read_table`). They are checked against partition names
+            and row group statistics, so that only the matching parts of the table are read,
+            and then applied to the rows which were read. A list of lists of predicates
+            is the disjunction of the conjunctions of the predicates in every list.
+
+    Returns:
+        A DataFrame with one row per cell. Only the cells from the most recent write of
+        every table are returned.
+    """
+    if not any(Path(path).glob('pmc_prefix=*/part-*.parquet')):
+        return pd.DataFrame(columns=columns or CELL_TABLE_SCHEMA.names + ['pmc_prefix'])
+    if filters and not isinstance(filters[0], list):
+        filters = [filters]
+    read_columns = columns
+    if columns is not None:
+        filter_columns = {column for predicates in filters or [] for column, _, _ in predicates}
+        filter_columns.update(['table_key', 'pmc_prefix', 'write_id'])
+        read_columns = columns + sorted(filter_columns - set(columns))
+    # Older versions of pyarrow use filters only to skip partitions and row groups,
+    # and always add the partition keys to the columns
+    table = pq.read_table(Path(path).as_posix(), columns=read_columns, filters=filters)
+    df = table.to_pandas()
+    if 'pmc_prefix' in df:
+        df['pmc_prefix'] = df['pmc_prefix'].astype(str)
+    if filters:
+        df = df[_get_filter_mask(df, filters)]
+    df = _drop_superseded_cells(Path(path), df)
+    df = df[columns if columns is not None else CELL_TABLE_SCHEMA.names + ['pmc_prefix']]
+    return df.reset_index(drop=True)
+
+
+def search_cells(path: Union[str, Path], pattern: str, filters: Optional[list] = None,
+                 flags: int = 0) -> pd.DataFrame:
+    """Return the cells in the cell table in `path` whose text matches the regex `pattern`.
+
+    Args:
+        path: Directory containing the cell table.
+        pattern: Regular expression searched for in ``value_text``.
+        filters: Predicates restricting the cells which are searched (see `read_cell_table`).
+        flags: Flags of the regular expression (e.g. ``re.IGNORECASE``).
+    """
+    df = read_cell_table(
+        path, columns=['table_key', 'row', 'col', 'header_path', 'value_text'], filters=filters)
+    is_match = df['value_text'].str.contains(pattern, flags=flags, regex=True, na=False)
+    return df[is_match.values].reset_index(drop=True)
+
+
+def _get_part_files(partition_dir: Path) -> Dict[int, Path]:
+    return {
+        int(part_file.stem.partition('-')[-1]): part_file
+        for part_file in partition_dir.glob('part-*.parquet')
+    }
+
+
+def _get_latest_write_ids(partition_dir: Path) -> pd.Series:
+    """Return the most recent ``write_id`` of every table in `partition_dir`."""
+    df = pq.read_table(partition_dir.as_posix(), columns=['table_key', 'write_id']).to_pandas()
+    return df.groupby('table_key')['write_id'].max()
+
+
+def _get_latest_mask(df: pd.DataFrame, latest_write_ids: pd.Series) -> np.ndarray:
+    return df['write_id'].values >= latest_write_ids.reindex(df['table_key']).fillna(-1).values
+
+
+def _drop_superseded_cells(path: Path, df: pd.DataFrame) -> pd.DataFrame:
+    # Partitions made up of a single file hold only one write of every table
+    latest_write_ids = [
+        _get_latest_write_ids(path.joinpath(f'pmc_prefix={partition}'))
+        for partition in df['pmc_prefix'].unique()
+        if len(_get_part_files(path.joinpath(f'pmc_prefix={partition}'))) > 1
+    ]
+    if not latest_write_ids:
+        return df
+    latest_write_ids = pd.concat(latest_write_ids)
+    is_compacted = ~df['table_key'].isin(latest_write_ids.index).values
+    return df[is_compacted | _get_latest_mask(df, latest_write_ids)]
+
+
+def _get_filter_mask(df: pd.DataFrame, filters: List[list]) -> np.ndarray:
+    mask = np.zeros(len(df), dtype=bool)
+    for predicates in filters:
+        conjunction_mask = np.ones(len(df), dtype=bool)
+        for column, op, value in predicates:
+            conjunction_mask &= _FILTER_OPERATORS[op](df[column], value).values
+        mask |= conjunction_mask
+    return mask
+
+
+def _get_header_path(column) -> str:
+    if isinstance(column, tuple):
+        return ' | '.join(str(level) for level in column)
+    return str(column)
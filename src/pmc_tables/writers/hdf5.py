@@ -6,25 +6,39 @@ import tables
 
 import pmc_tables
 
+from .parquet import ParquetStore
+from .sharded import ShardedHDFStore
+
 logger = logging.getLogger(__name__)
 
 _RESERVED_ATTRIBUTES = [
     '_v__nodefile', '_v__nodepath', '_v_attrnames', '_v_unimplemented', '_v__format_version',
     '_v_attrnamessys', '_v_attrnamesuser', 'TITLE', 'CLASS', 'VERSION', 'pandas_type',
     'pandas_version', 'table_type', 'index_cols', 'values_cols', 'non_index_axes', 'data_columns',
-    'nan_rep', 'encoding', 'levels', 'metadata', 'info'
+    'nan_rep', 'encoding', 'errors', 'levels', 'metadata', 'info'
 ]
 
 
 def write_hdf5_table(key: str, df: pd.DataFrame, store: pd.HDFStore):
-    store.put(key, df, format='table', encoding='utf-8')
+    # Tables are small, so a PyTables index does not speed up queries,
+    # but it has to be loaded every time a table is opened.
+    store.put(key, df, format='table', encoding='utf-8', index=False)
 
 
 def write_hdf5_metadata(key: str, value: dict, store: pd.HDFStore):
+    """Write the items of `value` as attributes of node `key`, creating the node if necessary.
+
+    The node is resolved only once for all attributes.
+    Reserved attribute names are rejected before anything is written.
+    """
+    if isinstance(store, ParquetStore):
+        return store.set_metadata(key, value)
+    reserved_attributes = [attr_key for attr_key in value if attr_key in _RESERVED_ATTRIBUTES]
+    if reserved_attributes:
+        raise pmc_tables.errors.ReservedAttributeError(reserved_attributes[0])
+    store = _get_store(key, store)
+    node = _get_or_create_node(key, store)
     for attr_key, attr_value in value.items():
-        node = _get_or_create_node(key, store)
-        if attr_key in _RESERVED_ATTRIBUTES:
-            raise pmc_tables.ReservedAttributeError(attr_key)  # type: ignore
         try:
             node._f_setattr(attr_key, attr_value)
         except tables.exceptions.HDF5ExtError as e:
@@ -35,6 +49,13 @@ def write_hdf5_metadata(key: str, value: dict, store: pd.HDFStore):
                          type(e), e)
 
 
+def _get_store(key: str, store: pd.HDFStore) -> pd.HDFStore:
+    """Return the HDF5 file which holds `key`, resolving shards of a `ShardedHDFStore`."""
+    if isinstance(store, ShardedHDFStore):
+        return store.get_shard_for_key(key)
+    return store
+
+
 def _get_or_create_node(key: str, store: pd.HDFStore) -> tables.Node:
     node = None
     # Get the node
@@ -65,11 +86,24 @@ def _create_node(key: str, store: pd.HDFStore) -> tables.Node:
     return node
 
 
+def delete_hdf5_node(key: str, store: pd.HDFStore) -> bool:
+    """Delete the node `key`, together with all of its children, if it exists."""
+    if isinstance(store, (ShardedHDFStore, ParquetStore)):
+        return store.remove(key)
+    try:
+        store._handle.remove_node(key, recursive=True)
+    except tables.exceptions.NoSuchNodeError:
+        return False
+    return True
+
+
 def read_hdf5_table(key: str, store: pd.HDFStore) -> pd.DataFrame:
     return store.get(key)
 
 
 def read_hdf5_metadata(key: str, store: pd.HDFStore) -> dict:
+    if isinstance(store, ParquetStore):
+        return store.get_metadata(key)
     node = store.get_node(key)
     metadata = {}
     for attr_key in set(node._v_attrs.__dict__.keys()) - set(_RESERVED_ATTRIBUTES):
@@ -0,0 +1,241 @@
+"""
+Inverted Index
+--------------
+
+Map terms found in table captions, footers, column names and cells to table keys,
+so that tables mentioning e.g. a set of gene symbols can be found without loading them.
+
+The index is built incrementally by `InvertedIndexWriter`, which is used as a sink
+of `write_archive_tables`. Every flush writes an immutable segment containing:
+
+- ``keys.npy``: The table keys, indexed by document id.
+- ``terms.npy``: The sorted terms.
+- ``offsets.npy``: The postings of ``terms[i]`` are ``postings[offsets[i]:offsets[i + 1]]``.
+- ``postings.npy``: Document ids.
+
+`InvertedIndex` opens all segments as memory-mapped arrays and looks up many terms at once
+using binary search. Results are candidates: a table which was written more than once
+is returned if any version of it matched. `InvertedIndexWriter.compact` merges all segments
+into one, keeping only the most recent version of every table.
+"""
+import logging
+import re
+import shutil
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MAX_TERM_LENGTH = 64
+
+_TOKEN_RE = re.compile(r'[A-Za-z0-9](?:[\w.\->+*:]*[A-Za-z0-9*])?')
+_NUMBER_RE = re.compile(r'[\d.\-+:]+$')
+
+
+def tokenize_text(text: str) -> Set[str]:
+    """Return the set of normalized terms in `text`.
+
+    Terms are lowercased, and purely numeric terms are dropped.
+    """
+    return {
+        token.lower()
+        for token in _TOKEN_RE.findall(text)
+        if len(token) <= MAX_TERM_LENGTH and not _NUMBER_RE.match(token)
+    }
+
+
+def get_table_terms(table_info: dict, table_df: Optional[pd.DataFrame]) -> Set[str]:
+    """Return all terms in the caption, footer, column names and cells of a table."""
+    terms: Set[str] = set()
+    for attr in ['caption', 'footer']:
+        if table_info.get(attr):
+            terms.update(tokenize_text(table_info[attr]))
+    if table_df is None:
+        return terms
+    for column in table_df.columns:
+        for level in (column if isinstance(column, tuple) else (column, )):
+            terms.update(tokenize_text(str(level)))
+    # Tokenize every distinct string cell only once
+    object_columns = [
+        i for i, dtype in enumerate(table_df.dtypes)
+        if dtype == object or pd.api.types.is_string_dtype(dtype)
+    ]
+    if object_columns:
+        values = pd.unique(table_df.iloc[:, object_columns].values.ravel())
+        for value in values:
+            if isinstance(value, str):
+                terms.update(tokenize_text(value))
+    return terms
+
+
+class InvertedIndexWriter:
+    """Add the tables of every archive to the inverted index in `path`.
+
+    Pass it in `sinks` to `save_archive_to_hdf5` or `write_archive_tables`.
+
+    Args:
+        path: Directory containing the index. Created if it does not exist.
+        max_buffer_size: Number of tables to keep in memory before writing a new segment.
+    """
+
+    def __init__(self, path: Union[str, Path], max_buffer_size: int = 50_000) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_buffer_size = max_buffer_size
+        self._keys: List[str] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+    def __enter__(self) -> 'InvertedIndexWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add_table(self, key: str, table_info: dict, table_df: Optional[pd.DataFrame]) -> None:
+        doc_id = len(self._keys)
+        self._keys.append(key)
+        for term in get_table_terms(table_info, table_df):
+            self._postings[term].append(doc_id)
+
+    def add_archive(self, tables: List[Tuple[str, dict, Optional[pd.DataFrame]]],
+                    info: dict) -> None:
+        for key, table_info, table_df in tables:
+            self.add_table(key, table_info, table_df)
+        if len(self._keys) >= self.max_buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered tables to disk as a new segment."""
+        if not self._keys:
+            return
+        terms = sorted(self._postings)
+        lengths = np.array([len(self._postings[term]) for term in terms], dtype=np.int64)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        postings = np.fromiter(
+            (doc_id for term in terms for doc_id in self._postings[term]),
+            dtype=np.int32, count=int(offsets[-1]))
+        segment_ids = _get_segment_ids(self.path)
+        self._write_segment(max(segment_ids) + 1 if segment_ids else 0, {
+            'keys': np.array(self._keys, dtype=str),
+            'terms': np.array(terms, dtype=str),
+            'offsets': offsets,
+            'postings': postings,
+        })
+        self._keys = []
+        self._postings = defaultdict(list)
+
+    def compact(self) -> None:
+        """Merge all segments into one, dropping earlier versions of tables written again."""
+        self.flush()
+        segment_ids = _get_segment_ids(self.path)
+        if len(segment_ids) <= 1:
+            return
+        segments = [_load_segment(self.path.joinpath(f'segment-{segment_id:05d}'))
+                    for segment_id in segment_ids]
+        # Number the most recent version of every table, in the order of the segments
+        latest: Dict[str, Tuple[int, int]] = {}
+        for segment_idx, segment in enumerate(segments):
+            for doc_id, key in enumerate(segment['keys'].tolist()):
+                latest[key] = (segment_idx, doc_id)
+        keys = sorted(latest, key=latest.__getitem__)
+        # Map the document ids of every segment to the merged ones (``-1`` for dropped tables)
+        new_doc_ids = [np.full(len(segment['keys']), -1, dtype=np.int32) for segment in segments]
+        for new_doc_id, key in enumerate(keys):
+            segment_idx, doc_id = latest[key]
+            new_doc_ids[segment_idx][doc_id] = new_doc_id
+        all_terms, all_postings = [], []
+        for segment, segment_new_doc_ids in zip(segments, new_doc_ids):
+            postings = segment_new_doc_ids[segment['postings']]
+            terms = np.repeat(segment['terms'], np.diff(segment['offsets']))
+            all_terms.append(terms[postings >= 0])
+            all_postings.append(postings[postings >= 0])
+        terms = np.concatenate(all_terms)
+        postings = np.concatenate(all_postings)
+        order = np.argsort(terms, kind='mergesort')
+        terms, postings = terms[order], postings[order]
+        unique_terms, starts = np.unique(terms, return_index=True)
+        offsets = np.append(starts, len(terms)).astype(np.int64)
+        # The merged segment is written before the others are removed, so that an interrupted
+        # compaction only leaves superfluous candidates
+        self._write_segment(max(segment_ids) + 1, {
+            'keys': np.array(keys, dtype=str),
+            'terms': unique_terms,
+            'offsets': offsets,
+            'postings': postings,
+        })
+        for segment_id in segment_ids:
+            shutil.rmtree(self.path.joinpath(f'segment-{segment_id:05d}').as_posix())
+
+    def close(self) -> None:
+        self.flush()
+
+    def _write_segment(self, segment_id: int, arrays: Dict[str, np.ndarray]) -> None:
+        tmp_dir = self.path.joinpath(f'.segment-{segment_id:05d}.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir.as_posix())
+        tmp_dir.mkdir()
+        for name, array in arrays.items():
+            np.save(tmp_dir.joinpath(f'{name}.npy').as_posix(), array)
+        tmp_dir.rename(self.path.joinpath(f'segment-{segment_id:05d}'))
+
+
+class InvertedIndex:
+    """Read-only view of the inverted index in `path`.
+
+    Args:
+        path: Directory containing the index.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._segments = []
+        for segment_dir in sorted(self.path.glob('segment-*')):
+            self._segments.append(_load_segment(segment_dir, mmap_mode='r'))
+
+    def lookup(self, terms: Iterable[str]) -> Dict[str, Set[str]]:
+        """Return a mapping from each term in `terms` to the keys of tables which contain it.
+
+        Terms are normalized in the same way as the text that was indexed.
+        Terms which are not found in any table are omitted.
+        """
+        terms = sorted({term.lower() for term in terms})
+        results: Dict[str, Set[str]] = defaultdict(set)
+        if not terms:
+            return {}
+        query = np.array(terms, dtype=str)
+        for segment in self._segments:
+            segment_terms = segment['terms']
+            if not len(segment_terms):
+                continue
+            idxs = np.searchsorted(segment_terms, query)
+            idxs_clipped = np.minimum(idxs, len(segment_terms) - 1)
+            found = segment_terms[idxs_clipped] == query
+            for term_idx in np.flatnonzero(found):
+                i = idxs_clipped[term_idx]
+                doc_ids = segment['postings'][segment['offsets'][i]:segment['offsets'][i + 1]]
+                results[terms[term_idx]].update(segment['keys'][doc_ids].tolist())
+        return dict(results)
+
+    def search(self, terms: Iterable[str]) -> Set[str]:
+        """Return the keys of tables which contain any of `terms`."""
+        keys: Set[str] = set()
+        for term_keys in self.lookup(terms).values():
+            keys.update(term_keys)
+        return keys
+
+
+def _get_segment_ids(path: Path) -> List[int]:
+    return sorted(int(segment_dir.name.partition('-')[-1])
+                  for segment_dir in path.glob('segment-*'))
+
+
+def _load_segment(segment_dir: Path, mmap_mode: Optional[str] = None) -> Dict[str, np.ndarray]:
+    return {
+        name: np.load(segment_dir.joinpath(f'{name}.npy').as_posix(), mmap_mode=mmap_mode)
+        for name in ['keys', 'terms', 'offsets', 'postings']
+    }
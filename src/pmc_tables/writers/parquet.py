@@ -0,0 +1,316 @@
+"""
+Parquet Store
+-------------
+
+Pack many small tables into a partitioned Parquet dataset, which can be read by Spark.
+
+A Parquet file has a single schema, so tables are grouped by the types of their columns:
+columns are renamed to ``c0``, ``c1``, ... (``c0`` holds the index of the DataFrame) and all
+tables with the same column types are written, one row group per table, into files in the same
+``schema=<hash>`` partition.
+
+A sidecar index (``_index.parquet``) maps every key to its partition, file and row group,
+and stores the original column names together with the metadata of every table and archive.
+Every `ParquetStore.flush` only appends the index entries which changed since the previous
+flush, as a new index segment (``_index-00001.parquet``, ...), so that flushing often stays
+cheap. Segments are merged into ``_index.parquet`` by `ParquetStore.close`.
+"""
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pmc_tables.utils import df_to_arrow
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = '_index.parquet'
+
+INDEX_SEGMENT_GLOB = '_index-*.parquet'
+
+_INDEX_COLUMNS = [
+    'key', 'partition', 'file', 'row_group', 'num_rows', 'num_columns', 'columns', 'metadata'
+]
+
+
+class ParquetStore:
+    """A Parquet dataset which can be used in place of a `pd.HDFStore`.
+
+    It can be passed as the `store` argument to `save_archive_to_hdf5` and to the functions
+    in `pmc_tables.writers`. Tables are buffered in open Parquet writers, and the index is
+    written to disk by `flush` and `close`. Since `flush` closes all open Parquet files,
+    tables written after it go into new files, so `flush` should not be called after every
+    archive (`save_archives_to_hdf5` flushes every `commit_interval` archives).
+
+    Args:
+        path: Directory containing the dataset.
+        mode: ``'a'`` to add tables to the dataset, or ``'r'`` to only read tables.
+        max_tables_per_file: Start a new file in a partition after this many tables.
+        compression: Compression codec used for the Parquet files.
+    """
+
+    def __init__(self, path: Union[str, Path], mode: str = 'a',
+                 max_tables_per_file: int = 10_000, compression: str = 'snappy') -> None:
+        self.path = Path(path)
+        self.mode = mode
+        self.max_tables_per_file = max_tables_per_file
+        self.compression = compression
+        if mode != 'r':
+            self.path.mkdir(parents=True, exist_ok=True)
+        self._index: Dict[str, dict] = {}
+        index_file = self.path.joinpath(INDEX_FILE_NAME)
+        if index_file.is_file():
+            for record in _read_index_records(index_file):
+                self._index[record['key']] = record
+        for segment_file in self._get_index_segment_files():
+            for record in _read_index_records(segment_file):
+                if record.pop('deleted'):
+                    self._index.pop(record['key'], None)
+                else:
+                    self._index[record['key']] = record
+        # Keys which were added, changed or removed since the last flush
+        self._changed_keys: Set[str] = set()
+        # partition -> [writer, file, number of row groups]
+        self._writers: Dict[str, list] = {}
+
+    def __enter__(self) -> 'ParquetStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __contains__(self, key: str) -> bool:
+        return self._index.get(_normalize_key(key), {}).get('file') is not None
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    # === `pd.HDFStore` interface ===
+
+    def put(self, key: str, value: pd.DataFrame, **kwargs) -> None:
+        """Add table `value` to the dataset.
+
+        Extra keyword arguments (e.g. the ``format`` used by `pd.HDFStore`) are ignored.
+        """
+        key = _normalize_key(key)
+        table = _df_to_arrow(value)
+        self._changed_keys.add(key)
+        partition = hashlib.sha1(str(table.schema).encode('utf-8')).hexdigest()[:12]
+        record = self._index.setdefault(key, {'key': key, 'metadata': None})
+        record.update({
+            'partition': partition,
+            'file': None,
+            'row_group': None,
+            'num_rows': value.shape[0],
+            'num_columns': value.shape[1],
+            'columns': json.dumps([str(c) for c in value.columns]),
+        })
+        if table.num_rows:
+            record['file'], record['row_group'] = self._write_row_group(partition, table)
+        else:
+            record['file'] = ''
+
+    def get(self, key: str) -> pd.DataFrame:
+        record = self._get_record(key)
+        return _arrow_to_df(self._read_row_group(record), record)
+
+    def get_node(self, key: str) -> Optional[dict]:
+        """Return the index entry for `key`, or ``None`` if `key` is not in the index."""
+        return self._index.get(_normalize_key(key))
+
+    def remove(self, key: str) -> bool:
+        """Remove `key`, and all keys under it, from the index.
+
+        The data remains in the Parquet files, but is no longer reachable.
+        """
+        key = _normalize_key(key)
+        keys = [k for k in self._index if k == key or k.startswith(key.rstrip('/') + '/')]
+        for k in keys:
+            del self._index[k]
+        self._changed_keys.update(keys)
+        return bool(keys)
+
+    def keys(self) -> List[str]:
+        """Return the keys of all tables."""
+        return sorted(k for k, record in self._index.items() if record['file'] is not None)
+
+    def read_row_groups(self, keys: Iterable[str]) -> Iterator[Tuple[dict, Optional[pa.Table]]]:
+        """Read the row groups holding tables `keys`, opening every file only once.
+
+        Tables are read in the order in which they are stored, rather than in the order of `keys`.
+
+        Yields:
+            Tuples of the index entry (see `get_node`) and the row group (``None`` for empty
+            tables) of every table.
+
+        Raises:
+            KeyError: If any of the tables is not in the store.
+        """
+        records = sorted((self._get_record(key) for key in keys),
+                         key=lambda record: (record['file'], record['row_group'] or 0))
+        parquet_file, file = None, None
+        for record in records:
+            if record['file'] and record['file'] != file:
+                file = record['file']
+                self._close_writer(record['partition'], file)
+                parquet_file = pq.ParquetFile(self.path.joinpath(file).as_posix())
+            yield record, self._read_row_group(record, parquet_file)
+
+    def get_shape(self, key: str):
+        record = self._get_record(key)
+        return record['num_rows'], record['num_columns']
+
+    def flush(self) -> None:
+        """Close all open Parquet files and append the changes to the index to disk."""
+        for partition, (_, file, _) in list(self._writers.items()):
+            self._close_writer(partition, file)
+        if self.mode == 'r' or not self._changed_keys:
+            return
+        records = []
+        for key in sorted(self._changed_keys):
+            if key in self._index:
+                records.append({**self._index[key], 'deleted': False})
+            else:
+                records.append({'key': key, 'deleted': True})
+        segment_files = self._get_index_segment_files()
+        segment_id = int(segment_files[-1].stem.rpartition('-')[-1]) + 1 if segment_files else 1
+        _write_index_records(records, self.path.joinpath(f'_index-{segment_id:05d}.parquet'),
+                             _INDEX_COLUMNS + ['deleted'])
+        self._changed_keys = set()
+
+    def close(self) -> None:
+        """Flush the store, and merge all index segments into a single index file."""
+        self.flush()
+        segment_files = self._get_index_segment_files()
+        if self.mode == 'r' or not segment_files:
+            return
+        _write_index_records(
+            list(self._index.values()), self.path.joinpath(INDEX_FILE_NAME), _INDEX_COLUMNS)
+        # Segments which are left behind by a crash are merged again on the next `close`
+        for segment_file in segment_files:
+            segment_file.unlink()
+
+    # === Metadata ===
+
+    def set_metadata(self, key: str, value: dict) -> None:
+        key = _normalize_key(key)
+        record = self._index.setdefault(key, {
+            'key': key, 'partition': None, 'file': None, 'row_group': None, 'num_rows': None,
+            'num_columns': None, 'columns': None, 'metadata': None
+        })
+        metadata = json.loads(record['metadata']) if record['metadata'] else {}
+        metadata.update(value)
+        record['metadata'] = json.dumps(metadata, default=_json_default)
+        self._changed_keys.add(key)
+
+    def get_metadata(self, key: str) -> dict:
+        record = self._index.get(_normalize_key(key))
+        if record is None:
+            raise KeyError(f"No object named {key} in the index.")
+        return json.loads(record['metadata']) if record['metadata'] else {}
+
+    # === Private ===
+
+    def _get_index_segment_files(self) -> List[Path]:
+        return sorted(self.path.glob(INDEX_SEGMENT_GLOB))
+
+    def _get_record(self, key: str) -> dict:
+        record = self._index.get(_normalize_key(key))
+        if record is None or record['file'] is None:
+            raise KeyError(f"No object named {key} in the index.")
+        return record
+
+    def _read_row_group(self, record: dict,
+                        parquet_file: Optional[pq.ParquetFile] = None) -> Optional[pa.Table]:
+        """Read the row group holding the table in `record` (``None`` for empty tables)."""
+        if not record['file']:
+            return None
+        self._close_writer(record['partition'], record['file'])
+        if parquet_file is None:
+            parquet_file = pq.ParquetFile(self.path.joinpath(record['file']).as_posix())
+        return parquet_file.read_row_group(int(record['row_group']))
+
+    def _write_row_group(self, partition: str, table: pa.Table):
+        if partition in self._writers and self._writers[partition][2] >= self.max_tables_per_file:
+            self._close_writer(partition, self._writers[partition][1])
+        if partition not in self._writers:
+            partition_dir = self.path.joinpath(f'schema={partition}')
+            partition_dir.mkdir(exist_ok=True)
+            part_id = len(list(partition_dir.glob('part-*.parquet')))
+            file = f'schema={partition}/part-{part_id:05d}.parquet'
+            writer = pq.ParquetWriter(
+                self.path.joinpath(file).as_posix(), table.schema, compression=self.compression)
+            self._writers[partition] = [writer, file, 0]
+        writer_info = self._writers[partition]
+        writer_info[0].write_table(table, row_group_size=table.num_rows)
+        writer_info[2] += 1
+        return writer_info[1], writer_info[2] - 1
+
+    def _close_writer(self, partition: str, file: str) -> None:
+        if partition in self._writers and self._writers[partition][1] == file:
+            self._writers.pop(partition)[0].close()
+
+
+def _read_index_records(index_file: Path) -> List[dict]:
+    index_df = pq.read_table(index_file.as_posix()).to_pandas().astype(object)
+    index_df = index_df.where(index_df.notnull(), None)
+    return index_df.to_dict('records')
+
+
+def _write_index_records(records: List[dict], index_file: Path, columns: List[str]) -> None:
+    index_df = pd.DataFrame(records, columns=columns)
+    index_df['row_group'] = index_df['row_group'].astype(float)
+    tmp_file = index_file.with_name(index_file.name + '.tmp')
+    pq.write_table(pa.Table.from_pandas(index_df, preserve_index=False), tmp_file.as_posix())
+    tmp_file.replace(index_file)
+
+
+def _df_to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Convert `df` to an Arrow table with positional column names.
+
+    Float columns which contain missing values but are otherwise integers are stored as
+    integers, so that they have the correct type when the dataset is read by Spark.
+    """
+    df = df.reset_index()
+    df.columns = [f'c{i}' for i in range(len(df.columns))]
+    integer_columns = []
+    for column in df.columns:
+        values = df[column]
+        if values.dtype.kind == 'f' and values.isnull().any():
+            values = values.dropna()
+            if (values == values.round()).all() and (values.abs() < 2**53).all():
+                integer_columns.append(column)
+    table = df_to_arrow(df, integer_columns, [pa.int64()] * len(integer_columns))
+    return table.replace_schema_metadata(None)
+
+
+def _arrow_to_df(table: Optional[pa.Table], record: dict) -> pd.DataFrame:
+    """Inverse of `_df_to_arrow`, restoring the column names stored in `record`."""
+    columns = json.loads(record['columns'])
+    if table is None:
+        return pd.DataFrame(columns=columns)
+    df = table.to_pandas()
+    df = df.set_index('c0')
+    df.index.name = None
+    df.columns = columns
+    return df
+
+
+def _json_default(obj):
+    if isinstance(obj, bytes):
+        return obj.decode('latin-1')
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def _normalize_key(key: str) -> str:
+    return key if key.startswith('/') else '/' + key
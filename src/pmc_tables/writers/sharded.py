@@ -0,0 +1,190 @@
+"""
+Sharded HDF5 Store
+------------------
+
+Spread tables over multiple HDF5 files ("shards"), choosing the shard based on a hash
+of the PMC id, so that all tables from the same article end up in the same shard.
+
+A manifest (an SQLite database stored alongside the shards) maps every table key to its
+shard and records the shape of every table, so that tables can be found and read without
+opening every shard.
+"""
+import logging
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+import tables
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = 'manifest.sqlite'
+
+_MANIFEST_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS tables (
+    key TEXT PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    num_rows INTEGER,
+    num_columns INTEGER
+);
+"""
+
+
+def get_shard_id(key: str, num_shards: int) -> int:
+    """Return the shard which should hold `key`, based on the PMC id in `key`."""
+    pmc_id = key.strip('/').partition('/')[0]
+    return zlib.crc32(pmc_id.encode('utf-8')) % num_shards
+
+
+class ShardedHDFStore:
+    """A set of HDF5 files which behaves like a single `pd.HDFStore` for our purposes.
+
+    It can be passed as the `store` argument to `save_archive_to_hdf5` and
+    to the functions in `pmc_tables.writers`.
+
+    Args:
+        path: Directory containing the shards and the manifest.
+        num_shards: Number of shards. Required when creating a new store.
+            Stored in the manifest, so it does not need to be provided afterwards.
+        mode: Mode in which to open the shards (``'a'`` or ``'r'``).
+        store_kwargs: Extra arguments passed to `pd.HDFStore` (e.g. ``complib``).
+    """
+
+    def __init__(self, path: Union[str, Path], num_shards: Optional[int] = None,
+                 mode: str = 'a', **store_kwargs) -> None:
+        self.path = Path(path)
+        self.mode = mode
+        self.store_kwargs = store_kwargs
+        if mode != 'r':
+            self.path.mkdir(parents=True, exist_ok=True)
+        self._manifest = sqlite3.connect(self.path.joinpath(MANIFEST_FILE_NAME).as_posix())
+        with self._manifest:
+            self._manifest.executescript(_MANIFEST_SCHEMA)
+        self._shards: Dict[int, pd.HDFStore] = {}
+        try:
+            self.num_shards = self._init_num_shards(num_shards)
+        except ValueError:
+            self.close()
+            raise
+
+    def __enter__(self) -> 'ShardedHDFStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __contains__(self, key: str) -> bool:
+        return self._lookup(key) is not None
+
+    def __len__(self) -> int:
+        return self._manifest.execute('SELECT count(*) FROM tables').fetchone()[0]
+
+    # === Shards ===
+
+    def get_shard_file(self, shard_id: int) -> Path:
+        return self.path.joinpath(f'shard-{shard_id:04d}.h5')
+
+    def get_shard(self, shard_id: int) -> pd.HDFStore:
+        """Return the open HDF5 file for shard `shard_id`, opening it if necessary."""
+        if shard_id not in self._shards:
+            self._shards[shard_id] = pd.HDFStore(
+                self.get_shard_file(shard_id).as_posix(), mode=self.mode, **self.store_kwargs)
+        return self._shards[shard_id]
+
+    def get_shard_for_key(self, key: str) -> pd.HDFStore:
+        """Return the shard which holds (or would hold) `key`."""
+        return self.get_shard(get_shard_id(key, self.num_shards))
+
+    # === `pd.HDFStore` interface ===
+
+    def put(self, key: str, value: pd.DataFrame, **kwargs) -> None:
+        shard_id = get_shard_id(key, self.num_shards)
+        self.get_shard(shard_id).put(key, value, **kwargs)
+        num_rows, num_columns = value.shape
+        self._manifest.execute(
+            'INSERT OR REPLACE INTO tables (key, shard, num_rows, num_columns) '
+            'VALUES (?, ?, ?, ?)', (_normalize_key(key), shard_id, num_rows, num_columns))
+
+    def get(self, key: str) -> pd.DataFrame:
+        row = self._lookup(key)
+        if row is None:
+            raise KeyError(f"No object named {key} in the manifest.")
+        return self.get_shard(row[0]).get(key)
+
+    def get_node(self, key: str):
+        return self.get_shard_for_key(key).get_node(key)
+
+    def remove(self, key: str) -> bool:
+        """Remove node `key` (and all of its children) from its shard and from the manifest.
+
+        Returns:
+            ``True`` if the node existed in the shard.
+        """
+        key = _normalize_key(key)
+        prefix = key.rstrip('/')
+        # Children of `key` sort between `key/` and `key0` (``'0'`` comes right after ``'/'``)
+        self._manifest.execute('DELETE FROM tables WHERE key = ? OR (key >= ? AND key < ?)',
+                               (key, prefix + '/', prefix + '0'))
+        try:
+            self.get_shard_for_key(key)._handle.remove_node(key, recursive=True)
+        except tables.exceptions.NoSuchNodeError:
+            return False
+        return True
+
+    def keys(self) -> List[str]:
+        """Return the keys of all tables, without opening any of the shards."""
+        return [row[0] for row in self._manifest.execute('SELECT key FROM tables ORDER BY key')]
+
+    def get_shape(self, key: str) -> Tuple[int, int]:
+        """Return the number of rows and columns in table `key`, without reading the table."""
+        row = self._lookup(key)
+        if row is None:
+            raise KeyError(f"No object named {key} in the manifest.")
+        return row[1], row[2]
+
+    def flush(self) -> None:
+        """Commit the manifest and flush all open shards to disk."""
+        self._manifest.commit()
+        for shard in self._shards.values():
+            shard.flush()
+
+    def close(self) -> None:
+        if self._manifest is None:
+            return
+        self._manifest.commit()
+        self._manifest.close()
+        self._manifest = None
+        for shard in self._shards.values():
+            shard.close()
+        self._shards = {}
+
+    # === Private ===
+
+    def _init_num_shards(self, num_shards: Optional[int]) -> int:
+        row = self._manifest.execute(
+            "SELECT value FROM settings WHERE name = 'num_shards'").fetchone()
+        if row is not None:
+            if num_shards is not None and int(row[0]) != num_shards:
+                raise ValueError(f"Store {self.path} has {row[0]} shards, not {num_shards}.")
+            return int(row[0])
+        if num_shards is None:
+            raise ValueError("`num_shards` is required when creating a new store.")
+        with self._manifest:
+            self._manifest.execute(
+                "INSERT INTO settings (name, value) VALUES ('num_shards', ?)", (num_shards, ))
+        return num_shards
+
+    def _lookup(self, key: str) -> Optional[Tuple[int, int, int]]:
+        return self._manifest.execute(
+            'SELECT shard, num_rows, num_columns FROM tables WHERE key = ?',
+            (_normalize_key(key), )).fetchone()
+
+
+def _normalize_key(key: str) -> str:
+    return key if key.startswith('/') else '/' + key
@@ -0,0 +1,193 @@
+"""
+Table Handles
+-------------
+
+Lazy references to the tables in a store, for browsing the corpus without reading whole tables.
+
+A `TableHandle` reads the shape, columns and metadata of a table only when they are requested,
+and reads only the requested columns and rows of the table itself. Tables that have been read
+are kept in a `FrameCache`, which is shared by all handles unless another cache is given.
+"""
+import json
+import logging
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .hdf5 import _RESERVED_ATTRIBUTES, _get_store
+from .parquet import ParquetStore, _normalize_key
+from .sharded import ShardedHDFStore
+
+logger = logging.getLogger(__name__)
+
+
+class FrameCache:
+    """Least recently used cache of DataFrames, limited by the memory used by the DataFrames.
+
+    Args:
+        max_size: Maximum size of the cached DataFrames, in bytes.
+    """
+
+    def __init__(self, max_size: int = 256 * 1024**2) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.num_hits = 0
+        self.num_misses = 0
+        self._frames: OrderedDict = OrderedDict()
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._frames
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def get(self, key: tuple) -> Optional[pd.DataFrame]:
+        if key not in self._frames:
+            self.num_misses += 1
+            return None
+        self._frames.move_to_end(key)
+        self.num_hits += 1
+        return self._frames[key][0]
+
+    def put(self, key: tuple, df: pd.DataFrame) -> None:
+        # Most tables hold strings, which are only counted with `deep=True`
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_size:
+            return
+        if key in self._frames:
+            self.size -= self._frames.pop(key)[1]
+        self._frames[key] = (df, size)
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted_size) = self._frames.popitem(last=False)
+            self.size -= evicted_size
+
+    def clear(self) -> None:
+        self._frames.clear()
+        self.size = 0
+
+
+#: Cache used by table handles which are not given a `cache`
+default_frame_cache = FrameCache()
+
+
+class TableHandle:
+    """Lazy reference to table `key` in `store`.
+
+    Args:
+        store: A `pd.HDFStore`, `ShardedHDFStore` or `ParquetStore`.
+        key: Key of the table.
+        cache: Cache for the DataFrames read using this handle. Defaults to
+            `default_frame_cache`.
+    """
+
+    def __init__(self, store, key: str, cache: Optional[FrameCache] = None) -> None:
+        self.store = store
+        self.key = _normalize_key(key)
+        self.cache = cache if cache is not None else default_frame_cache
+        self._shape: Optional[Tuple[int, int]] = None
+        self._columns: Optional[List[str]] = None
+        self._metadata: Optional[dict] = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.key!r})"
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Number of rows and columns in the table."""
+        if self._shape is None:
+            if isinstance(self.store, (ShardedHDFStore, ParquetStore)):
+                self._shape = tuple(self.store.get_shape(self.key))  # type: ignore
+            else:
+                storer = self._get_storer()
+                self._shape = (storer.nrows, len(self.columns))
+        return self._shape  # type: ignore
+
+    @property
+    def columns(self) -> List[str]:
+        """Column names of the table."""
+        if self._columns is None:
+            if isinstance(self.store, ParquetStore):
+                record = self.store.get_node(self.key)
+                if record is None or record['file'] is None:
+                    raise KeyError(f"No object named {self.key} in the index.")
+                self._columns = json.loads(record['columns'])
+            else:
+                self._columns = list(self._get_storer().non_index_axes[0][1])
+        return self._columns  # type: ignore
+
+    @property
+    def metadata(self) -> dict:
+        """All metadata of the table (see `read_hdf5_metadata`)."""
+        if self._metadata is None:
+            if isinstance(self.store, ParquetStore):
+                self._metadata = self.store.get_metadata(self.key)
+            else:
+                attrs = self._get_node()._v_attrs
+                self._metadata = {
+                    name: attrs[name]
+                    for name in attrs._v_attrnamesuser if name not in _RESERVED_ATTRIBUTES
+                }
+        return self._metadata
+
+    def get_metadata(self, name: str, default=None):
+        """Return a single metadata attribute, without reading the others."""
+        if self._metadata is not None or isinstance(self.store, ParquetStore):
+            return self.metadata.get(name, default)
+        return getattr(self._get_node()._v_attrs, name, default)
+
+    def read(self, columns: Optional[List[str]] = None, start: Optional[int] = None,
+             stop: Optional[int] = None, where=None) -> pd.DataFrame:
+        """Read the table, or a part of it.
+
+        Args:
+            columns: Columns to read.
+            start: Position of the first row to read.
+            stop: Position after the last row to read.
+            where: Condition selecting the rows to read (see `pd.HDFStore.select`).
+                Not supported for Parquet stores.
+
+        Returns:
+            A DataFrame, which should not be modified since it is shared through the cache.
+        """
+        cache_key = (self._get_store_id(), self.key, None if columns is None else tuple(columns),
+                     start, stop, None if where is None else str(where))
+        df = self.cache.get(cache_key)
+        if df is not None:
+            return df
+        if isinstance(self.store, ParquetStore):
+            if where is not None:
+                raise ValueError("`where` is not supported for Parquet stores.")
+            df = self.store.get(self.key)
+            df = df.iloc[start:stop]
+            if columns is not None:
+                df = df[columns]
+        else:
+            df = _get_store(self.key, self.store).select(
+                self.key, where=where, start=start, stop=stop, columns=columns)
+        self.cache.put(cache_key, df)
+        return df
+
+    def _get_node(self):
+        node = self.store.get_node(self.key)
+        if node is None:
+            raise KeyError(f"No object named {self.key} in the store.")
+        return node
+
+    def _get_storer(self):
+        return _get_store(self.key, self.store).get_storer(self.key)
+
+    def _get_store_id(self) -> str:
+        if isinstance(self.store, pd.HDFStore):
+            return self.store.filename
+        return str(self.store.path)
+
+
+def iter_table_handles(store, prefix: str = '/',
+                       cache: Optional[FrameCache] = None) -> Iterator[TableHandle]:
+    """Iterate over handles to all tables in `store` whose keys start with `prefix`."""
+    prefix = _normalize_key(prefix)
+    for key in store.keys():
+        if _normalize_key(key).startswith(prefix):
+            yield TableHandle(store, key, cache)
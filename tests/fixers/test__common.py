@@ -0,0 +1,16 @@
+import pandas as pd
+
+from pmc_tables.fixers._common import fixer, has_object_columns
+
+
+def test_fixer():
+
+    @fixer(applies=has_object_columns, mutates=False)
+    def fix_something(df, info):
+        return df
+
+    assert fix_something.applies is has_object_columns
+    assert not fix_something.mutates
+    assert fixer(fix_something).mutates
+    assert has_object_columns(pd.DataFrame({'a': ['x', 1]}), {})
+    assert not has_object_columns(pd.DataFrame({'a': [1, 2]}), {})
@@ -22,3 +22,29 @@ TEST_DATA = [{
 def test_fix_column_dtypes(df, df_fixed):
     df_fixed_ = fix.fix_column_dtypes(df, {})
     assert df_fixed_.equals(df_fixed)
+
+
+@pytest.mark.parametrize("values, values_fixed", [
+    (['1', '2', '3'], [1, 2, 3]),
+    (['1.5e-3', '2 × 10−4', '3x10^2'], [1.5e-3, 2e-4, 3e2]),
+    (['12%', '3.5 %', '100%'], [12, 3.5, 100]),
+    (['1,000', '12,345.6', '1 000'], [1000, 12345.6, 1000]),
+    (['−1', '−0.5', '2'], [-1, -0.5, 2]),
+    (['1', 'NA', '—', None], [1, float('nan'), float('nan'), float('nan')]),
+    ([1, '2', None], [1, 2, float('nan')]),
+    (['1', '2', 'x'], ['1', '2', 'x']),
+    (['1,2', '3'], ['1,2', '3']),
+    (['NA', '-'], ['NA', '-']),
+])
+def test_fix_column_dtypes_values(values, values_fixed):
+    df = pd.DataFrame({'c': pd.Series(values, dtype=object)})
+    df_fixed = fix.fix_column_dtypes(df, {})
+    assert df_fixed['c'].equals(pd.Series(values_fixed))
+
+
+def test_fix_column_dtypes_duplicate_columns():
+    df = pd.DataFrame([['1', 'x'], ['2', 'y']], columns=['a', 'a'], dtype=object)
+    df_fixed = fix.fix_column_dtypes(df, {})
+    assert list(df_fixed.columns) == ['a', 'a']
+    assert df_fixed.iloc[:, 0].tolist() == [1, 2]
+    assert df_fixed.iloc[:, 1].tolist() == ['x', 'y']
@@ -21,3 +21,51 @@ TEST_DATA = [{
 def test_fix_column_names(df, df_fixed):
     df_fixed_ = fix.fix_column_names(df, {})
     assert df_fixed_.equals(df_fixed)
+
+
+def _rename_duplicates_reference(columns):
+    """Naming scheme used before the renaming was made linear-time."""
+    new_columns = []
+    for column in columns:
+        column_ref = column
+        idx = 0
+        while column in new_columns:
+            idx += 1
+            column = f'{column_ref}_{idx}'
+        new_columns.append(column)
+    return new_columns
+
+
+@pytest.mark.parametrize("columns", [
+    ['a', 'a', 'a_1', 'a', 'a_1'],
+    ['', 'Unnamed: 1', 'Unnamed: 2', '_1', '', '_2_1'],
+    [('a', 'Unnamed: 0_level_1'), ('a', ''), 'a', ('a', 'b'), 'a | b'],
+    [0, '0', 1.5, None, 'None'],
+])
+def test_fix_column_names_duplicates(columns):
+    df = pd.DataFrame([list(range(len(columns)))], columns=columns)
+    flat_columns = [
+        ' | '.join(str(c) for c in column if not str(c).startswith('Unnamed:') and str(c))
+        if isinstance(column, tuple) else
+        ('' if str(column).startswith('Unnamed:') else str(column)) for column in columns
+    ]
+    df_fixed = fix.fix_column_names(df, {})
+    assert list(df_fixed.columns) == _rename_duplicates_reference(flat_columns)
+
+
+@pytest.fixture
+def benchmark_fn(request):
+    """The `benchmark` fixture of ``pytest-benchmark``, or a plain function call without it."""
+    try:
+        return request.getfixturevalue('benchmark')
+    except pytest.FixtureLookupError:
+        return lambda fn, *args: fn(*args)
+
+
+def test_fix_column_names_10k_columns(benchmark_fn):
+    columns = [f'Unnamed: {i}' if i % 10 else f'c{i % 100}' for i in range(10000)]
+    df = pd.DataFrame([list(range(len(columns)))], columns=columns)
+    df_fixed = benchmark_fn(lambda: fix.fix_column_names(df.copy(), {}))
+    assert df_fixed.columns.is_unique
+    assert list(df_fixed.columns[:3]) == ['c0', '', '_1']
+    assert df_fixed.columns[-1] == '_8999'
@@ -48,10 +48,16 @@ def test__check_mostly_numbers(is_number_mask):
 @pytest.parametrize("df, df_fixed", TEST_DATA)
 def test_fix_extra_headers_and_footers(df, df_fixed):
     with pytest.raises(_FixDoesNotApplyError):
-        fix.fix_extra_headers_and_footers(df.copy(), {})
-    with pytest.raises(_FixDoesNotApplyError):
-        fix.fix_extra_headers_and_footers(df.copy(), {'error_message': "Something bad happened..."})
-    df_fixed_ = fix.fix_extra_headers_and_footers(df.copy(), {
-        'error_message': "Cannot serialize the column ..."
-    })
+        fix.fix_extra_headers_and_footers(df.astype(str), {})
+    df_fixed_ = fix.fix_extra_headers_and_footers(df.copy(), {})
     assert df_fixed_.equals(df_fixed)
+
+
+def test_fix_extra_headers_and_footers_footnotes():
+    rows = [['h1', 'h2'], ['u1', 'u2']] + [[i, i + 0.5] for i in range(20)]
+    footer = ['a Adjusted for age', '* p < 0.05', 'Abbreviations: h1']
+    df = pd.DataFrame(rows + [[f, f] for f in footer], columns=['c1', 'c2'])
+    assert fix._get_is_footnote_mask(df).tolist() == [False] * 22 + [True, True, False]
+    df_fixed = fix.fix_extra_headers_and_footers(df.copy(), {})
+    assert list(df_fixed.columns) == [('c1', 'h1', 'u1'), ('c2', 'h2', 'u2')]
+    assert list(df_fixed.index) == list(range(2, 22))
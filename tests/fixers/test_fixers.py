@@ -0,0 +1,66 @@
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pmc_tables import fixers
+
+
+@pytest.mark.parametrize("df, has_error", [
+    (pd.DataFrame({'a': ['x', 'y'], 'b': [1, 2]}), False),
+    (pd.DataFrame({'a': ['x', None], 'b': [np.nan, np.nan]}, dtype=object), False),
+    (pd.DataFrame({'a': ['x', 1]}), True),
+    (pd.DataFrame([['x', 'y']]), True),
+    (pd.DataFrame([['x', 'y']], columns=pd.MultiIndex.from_tuples([('a', 'b'), ('a', 'c')])),
+     True),
+])
+def test_get_hdf5_serialization_error(df, has_error):
+    assert (fixers.get_hdf5_serialization_error(df) is not None) == has_error
+
+
+def test_fix_and_write_hdf5_table(tmpdir):
+    df = pd.DataFrame(
+        [['h1', 'h2', 'h3'], [1, 1.1, 'a'], [2, 2.2, 'b']], columns=['c1', 'c2', 'c3'])
+    info = {'parser_name': 'html_parser'}
+    stats: Counter = Counter()
+    df_fixed = fixers.fix_table(df, info)
+    assert info['predicted_error'].startswith("Cannot serialize the column")
+    # A predicted error is not recorded as an error
+    assert 'error_message' not in info
+    assert fixers.get_hdf5_serialization_error(df_fixed) is None
+    with pd.HDFStore(Path(str(tmpdir)).joinpath('test.h5').as_posix(), mode='w') as store:
+        fixers.write_hdf5_table_with_fixes('/test', df_fixed, store, info, stats)
+        assert store.get('/test').equals(df_fixed)
+        # Only writes for which an error was predicted count as avoided failures
+        fixers.write_hdf5_table_with_fixes('/test2', df_fixed, store, {'error_message': ''}, stats)
+    assert stats == Counter({'num_writes': 2, 'num_writes_avoided': 1})
+
+
+def test_fixer_registry():
+    df = pd.DataFrame({'a': ['x', 'y']})
+    dfs = []
+
+    @fixers.fixer(applies=lambda df, info: info.get('apply', False), mutates=False)
+    def fix_test(df, info):
+        dfs.append(df)
+        return df
+
+    fixers.fixer_stats.clear()
+    with mock.patch.dict(fixers.FIXER_REGISTRY, {'default': []}):
+        fixers.register_fixer('default', fix_test)
+        fixers.fix_table(df, {})
+        assert not dfs
+        info = {'apply': True}
+        fixers.fix_table(df, info)
+    # The DataFrame is not copied for fixers which do not mutate it
+    assert dfs == [df] and dfs[0] is df
+    assert info['fixers_applied'] == ['fix_test']
+    summary = fixers.get_fixer_summary()
+    fixers.fixer_stats.clear()
+    assert summary['fix_test']['num_skipped'] == 1
+    assert summary['fix_test']['num_invocations'] == 1
+    assert summary['fix_test']['num_applications'] == 1
+    assert summary['fix_test']['time'] >= 0
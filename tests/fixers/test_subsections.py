@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import pmc_tables
+from pmc_tables.fixers import _FixDoesNotApplyError
+from pmc_tables.fixers import subsections as fix
+
+INFO = {'parser_name': pmc_tables.parsers.xml_parser.__name__}
+
+TEST_DATA = [
+    # Single level
+    (pd.DataFrame([['A', 'A'], ['x', 1], ['y', 2], ['B', 'B'], ['z', 3]],
+                  columns=['c1', 'c2'], dtype=object),
+     pd.DataFrame([['A', 'x', 1], ['A', 'y', 2], ['B', 'z', 3]],
+                  columns=['index_', 'c1', 'c2'], index=[1, 2, 4])),
+    # Multiple levels
+    (pd.DataFrame([['A', 'A', 'A'], ['a', 'a', None], ['x', 1, 2], ['b', 'b', None], ['y', 3, 4],
+                   ['B', 'B', 'B'], ['a', 'a', 'a'], ['z', 5, 6]],
+                  columns=['c1', 'c2', 'c3'], dtype=object),
+     pd.DataFrame([['A', 'a', 'x', 1, 2], ['A', 'b', 'y', 3, 4], ['B', 'a', 'z', 5, 6]],
+                  columns=['index_0', 'index_1', 'c1', 'c2', 'c3'], index=[2, 4, 7])),
+    # The first row is not a subsection
+    (pd.DataFrame([['x', 1], ['A', 'A'], ['y', 2]], columns=['c1', 'c2'], dtype=object),
+     pd.DataFrame([['x', 1], ['A', 'A'], ['y', 2]], columns=['c1', 'c2'], dtype=object)),
+]
+
+
+@pytest.mark.parametrize("df, df_fixed", TEST_DATA)
+def test_fix_subsections(df, df_fixed):
+    df_fixed_ = fix.fix_subsections(df, INFO)
+    assert list(df_fixed_.columns) == list(df_fixed.columns)
+    assert list(df_fixed_.index) == list(df_fixed.index)
+    assert df_fixed_.values.tolist() == df_fixed.values.tolist()
+
+
+def test_fix_subsections_other_parser():
+    with pytest.raises(_FixDoesNotApplyError):
+        fix.fix_subsections(pd.DataFrame([['A', 'A']]), {'parser_name': 'html_parser'})
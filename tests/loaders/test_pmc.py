@@ -1,8 +1,12 @@
+import ftplib
+import json
 import os.path as op
 import tempfile
+import threading
 import zipfile
 from pathlib import Path
 
+import pandas as pd
 import pytest
 
 import pmc_tables
@@ -35,3 +39,104 @@ def test_get_pmc_archive_2(source_url, source_file, output_file):
         pmc_tables.loaders.get_pmc_archive(
             BASE_PATH.joinpath(source_file).as_posix(), zip_file.name)
         compare_archive_contents(BASE_PATH.joinpath(output_file), zip_file.name)
+
+
+@pytest.mark.parametrize('source_url, source_file, output_file', TEST_FILES)
+def test_get_pmc_archive_streaming(source_url, source_file, output_file):
+    infos = []
+    for streaming in [False, True]:
+        with tempfile.NamedTemporaryFile(suffix='.zip') as zip_file:
+            pmc_tables.loaders.get_pmc_archive(
+                BASE_PATH.joinpath(source_file).as_posix(), zip_file.name, streaming=streaming)
+            compare_archive_contents(BASE_PATH.joinpath(output_file), zip_file.name)
+            with zipfile.ZipFile(zip_file.name) as archive:
+                infos.append(json.loads(archive.read('info.json').decode('utf-8')))
+    assert sorted(infos[0]['all_files']) == sorted(infos[1]['all_files'])
+    assert sorted(infos[0]['kept_files']) == sorted(infos[1]['kept_files'])
+
+
+@pytest.fixture
+def ftp_server():
+    """Serve the `source` directory over FTP from a local, anonymous server."""
+    pytest.importorskip('pyftpdlib')
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(BASE_PATH.joinpath('source').as_posix())
+    handler = type('Handler', (FTPHandler, ), {'authorizer': authorizer})
+    server = ThreadedFTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'timeout': 0.1})
+    thread.start()
+    yield 'ftp://{}:{}'.format(*server.address)
+    server.close_all()
+    thread.join()
+
+
+def test_ftp_connection_pool(ftp_server):
+    url = ftp_server.partition('//')[-1]
+    host, _, port = url.partition(':')
+    with pmc_tables.FTPConnectionPool(host, int(port), size=2) as pool:
+        for _ in range(3):
+            with tempfile.TemporaryFile() as fout:
+                pool.retrieve('/oa_package/02/f1/PMC2203987.tar.gz', fout)
+                assert fout.tell() == BASE_PATH.joinpath(TEST_FILES[0][1]).stat().st_size
+            # Error replies do not close the connection
+            with tempfile.TemporaryFile() as fout, pytest.raises(ftplib.error_perm):
+                pool.retrieve('/oa_package/00/00/PMC0000000.tar.gz', fout)
+        assert pool.num_connects == 1
+
+
+@pytest.mark.parametrize('source_url, source_file, output_file', TEST_FILES)
+def test_get_pmc_archives(source_url, source_file, output_file, ftp_server, tmpdir):
+    manifest = pd.DataFrame([{
+        'pmc_id': 'PMC2203987',
+        'source_url': f"{ftp_server}/{source_file.partition('/')[-1]}",
+        'output_file_path': f"{i}/{op.basename(output_file)}",
+    } for i in range(3)] + [{
+        'pmc_id': 'PMC0000000',
+        'source_url': f"{ftp_server}/oa_package/00/00/PMC0000000.tar.gz",
+        'output_file_path': 'missing.zip',
+    }])
+    results = pmc_tables.loaders.get_pmc_archives(
+        manifest, str(tmpdir), num_connections=2, backoff=0)
+    assert results['status'].tolist() == ['success'] * 3 + ['error']
+    for output_file_path in results['output_file_path'][:3]:
+        output_file_ = Path(str(tmpdir)).joinpath(output_file_path)
+        compare_archive_contents(BASE_PATH.joinpath(output_file), output_file_)
+        with zipfile.ZipFile(output_file_) as archive:
+            info = json.loads(archive.read('info.json').decode('utf-8'))
+        assert info['pmc_id'] == 'PMC2203987'
+
+
+def test_get_pmc_archives_corrupted(tmpdir):
+    tmpdir = Path(str(tmpdir))
+    corrupted_file = tmpdir.joinpath('PMC0000000.tar.gz')
+    corrupted_file.write_bytes(b'not a tar file')
+    manifest = pd.DataFrame([{
+        'pmc_id': 'PMC0000000',
+        'source_url': corrupted_file.as_posix(),
+        'output_file_path': 'corrupted.zip',
+    }, {
+        'pmc_id': 'PMC2203987',
+        'source_url': BASE_PATH.joinpath(TEST_FILES[0][1]).as_posix(),
+        'output_file_path': 'PMC2203987.zip',
+    }])
+    results = pmc_tables.loaders.get_pmc_archives(
+        manifest, tmpdir.joinpath('output').as_posix(), global_tmp_dir=tmpdir.as_posix())
+    assert results['status'].tolist() == ['error', 'success']
+    assert results['num_attempts'].tolist() == [1, 1]
+
+
+@pytest.mark.parametrize('source_url, source_file, output_file', TEST_FILES)
+def test_get_pmc_archive_truncated(source_url, source_file, output_file, tmpdir):
+    tmpdir = Path(str(tmpdir))
+    truncated_file = tmpdir.joinpath('PMC2203987.tar.gz')
+    data = BASE_PATH.joinpath(source_file).read_bytes()
+    truncated_file.write_bytes(data[:len(data) // 2])
+    with pytest.raises(Exception):
+        pmc_tables.loaders.get_pmc_archive(
+            truncated_file.as_posix(), tmpdir.joinpath('output', 'PMC2203987.zip').as_posix())
+    # No partial archive is left behind
+    assert not list(tmpdir.joinpath('output').iterdir())
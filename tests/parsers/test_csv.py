@@ -0,0 +1,37 @@
+import gzip
+import io
+from pathlib import Path
+
+import pytest
+
+from pmc_tables.parsers import csv_parser
+
+CSV_DATA = b"c1,c2,c3\n1,1.1,a\n2,2.2,b\n"
+TSV_DATA = b"c1\tc2\tc3\n1\t1.1\ta\n2\t2.2\tb\n"
+
+
+@pytest.mark.parametrize('name, data', [
+    ('table.csv', CSV_DATA),
+    ('table.tsv', TSV_DATA),
+    ('table.csv.gz', gzip.compress(CSV_DATA)),
+])
+def test_csv_parser(name, data, tmpdir):
+    csv_file = Path(str(tmpdir)).joinpath(name)
+    csv_file.write_bytes(data)
+    results = [
+        csv_parser(csv_file),
+        csv_parser(data, name),
+        csv_parser(io.BytesIO(data), name),
+    ]
+    for result in results:
+        assert len(result) == 1
+        table_id, table_info, table_df = result[0]
+        assert table_id == f"/{name}/sheet_0"
+        assert table_info['parser_name'] == 'csv_parser'
+        assert list(table_df.columns) == ['c1', 'c2', 'c3']
+        assert table_df.equals(results[0][0][2])
+
+
+def test_csv_parser_requires_name():
+    with pytest.raises(ValueError):
+        csv_parser(CSV_DATA)
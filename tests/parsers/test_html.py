@@ -1050,3 +1050,24 @@ def test_importcheck_thread_safety():
     while helper_thread1.is_alive() or helper_thread2.is_alive():
         pass
     assert None is helper_thread1.err is helper_thread2.err
+
+
+@pytest.mark.parametrize('rows, fill_rowspan, expected', [
+    ([(['a', 'b'], [2, 1], [1, 2]), (['c', 'd'], [1, 1], [1, 1])], True,
+     [['a', 'a', 'b'], ['c', 'd', 'b']]),
+    ([(['a', 'b'], [1, 1], [3, 1]), (['c'], [1], [1]), (['d'], [1], [1])],
+     False, [['a', 'b'], ['', 'c'], ['', 'd']]),
+    # cells carried over into a shorter row are appended to the end
+    ([(['a', 'b', 'c'], [1, 1, 1], [1, 1, 2]), (['d'], [1], [1])], True,
+     [['a', 'b', 'c'], ['d', 'c']]),
+    # a rowspan of zero spans all remaining rows
+    ([(['a', 'b'], [1, 1], [0, 1]), (['c'], [1], [1]), (['d'], [1], [1])],
+     True, [['a', 'b'], ['a', 'c'], ['a', 'd']]),
+    # rows without any text are dropped, but rowspans still advance
+    ([(['', ''], [1, 1], [2, 1]), (['a'], [1], [1]), (['b'], [1], [1])],
+     True, [['', 'a'], ['b']]),
+])
+def test_expand_spans(rows, fill_rowspan, expected):
+    result = pmc_tables.parsers._pandas.io.html._expand_spans(
+        rows, fill_rowspan=fill_rowspan)
+    assert result == expected
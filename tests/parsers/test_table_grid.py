@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import lxml.html
+import pandas as pd
+import pytest
+from lxml import etree
+
+from pmc_tables.parsers._pandas.io.html import read_html
+from pmc_tables.parsers._table_grid import table_element_to_frame
+
+XML_FILES = sorted(Path(__file__).resolve().parent.joinpath('test_xml').glob('*.nxml'))
+
+PANDAS_HTML_DIR = Path(pd.__file__).parent.joinpath('tests', 'io', 'data')
+
+HTML_FILES = sorted(PANDAS_HTML_DIR.glob('*.html')) + sorted(PANDAS_HTML_DIR.glob('*/*.html'))
+
+TABLES = [
+    # No header
+    "<table><tbody><tr><td>a</td><td>1</td></tr><tr><td>b</td><td>2.5</td></tr></tbody></table>",
+    # Header from <th> cells, unnamed and duplicate columns
+    ("<table><tr><th>A</th><th></th><th>A</th></tr>"
+     "<tr><td>1</td><td>x</td><td>NA</td></tr><tr><td>2</td><td></td><td>3</td></tr></table>"),
+    # Header from <thead>, rowspan and colspan, ragged rows
+    ("<table><thead><tr><th rowspan='2'>Gene</th><th colspan='2'>Count</th></tr></thead>"
+     "<tbody><tr><td rowspan='2'>BRCA1</td><td>1,000</td><td>-</td></tr>"
+     "<tr><td>12</td></tr><tr><td>TP53</td><td>1,2</td><td>n/a</td><td>x</td></tr>"
+     "</tbody></table>"),
+    # Multi-row header
+    ("<table><thead><tr><th>A</th><th colspan='2'>B</th></tr>"
+     "<tr><th>x</th><th>y</th><th>z</th></tr></thead>"
+     "<tbody><tr><td>1</td><td>2</td><td>3</td></tr></tbody></table>"),
+    # Rowspan reaching past the end of the next row
+    ("<table><tbody><tr><td>a</td><td>b</td><td rowspan='2'>c</td></tr>"
+     "<tr><td>d</td></tr></tbody></table>"),
+    # Boolean column
+    ("<table><tbody><tr><td>a</td><td>True</td></tr>"
+     "<tr><td>b</td><td>false</td></tr></tbody></table>"),
+    # Markup inside cells, empty rows
+    ("<table><tbody><tr><td>1<sup>a</sup></td><td><bold>x\n  y</bold></td></tr>"
+     "<tr><td></td><td></td></tr><tr><td>2</td><td>z</td></tr></tbody></table>"),
+    # Text only in the tails of child elements
+    "<table><tbody><tr><td><break/>Gene</td><td><break/>1</td></tr></tbody></table>",
+    # Integers which do not fit into an int64
+    ("<table><tbody><tr><td>a</td><td>99999999999999999999</td></tr>"
+     "<tr><td>b</td><td>9223372036854775808</td></tr></tbody></table>"),
+    # Only header rows
+    "<table><tr><th>A</th></tr><tr><td><break/>\n</td></tr></table>",
+]
+
+
+def assert_same_frame(table: etree._Element, table_html: bytes) -> None:
+    """Check that `table_element_to_frame` gives the same result as ``read_html``."""
+    try:
+        df_ = read_html(table_html)[0]
+    except Exception:
+        with pytest.raises(Exception):
+            table_element_to_frame(table)
+        return
+    df = table_element_to_frame(table)
+    assert df.equals(df_)
+    assert list(df.columns) == list(df_.columns)
+    assert list(df.dtypes) == list(df_.dtypes)
+
+
+@pytest.mark.parametrize('table', TABLES)
+def test_table_element_to_frame(table):
+    assert_same_frame(etree.fromstring(table), table.encode('utf-8'))
+
+
+@pytest.mark.parametrize('xml_file', XML_FILES, ids=lambda p: p.name)
+def test_table_element_to_frame_xml_files(xml_file):
+    tables = list(etree.parse(xml_file.as_posix()).iter('table'))
+    assert tables
+    for table in tables:
+        assert_same_frame(table, etree.tostring(table))
+
+
+@pytest.mark.skipif(not HTML_FILES, reason="The pandas test data is not installed")
+@pytest.mark.parametrize('html_file', HTML_FILES, ids=lambda p: p.name)
+def test_table_element_to_frame_html_files(html_file):
+    for table in lxml.html.parse(html_file.as_posix()).iter('table'):
+        assert_same_frame(table, lxml.html.tostring(table))
+
+
+def test_table_element_to_frame_empty():
+    with pytest.raises(ValueError):
+        table_element_to_frame(etree.fromstring("<table><tbody></tbody></table>"))
@@ -0,0 +1,56 @@
+import os.path as op
+from pathlib import Path
+
+import pytest
+
+import pmc_tables
+from pmc_tables.parsers import xml_parser
+from pmc_tables.parsers.xml import read_xml
+
+XML_FILE = Path(op.abspath(__file__)).parent.joinpath('test_xml', 'PMC0000001.nxml')
+
+
+def test_xml_parser():
+    data = xml_parser(XML_FILE)
+    assert [key for key, _, _ in data] == [
+        '/PMC0000001.nxml/T1-0', '/PMC0000001.nxml/T2-0', '/PMC0000001.nxml/T3-0',
+        '/PMC0000001.nxml/T3-1'
+    ]
+    _, info, df = data[0]
+    assert info['label'] == 'Table 1'
+    assert info['caption'] == 'Mutations in BRCA1 and TP53'
+    assert info['footer'] == 'aHotspot mutation.'
+    assert info['parser_name'] == 'xml_parser'
+    assert df.shape == (3, 4)
+    assert df.iloc[:, 0].tolist() == ['BRCA1', 'BRCA1', 'TP53']
+    _, info, df = data[1]
+    assert info['orientation'] == 'landscape'
+    assert df.iloc[0].tolist() == ['Demographics'] * 3
+
+
+def test_xml_parser_matches_read_xml():
+    for _, info, df in xml_parser(XML_FILE):
+        df_ = read_xml(info['table_html'])
+        assert df.equals(df_)
+        assert list(df.columns) == list(df_.columns)
+
+
+def test_xml_parser_inputs():
+    data = xml_parser(XML_FILE)
+    with XML_FILE.open('rb') as fin:
+        data_ = xml_parser(fin, XML_FILE.name)
+    assert data_[0][0] == data[0][0]
+    data_ = xml_parser(XML_FILE.read_bytes(), XML_FILE.name)
+    assert [d[0] for d in data_] == [d[0] for d in data]
+    assert all(d[2].equals(d_[2]) for d, d_ in zip(data, data_))
+
+
+def test_xml_parser_table_outside_table_wrap():
+    xml = b"""\
+<article><body>
+<table-wrap id="T1"><table><tbody><tr><td>a</td><td>1</td></tr></tbody></table></table-wrap>
+<p><table><tbody><tr><td>b</td><td>2</td></tr></tbody></table></p>
+</body></article>
+"""
+    with pytest.raises(pmc_tables.errors.ParserError):
+        xml_parser(xml, 'test.nxml')
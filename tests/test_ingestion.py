@@ -0,0 +1,122 @@
+import functools
+import os.path as op
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import pmc_tables
+
+ARCHIVE_FILES = [
+    Path(op.abspath(__file__)).parent.joinpath('loaders', 'test_pmc', 'output', '00', '0a',
+                                               'PMC2203987.zip'),
+]
+
+
+@pytest.mark.parametrize('num_workers', [1, 2])
+def test_save_archives_to_hdf5(num_workers, tmpdir):
+    tmpdir = Path(str(tmpdir))
+    serial_file = tmpdir.joinpath('serial.h5')
+    parallel_file = tmpdir.joinpath('parallel.h5')
+    with pd.HDFStore(serial_file.as_posix(), mode='w') as store:
+        for archive_file in ARCHIVE_FILES:
+            with zipfile.ZipFile(archive_file) as archive:
+                pmc_tables.save_archive_to_hdf5(archive, store)
+
+    summary = pmc_tables.save_archives_to_hdf5(
+        ARCHIVE_FILES, parallel_file, num_workers=num_workers)
+    assert summary['num_archives'] == len(ARCHIVE_FILES)
+    assert not summary['failed_archives']
+    assert isinstance(summary['fixers'], dict)
+
+    with pd.HDFStore(serial_file.as_posix(), mode='r') as serial_store, \
+            pd.HDFStore(parallel_file.as_posix(), mode='r') as parallel_store:
+        assert sorted(serial_store.keys()) == sorted(parallel_store.keys())
+        for key in serial_store.keys():
+            assert serial_store.get(key).equals(parallel_store.get(key))
+
+
+def test_save_archives_to_hdf5_writer_error(tmpdir):
+    """Errors in the writer are raised even if the workers are blocked on full queues."""
+    tmpdir = Path(str(tmpdir))
+    archive_files = []
+    for i in range(5):
+        archive_file = tmpdir.joinpath(f'archive-{i}.zip')
+        with zipfile.ZipFile(archive_file, 'w') as archive:
+            archive.writestr('table.csv', 'a,b\n1,2\n')
+        archive_files.append(archive_file)
+    with pytest.raises(RuntimeError):
+        pmc_tables.save_archives_to_hdf5(
+            archive_files, tmpdir.joinpath('store.h5'), num_workers=2, max_queue_size=1,
+            swallow_errors=False)
+
+
+@pytest.mark.parametrize('use_ledger', [True, False])
+def test_save_archives_to_hdf5_skips_existing(use_ledger, tmpdir):
+    hdf5_file = Path(str(tmpdir)).joinpath('store.h5')
+    pmc_tables.save_archives_to_hdf5(
+        ARCHIVE_FILES, hdf5_file, num_workers=1, use_ledger=use_ledger)
+    summary = pmc_tables.save_archives_to_hdf5(
+        ARCHIVE_FILES, hdf5_file, num_workers=1, use_ledger=use_ledger)
+    assert summary['num_skipped'] == len(ARCHIVE_FILES)
+
+
+def test_save_archives_to_sharded_hdf5(tmpdir):
+    sharded_dir = Path(str(tmpdir)).joinpath('sharded')
+    summary = pmc_tables.save_archives_to_hdf5(
+        ARCHIVE_FILES, sharded_dir, num_workers=2, num_shards=2)
+    assert summary['num_archives'] == len(ARCHIVE_FILES)
+    assert not summary['failed_archives']
+    with pmc_tables.writers.ShardedHDFStore(sharded_dir, mode='r') as store:
+        assert store.num_shards == 2
+        for archive_file in ARCHIVE_FILES:
+            pmc_id = archive_file.stem
+            assert store.get_node(f'/{pmc_id}') is not None
+
+
+@pytest.mark.parametrize('commit_interval', [1, 1000])
+def test_save_archives_to_parquet(commit_interval, tmpdir):
+    parquet_dir = Path(str(tmpdir)).joinpath('parquet')
+    summary = pmc_tables.save_archives_to_hdf5(
+        ARCHIVE_FILES, parquet_dir, num_workers=1, store_format='parquet',
+        commit_interval=commit_interval)
+    assert not summary['failed_archives']
+    with pmc_tables.IngestionLedger(pmc_tables.get_ledger_file(parquet_dir)) as ledger:
+        for archive_file in ARCHIVE_FILES:
+            assert ledger.is_completed(archive_file.stem)
+    with pmc_tables.writers.ParquetStore(parquet_dir, mode='r') as store:
+        for archive_file in ARCHIVE_FILES:
+            assert store.get_metadata(f'/{archive_file.stem}')['pmc_id'] == archive_file.stem
+
+
+def test_save_archives_to_hdf5_with_catalog(tmpdir):
+    hdf5_file = Path(str(tmpdir)).joinpath('store.h5')
+    catalog_dir = pmc_tables.writers.get_catalog_dir(hdf5_file)
+    summary = pmc_tables.save_archives_to_hdf5(
+        ARCHIVE_FILES, hdf5_file, num_workers=1,
+        sink_factories=[functools.partial(pmc_tables.writers.TableCatalog, catalog_dir)])
+    catalog_df = pmc_tables.writers.read_catalog(catalog_dir)
+    assert len(catalog_df) == summary.get('num_tables', 0)
+    # The files added by every commit are merged at the end
+    assert len(list(catalog_dir.glob('*.parquet'))) <= 1
+    with pd.HDFStore(hdf5_file.as_posix(), mode='r') as store:
+        assert sorted(catalog_df['key']) == sorted(k for k in store.keys())
+
+
+def test_save_archives_to_hdf5_with_parser_cache(tmpdir):
+    tmpdir = Path(str(tmpdir))
+    parser_cache_dir = tmpdir.joinpath('parser_cache')
+    for hdf5_file in [tmpdir.joinpath('store1.h5'), tmpdir.joinpath('store2.h5')]:
+        summary = pmc_tables.save_archives_to_hdf5(
+            ARCHIVE_FILES, hdf5_file, num_workers=1, parser_cache_dir=parser_cache_dir)
+        assert not summary['failed_archives']
+    with pmc_tables.ParserCache(parser_cache_dir) as parser_cache:
+        for archive_file in ARCHIVE_FILES:
+            with zipfile.ZipFile(archive_file) as archive:
+                for name in archive.namelist():
+                    if name == 'info.json':
+                        continue
+                    parser = pmc_tables.parsers.get_parser(name)
+                    key = pmc_tables.parser_cache.get_cache_key(archive.getinfo(name), parser)
+                    assert key in parser_cache
@@ -0,0 +1,132 @@
+import os.path as op
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import pmc_tables
+from pmc_tables.ledger import DEFAULT_SKIP_LIST, IngestionLedger, get_archive_hash
+
+ARCHIVE_FILE = Path(op.abspath(__file__)).parent.joinpath('loaders', 'test_pmc', 'output', '00',
+                                                          '0a', 'PMC2203987.zip')
+
+
+@pytest.fixture
+def ledger(tmpdir):
+    with IngestionLedger(Path(str(tmpdir)).joinpath('store.h5.ledger.sqlite')) as ledger:
+        yield ledger
+
+
+def test_ledger_status(ledger):
+    assert ledger.get_status('PMC1') is None
+    ledger.start('PMC1', 'PMC1.zip', 'hash1')
+    assert ledger.get_status('PMC1') == 'started'
+    assert not ledger.is_completed('PMC1')
+    ledger.finish('PMC1', 'success')
+    assert ledger.is_completed('PMC1')
+    assert ledger.is_completed('PMC1', 'hash1')
+    assert not ledger.is_completed('PMC1', 'hash2')
+    assert ledger.completed_archive_files() == {'PMC1.zip': 'PMC1'}
+
+
+def test_ledger_finish_many(ledger):
+    for pmc_id in ['PMC1', 'PMC2', 'PMC3']:
+        ledger.start(pmc_id, f'{pmc_id}.zip')
+    ledger.finish_many([('PMC1', 'success', 1.0), ('PMC2', 'error', None)])
+    assert ledger.completed_archive_files() == {'PMC1.zip': 'PMC1', 'PMC2.zip': 'PMC2'}
+    assert ledger.get_status('PMC3') == 'started'
+
+
+def test_ledger_failed(ledger):
+    ledger.start('PMC1', 'PMC1.zip')
+    ledger.fail('PMC1', 'Disk full')
+    assert ledger.get_status('PMC1') == 'failed'
+    assert not ledger.is_completed('PMC1')
+    assert ledger.completed_archive_files() == {}
+
+
+def test_ledger_skip_list(ledger, tmpdir):
+    assert ledger.get_skip_list() == DEFAULT_SKIP_LIST
+    ledger.add_to_skip_list('PMC1', 'Too large')
+    assert ledger.is_skipped('PMC1')
+    ledger.remove_from_skip_list('PMC1')
+    assert not ledger.is_skipped('PMC1')
+    # The default skip list is only added to new ledgers
+    for pmc_id in DEFAULT_SKIP_LIST:
+        ledger.remove_from_skip_list(pmc_id)
+    with IngestionLedger(ledger.ledger_file) as ledger_:
+        assert ledger_.get_skip_list() == {}
+
+
+def test_save_archive_to_hdf5_with_ledger(ledger, tmpdir):
+    hdf5_file = Path(str(tmpdir)).joinpath('store.h5')
+    with zipfile.ZipFile(ARCHIVE_FILE) as archive, \
+            pd.HDFStore(hdf5_file.as_posix(), mode='w') as store:
+        pmc_id = pmc_tables.read_archive_info(archive)['pmc_id']
+        assert pmc_tables.save_archive_to_hdf5(archive, store, ledger=ledger) is not None
+        assert ledger.is_completed(pmc_id, get_archive_hash(archive))
+        assert pmc_tables.save_archive_to_hdf5(archive, store, ledger=ledger) is None
+        # Archives which were not finished are written again
+        ledger.start(pmc_id, ARCHIVE_FILE.as_posix())
+        assert pmc_tables.save_archive_to_hdf5(archive, store, ledger=ledger) is not None
+        assert ledger.is_completed(pmc_id)
+        # Archives in the skip list are not written
+        ledger.start(pmc_id, ARCHIVE_FILE.as_posix())
+        ledger.add_to_skip_list(pmc_id)
+        assert pmc_tables.save_archive_to_hdf5(archive, store, ledger=ledger) is None
+
+
+class FailingSink:
+
+    def add_archive(self, tables, info):
+        raise OSError("Disk full")
+
+
+def test_save_archive_to_hdf5_retries_failed(ledger, tmpdir):
+    hdf5_file = Path(str(tmpdir)).joinpath('store.h5')
+    with zipfile.ZipFile(ARCHIVE_FILE) as archive, \
+            pd.HDFStore(hdf5_file.as_posix(), mode='w') as store:
+        pmc_id = pmc_tables.read_archive_info(archive)['pmc_id']
+        with pytest.raises(OSError):
+            pmc_tables.save_archive_to_hdf5(archive, store, ledger=ledger, sinks=[FailingSink()])
+        assert ledger.get_status(pmc_id) == 'failed'
+        assert not ledger.is_completed(pmc_id)
+        # Archives which failed are written again on the next run
+        assert pmc_tables.save_archive_to_hdf5(archive, store, ledger=ledger) is not None
+        assert ledger.is_completed(pmc_id)
+
+
+def test_ledger_defer_finish(ledger):
+    for pmc_id in ['PMC1', 'PMC2']:
+        ledger.start(pmc_id, f'{pmc_id}.zip')
+        ledger.defer_finish(pmc_id, 'success')
+    assert not ledger.is_completed('PMC1')
+    # Archives which are started again are not committed
+    ledger.start('PMC2', 'PMC2.zip')
+    assert ledger.commit() == 1
+    assert ledger.is_completed('PMC1')
+    assert ledger.get_status('PMC2') == 'started'
+    assert ledger.commit() == 0
+    # Archives which were not committed before the ledger was closed are written again
+    ledger.defer_finish('PMC2', 'error')
+    with IngestionLedger(ledger.ledger_file) as ledger_:
+        assert ledger_.commit() == 0
+        assert ledger_.get_status('PMC2') == 'started'
+
+
+def test_save_archive_to_hdf5_with_sinks(ledger, tmpdir):
+    tmpdir = Path(str(tmpdir))
+    catalog = pmc_tables.writers.TableCatalog(tmpdir.joinpath('catalog'))
+    with zipfile.ZipFile(ARCHIVE_FILE) as archive, \
+            pd.HDFStore(tmpdir.joinpath('store.h5').as_posix(), mode='w') as store:
+        pmc_id = pmc_tables.read_archive_info(archive)['pmc_id']
+        pmc_tables.save_archive_to_hdf5(archive, store, ledger=ledger, sinks=[catalog])
+        # Sinks are not flushed after every archive
+        assert not list(catalog.path.glob('*.parquet'))
+        assert not ledger.is_completed(pmc_id)
+        assert pmc_tables.commit_archives(store, ledger, sinks=[catalog]) == 1
+        # The catalog is on disk once the archive is marked as finished
+        assert ledger.is_completed(pmc_id)
+        catalog_df = pmc_tables.writers.read_catalog(catalog.path)
+        assert sorted(catalog_df['key']) == sorted(store.keys())
@@ -0,0 +1,110 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pmc_tables import EntityMatcher, get_hgnc_dictionaries
+from pmc_tables.writers import read_hdf5_metadata, write_hdf5_metadata, write_hdf5_table
+
+HGNC_DF = pd.DataFrame([
+    ['BRAF', None, 'BRAF1', 'ENSG00000157764', 'NM_004333', 'P15056'],
+    ['TP53', 'p53|LFS1', None, 'ENSG00000141510', 'NM_000546', 'P04637'],
+    ['KRAS', 'KRAS2', 'KRAS1P', 'ENSG00000133703', 'NM_004985', 'P01116'],
+    ['NKX2-1', 'TTF-1', 'TITF1', 'ENSG00000136352', 'NM_001079668', 'P43699'],
+    ['MET', 'HGFR', None, 'ENSG00000105976', 'NM_000245', 'P08581'],
+], columns=['symbol', 'alias_symbol', 'prev_symbol', 'ensembl_gene_id', 'refseq_accession',
+            'uniprot_ids'])
+
+TABLE_DF = pd.DataFrame([
+    ['BRAF', 'p.V600E', 'BRAF-mutant', 0.51],
+    ['KRAS', 'G12D', None, 0.2],
+    ['p53', 'c.524G>A (rs28934578)', 'NM_004333.4', 0.1],
+    ['NKX2-1', 'p.Val600Glu', 'Method', 0.3],
+    ['BRAF', 'V600E', 'E746_A750del', np.nan],
+], columns=['Gene', 'Mutation', 'Notes', 'VAF'])
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return EntityMatcher(get_hgnc_dictionaries(HGNC_DF))
+
+
+def test_get_hgnc_dictionaries():
+    dictionaries = get_hgnc_dictionaries(HGNC_DF)
+    assert dictionaries['gene_symbol']['NKX2-1'] == 'NKX2-1'
+    assert dictionaries['gene_synonym'] == {
+        'p53': 'TP53', 'LFS1': 'TP53', 'KRAS2': 'KRAS', 'TTF-1': 'NKX2-1', 'HGFR': 'MET',
+        'BRAF1': 'BRAF', 'KRAS1P': 'KRAS', 'TITF1': 'NKX2-1'}
+    assert dictionaries['uniprot_ids']['P15056'] == 'BRAF'
+    assert 'cosmic' not in dictionaries
+
+
+def test_match_values(matcher):
+    hits = matcher.match_values(['BRAF-mutant', 'NM_004333.4', 'METHOD', 'TTF-1', 'rs123', 42])
+    assert hits.values.tolist() == [
+        [0, 'gene_symbol', 'BRAF', 'BRAF'],
+        [1, 'refseq_accession', 'NM_004333.4', 'BRAF'],
+        [3, 'gene_synonym', 'TTF-1', 'NKX2-1'],
+        [4, 'rsid', 'rs123', 'rs123'],
+    ]
+
+
+def test_match_values_empty(matcher):
+    hits = matcher.match_values([])
+    assert hits.empty
+    assert list(hits.columns) == ['value_idx', 'entity_type', 'text', 'entity']
+
+
+def test_match_frame(matcher):
+    hits = matcher.match_frame(TABLE_DF)
+    assert list(hits.columns) == ['row', 'col', 'entity_type', 'text', 'entity']
+    assert hits[hits['col'] == 0].values.tolist() == [
+        [0, 0, 'gene_symbol', 'BRAF', 'BRAF'],
+        [1, 0, 'gene_symbol', 'KRAS', 'KRAS'],
+        [2, 0, 'gene_synonym', 'p53', 'TP53'],
+        [3, 0, 'gene_symbol', 'NKX2-1', 'NKX2-1'],
+        [4, 0, 'gene_symbol', 'BRAF', 'BRAF'],
+    ]
+    assert hits[hits['col'] == 1][['row', 'entity_type', 'text']].values.tolist() == [
+        [0, 'protein_mutation', 'p.V600E'],
+        [1, 'protein_mutation', 'G12D'],
+        [2, 'cdna_mutation', 'c.524G>A'],
+        [2, 'rsid', 'rs28934578'],
+        [3, 'protein_mutation_3', 'p.Val600Glu'],
+        [4, 'protein_mutation', 'V600E'],
+    ]
+    assert 3 not in set(hits['col'])
+
+
+def test_match_frame_no_hits(matcher):
+    hits = matcher.match_frame(pd.DataFrame({'a': ['x', 'y'], 'b': [1, 2]}))
+    assert hits.empty
+    assert list(hits.columns) == ['row', 'col', 'entity_type', 'text', 'entity']
+
+
+def test_summarize(matcher, tmpdir):
+    summary = matcher.summarize(TABLE_DF)
+    assert summary['entity_hit_counts']['gene_symbol'] == 5
+    assert summary['entity_hit_counts']['protein_mutation'] == 4
+    assert summary['entity_genes'] == ['BRAF', 'KRAS', 'NKX2-1', 'TP53']
+    assert summary['entity_mutations'] == [
+        'E746_A750del', 'G12D', 'V600E', 'c.524G>A', 'p.V600E', 'p.Val600Glu', 'rs28934578']
+    assert summary['entity_gene_columns'] == ['Gene']
+    assert summary['entity_mutation_columns'] == ['Mutation']
+
+    with pd.HDFStore(Path(str(tmpdir)).joinpath('store.h5').as_posix(), 'w') as store:
+        write_hdf5_table('/PMC1/table', TABLE_DF, store)
+        write_hdf5_metadata('/PMC1/table', summary, store)
+        assert read_hdf5_metadata('/PMC1/table', store) == summary
+
+
+def test_save_load(matcher, tmpdir):
+    path = Path(str(tmpdir)).joinpath('matcher.pickle')
+    matcher.save(path)
+    matcher_ = EntityMatcher.load(path)
+    pd.testing.assert_frame_equal(matcher_.match_frame(TABLE_DF), matcher.match_frame(TABLE_DF))
+
+    pd.to_pickle({}, path.as_posix())
+    with pytest.raises(TypeError):
+        EntityMatcher.load(path)
@@ -0,0 +1,101 @@
+import json
+import os.path as op
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pmc_tables
+from pmc_tables.parser_cache import ParserCache, get_cache_key
+
+XML_FILE = Path(op.abspath(__file__)).parent.joinpath('parsers', 'test_xml', 'PMC0000001.nxml')
+
+
+@pytest.fixture
+def parser_cache(tmpdir):
+    with ParserCache(Path(str(tmpdir)).joinpath('parser_cache')) as parser_cache:
+        yield parser_cache
+
+
+@pytest.fixture
+def archive_file(tmpdir):
+    archive_file = Path(str(tmpdir)).joinpath('PMC0000001.zip')
+    with zipfile.ZipFile(archive_file.as_posix(), 'w') as archive:
+        archive.writestr('info.json', json.dumps({'pmc_id': 'PMC0000001'}))
+        archive.write(XML_FILE.as_posix(), XML_FILE.name)
+    return archive_file
+
+
+@pytest.mark.parametrize('table_df', [
+    pd.DataFrame({'a': [1, 2], 'b': ['x', None], 'c': [0.5, np.nan]}),
+    pd.DataFrame([[1, 'x'], [2, 'y']], columns=pd.MultiIndex.from_tuples([('a', 'b'), ('a', 'c')])),
+    # Duplicate column names cannot be stored in Arrow
+    pd.DataFrame([[1, 'x'], [2, 'y']], columns=['a', 'a']),
+    pd.DataFrame([[1, 'x'], [2, 3]]),
+])
+def test_parser_cache_roundtrip(parser_cache, table_df):
+    result = [('/test.csv/0', {'label': 'Table 1'}, table_df)]
+    assert parser_cache.get('key') is None
+    parser_cache.put('key', result)
+    assert 'key' in parser_cache
+    result_ = parser_cache.get('key')
+    assert result_[0][:2] == result[0][:2]
+    assert result_[0][2].equals(table_df)
+    assert list(result_[0][2].columns) == list(table_df.columns)
+    assert list(result_[0][2].dtypes) == list(table_df.dtypes)
+    assert (parser_cache.num_hits, parser_cache.num_misses) == (1, 1)
+
+
+def test_parser_cache_eviction(parser_cache):
+    table_df = pd.DataFrame({'a': range(100)})
+    parser_cache.put('key1', [('/test.csv/0', {}, table_df)])
+    parser_cache.max_size = parser_cache.get_size() * 2
+    parser_cache.put('key2', [('/test.csv/0', {}, table_df)])
+    parser_cache.get('key1')
+    # The least recently used result is evicted
+    parser_cache.put('key3', [('/test.csv/0', {}, table_df)])
+    assert 'key1' in parser_cache and 'key3' in parser_cache
+    assert 'key2' not in parser_cache
+    assert parser_cache.get_size() <= parser_cache.max_size
+    assert not parser_cache.cache_dir.joinpath('ke', 'key2').exists()
+
+
+def test_parser_cache_size(parser_cache):
+    parser_cache.put('key1', [('/test.csv/0', {}, pd.DataFrame({'a': range(100)}))])
+    parser_cache.put('key2', [('/test.csv/0', {}, pd.DataFrame({'a': range(1000)}))])
+    parser_cache.put('key1', [('/test.csv/0', {}, pd.DataFrame({'a': range(10)}))])
+    parser_cache.remove('key2')
+    parser_cache.remove('missing')
+    # The running total matches the sizes of the results
+    size, = parser_cache._conn.execute('SELECT sum(size) FROM results').fetchone()
+    assert parser_cache.get_size() == size
+    with ParserCache(parser_cache.cache_dir) as parser_cache_:
+        assert parser_cache_.get_size() == size
+
+
+def test_get_cache_key(archive_file):
+    xml_parser = pmc_tables.parsers.xml_parser
+    with zipfile.ZipFile(archive_file.as_posix()) as archive:
+        zip_info = archive.getinfo(XML_FILE.name)
+        key = get_cache_key(zip_info, xml_parser)
+        assert get_cache_key(archive.getinfo('info.json'), xml_parser) != key
+        with mock.patch.object(xml_parser, 'version', xml_parser.version + 1):
+            assert get_cache_key(zip_info, xml_parser) != key
+
+
+def test_extract_archive_tables_with_parser_cache(parser_cache, archive_file):
+    with zipfile.ZipFile(archive_file.as_posix()) as archive:
+        info = pmc_tables.read_archive_info(archive)
+        tables = pmc_tables.extract_archive_tables(archive, info, parser_cache=parser_cache)
+        assert parser_cache.num_misses == 1
+        with mock.patch('pmc_tables.parsers.xml.read_table_element',
+                        side_effect=AssertionError):
+            tables_ = pmc_tables.extract_archive_tables(archive, info, parser_cache=parser_cache)
+        assert parser_cache.num_hits == 1
+    assert info['status'] == 'success'
+    assert [t[0] for t in tables_] == [t[0] for t in tables]
+    assert [t[1] for t in tables_] == [t[1] for t in tables]
+    assert all(t[2].equals(t_[2]) for t, t_ in zip(tables, tables_))
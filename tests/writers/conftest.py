@@ -0,0 +1,20 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from pmc_tables.writers import ParquetStore, ShardedHDFStore
+
+
+@pytest.fixture(params=['hdf5', 'sharded', 'parquet'])
+def store(request, tmpdir):
+    """An empty store of every kind supported by the writers."""
+    path = Path(str(tmpdir))
+    if request.param == 'hdf5':
+        store = pd.HDFStore(path.joinpath('store.h5').as_posix(), 'w')
+    elif request.param == 'sharded':
+        store = ShardedHDFStore(path.joinpath('store'), num_shards=4)
+    else:
+        store = ParquetStore(path.joinpath('store'))
+    yield store
+    store.close()
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pmc_tables.writers import (read_hdf5_metadata, read_hdf5_table, read_hdf5_tables,
+                                write_hdf5_metadata, write_hdf5_table)
+
+DFS = [
+    pd.DataFrame([[1, 1.01, 'a'], [2, 2.02, 'b']], columns=['c1', 'c2', 'c3']),
+    pd.DataFrame({'n': [1.0, np.nan, 3.0], 'name': ['é', None, 'nan'], 'flag': [True, False, True]},
+                 index=[3, 5, 8]),
+    pd.DataFrame({'b': np.array([1, 2], dtype='int32'), 'a': ['x', 'y']}),
+    # Not converted by the batch reader itself
+    pd.DataFrame({'value': [1, 2]}, index=['r1', 'r2']),
+    pd.DataFrame({'date': pd.to_datetime(['2018-01-01', '2018-01-02'])}),
+]
+
+
+def test_read_hdf5_tables(store):
+    keys = []
+    for i, df in enumerate(DFS):
+        for j in range(3):
+            key = f'/PMC{j}/table-{i}'
+            write_hdf5_table(key, df, store)
+            write_hdf5_metadata(key, {'caption': f'Table {i}', 'table_idx': i}, store)
+            keys.append(key)
+    results = list(read_hdf5_tables(keys[::-1], store, num_threads=2, max_pending=4))
+    assert sorted(key for key, _, _ in results) == sorted(keys)
+    for key, metadata, df in results:
+        assert metadata == read_hdf5_metadata(key, store)
+        pd.testing.assert_frame_equal(df, read_hdf5_table(key, store))
+
+
+def test_read_hdf5_tables_indexed(tmpdir):
+    with pd.HDFStore(Path(str(tmpdir)).joinpath('store.h5').as_posix(), 'w') as store:
+        store.put('/PMC1/table-1', DFS[1], format='table', encoding='utf-8')
+        (key, metadata, df), = read_hdf5_tables(['PMC1/table-1'], store)
+        assert (key, metadata) == ('/PMC1/table-1', {})
+        pd.testing.assert_frame_equal(df, read_hdf5_table(key, store))
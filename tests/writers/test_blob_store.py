@@ -0,0 +1,100 @@
+import os.path as op
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import pmc_tables
+from pmc_tables.parsers import xml_parser
+from pmc_tables.utils import compress_to_b85
+from pmc_tables.writers import (BlobCompressor, TableBlobStore, compress_table_html,
+                                read_table_html, store_table_html)
+
+XML_FILE = Path(op.abspath(__file__)).parent.parent.joinpath('parsers', 'test_xml',
+                                                             'PMC0000001.nxml')
+
+
+def _get_table_html(i):
+    rows = ''.join(f'<tr><td>gene{i}_{j}</td><td>{i * j}</td><td>{j / 7:.3f}</td></tr>'
+                   for j in range(i % 20 + 1))
+    return (f'<table frame="hsides" rules="groups"><thead><tr><th>Gene</th><th>Count</th>'
+            f'<th>Frequency</th></tr></thead><tbody>{rows}</tbody></table>').encode('utf-8')
+
+
+@pytest.mark.parametrize('num_training_samples', [0, 100])
+def test_blob_store(num_training_samples, tmpdir):
+    blob_store_file = Path(str(tmpdir)).joinpath('store.h5.blobs.sqlite')
+    tables = [_get_table_html(i) for i in range(300)]
+    with TableBlobStore(blob_store_file, num_training_samples=num_training_samples) as store:
+        blob_hashes = [store.put(table) for table in tables]
+        # Blobs are deduplicated
+        assert store.put(tables[0]) == blob_hashes[0]
+        assert all(store.get(h) == table for h, table in zip(blob_hashes, tables))
+    with TableBlobStore(blob_store_file) as store:
+        assert all(store.get(h) == table for h, table in zip(blob_hashes, tables))
+        num_dictionaries, = store._conn.execute('SELECT count(*) FROM dictionaries').fetchone()
+        assert num_dictionaries == (1 if num_training_samples else 0)
+        with pytest.raises(KeyError):
+            store.get('missing')
+
+
+def test_blob_compressor(tmpdir):
+    blob_store_file = Path(str(tmpdir)).joinpath('store.h5.blobs.sqlite')
+    tables = [_get_table_html(i) for i in range(300)]
+    compressor = BlobCompressor(num_training_samples=100)
+    blobs = [compressor.compress(table) for table in tables]
+    dictionaries = compressor.pop_dictionaries()
+    assert len(dictionaries) == 1
+    assert blobs[-1].dict_id in dictionaries
+    assert compressor.pop_dictionaries() == {}
+    with TableBlobStore(blob_store_file) as store:
+        for dict_id, dict_data in dictionaries.items():
+            store.add_dictionary(dict_id, dict_data)
+        blob_hashes = [store.put_compressed(blob) for blob in blobs]
+        assert all(store.get(h) == table for h, table in zip(blob_hashes, tables))
+        # New compressors can use the dictionary of the store
+        dictionary = store.get_dictionary()
+        assert dictionary[0] == blobs[-1].dict_id
+    compressor = BlobCompressor(dictionary=dictionary)
+    assert compressor.compress(tables[0]).dict_id == dictionary[0]
+
+
+def test_store_table_html(tmpdir):
+    table_html = _get_table_html(1)
+    table_info = {'table_html': table_html}
+    store_table_html(table_info, None)
+    assert table_info['table_html'] == compress_to_b85(table_html).decode('ascii')
+    assert read_table_html(table_info) == table_html
+    with TableBlobStore(Path(str(tmpdir)).joinpath('blobs.sqlite')) as blob_store:
+        table_info = {'table_html': table_html}
+        store_table_html(table_info, blob_store)
+        assert 'table_html' not in table_info
+        assert read_table_html(table_info, blob_store) == table_html
+        # Markup compressed in advance
+        table_info = {'table_html': table_html}
+        compress_table_html(table_info, BlobCompressor())
+        store_table_html(table_info, blob_store)
+        assert read_table_html(table_info, blob_store) == table_html
+    table_info = {'table_html': table_html}
+    compress_table_html(table_info, None)
+    assert read_table_html(table_info) == table_html
+
+
+def test_write_archive_tables_with_blob_store(tmpdir):
+    tmpdir = Path(str(tmpdir))
+    tables = [(f'/PMC0000001{key}', table_info, table_df)
+              for key, table_info, table_df in xml_parser(XML_FILE)]
+    table_htmls = [table_info['table_html'] for _, table_info, _ in tables]
+    with pd.HDFStore(tmpdir.joinpath('store.h5').as_posix(), mode='w') as store, \
+            TableBlobStore(tmpdir.joinpath('store.h5.blobs.sqlite')) as blob_store:
+        pmc_tables.write_archive_tables(
+            tables, {'pmc_id': 'PMC0000001', 'status': 'success'}, store, blob_store=blob_store)
+        for (key, _, _), table_html in zip(tables, table_htmls):
+            table_info = pmc_tables.writers.read_hdf5_metadata(key, store)
+            assert 'table_html' not in table_info
+            assert read_table_html(table_info, blob_store) == table_html
+        # Blobs are committed before they are referenced, also when there is no ledger
+        with TableBlobStore(tmpdir.joinpath('store.h5.blobs.sqlite')) as blob_store_:
+            for key, _, _ in tables:
+                table_info = pmc_tables.writers.read_hdf5_metadata(key, store)
+                assert read_table_html(table_info, blob_store_)
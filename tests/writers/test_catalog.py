@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import pmc_tables
+from pmc_tables.writers import TableCatalog, read_catalog
+
+
+def _get_tables(pmc_id):
+    tables = [
+        (f'/{pmc_id}/file.nxml/T1-0',
+         {'label': 'Table 1', 'caption': 'Mutations in BRCA1', 'footer': '',
+          'orientation': 'portrait', 'parser_name': 'xml_parser', 'status': 'success'},
+         pd.DataFrame([[1, 1.01, 'a'], [2, 2.02, 'b']], columns=['c1', 'c2', 'c3'])),
+        (f'/{pmc_id}/file.csv/T2-0',
+         {'label': 'Table 2', 'parser_name': 'csv_parser', 'status': 'success'},
+         pd.DataFrame([['x', 'y']], columns=['c1', 'c2'])),
+    ]
+    info = {'pmc_id': pmc_id, 'status': 'success'}
+    return tables, info
+
+
+@pytest.fixture
+def store(tmpdir):
+    with pd.HDFStore(Path(str(tmpdir)).joinpath('store.h5').as_posix(), mode='w') as store:
+        yield store
+
+
+def test_catalog(store, tmpdir):
+    catalog_dir = Path(str(tmpdir)).joinpath('catalog')
+    with TableCatalog(catalog_dir, max_buffer_size=2) as catalog:
+        for pmc_id in ['PMC1', 'PMC2', 'PMC3']:
+            tables, info = _get_tables(pmc_id)
+            pmc_tables.write_archive_tables(tables, info, store, sinks=[catalog])
+    assert len(list(catalog_dir.glob('*.parquet'))) == 3
+
+    df = read_catalog(catalog_dir)
+    assert len(df) == 6
+    assert set(df['pmc_id']) == {'PMC1', 'PMC2', 'PMC3'}
+    row = df[df['key'] == '/PMC2/file.nxml/T1-0'].iloc[0]
+    assert (row['num_rows'], row['num_columns']) == (2, 3)
+    assert list(row['dtypes']) == [str(d) for d in store.get(row['key']).dtypes]
+    assert row['status'] == 'success'
+    assert list(row['fixers_applied']) == []
+
+    df = read_catalog(catalog_dir, columns=['key', 'caption'])
+    assert list(df.columns) == ['key', 'caption']
+    assert df['caption'].str.contains('BRCA1').sum() == 3
+
+
+def test_catalog_rewrite(store, tmpdir):
+    catalog_dir = Path(str(tmpdir)).joinpath('catalog')
+    tables, info = _get_tables('PMC1')
+    with TableCatalog(catalog_dir) as catalog:
+        pmc_tables.write_archive_tables(tables, info, store, sinks=[catalog])
+    tables[1][1]['status'] = 'error'
+    tables = [tables[0], (tables[1][0], tables[1][1], None)]
+    with TableCatalog(catalog_dir) as catalog:
+        pmc_tables.write_archive_tables(tables, info, store, overwrite=True, sinks=[catalog])
+    df = read_catalog(catalog_dir, columns=['key', 'status', 'num_rows'])
+    assert len(df) == 2
+    row = df[df['key'] == '/PMC1/file.csv/T2-0'].iloc[0]
+    assert row['status'] == 'error'
+    assert pd.isnull(row['num_rows'])
+
+
+def test_catalog_compact(store, tmpdir):
+    catalog_dir = Path(str(tmpdir)).joinpath('catalog')
+    with TableCatalog(catalog_dir, max_buffer_size=2) as catalog:
+        for pmc_id in ['PMC1', 'PMC2', 'PMC1']:
+            tables, info = _get_tables(pmc_id)
+            pmc_tables.write_archive_tables(tables, info, store, overwrite=True, sinks=[catalog])
+        columns = ['pmc_id', 'key', 'caption', 'num_rows']
+        df = read_catalog(catalog_dir, columns=columns)
+        catalog.compact()
+        assert [p.name for p in catalog_dir.glob('*.parquet')] == ['part-00002.parquet']
+        assert read_catalog(catalog_dir, columns=columns).equals(df)
+        # Rows written after compacting still take precedence
+        tables, info = _get_tables('PMC2')
+        tables[1][1]['status'] = 'error'
+        pmc_tables.write_archive_tables(tables, info, store, overwrite=True, sinks=[catalog])
+    df = read_catalog(catalog_dir, columns=['key', 'status'])
+    assert len(df) == 4
+    assert df.loc[df['key'] == '/PMC2/file.csv/T2-0', 'status'].tolist() == ['error']
+
+
+def test_read_empty_catalog(tmpdir):
+    df = read_catalog(Path(str(tmpdir)), columns=['key', 'caption'])
+    assert df.empty
+    assert list(df.columns) == ['key', 'caption']
@@ -0,0 +1,115 @@
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pmc_tables
+from pmc_tables.writers import CellTableWriter, get_table_cells, read_cell_table, search_cells
+
+
+def _get_tables(pmc_id):
+    tables = [
+        (f'/{pmc_id}/file.nxml/T1-0', {'status': 'success'},
+         pd.DataFrame([['BRAF', 'p.V600E', 0.51], ['KRAS', None, np.nan]],
+                      columns=['Gene', 'Mutation', 'VAF'])),
+        (f'/{pmc_id}/file.csv/T2-0', {'status': 'success'},
+         pd.DataFrame([[1, 'x']], columns=['c1', 'c2'])),
+        (f'/{pmc_id}/file.csv/T3-0', {'status': 'error'}, None),
+    ]
+    info = {'pmc_id': pmc_id, 'status': 'success'}
+    return tables, info
+
+
+@pytest.fixture
+def store(tmpdir):
+    with pd.HDFStore(Path(str(tmpdir)).joinpath('store.h5').as_posix(), mode='w') as store:
+        yield store
+
+
+def test_get_table_cells():
+    df = pd.DataFrame([['a', 1.5], [None, 2.0]], columns=[('h1', 'x'), ('h1', 'y')])
+    cells = get_table_cells('/PMC1/t', df)
+    assert list(cells.columns) == ['table_key', 'row', 'col', 'header_path', 'value_text',
+                                   'value_num']
+    assert cells[['row', 'col']].values.tolist() == [[0, 0], [0, 1], [1, 1]]
+    assert cells['header_path'].tolist() == ['h1 | x', 'h1 | y', 'h1 | y']
+    assert cells['value_text'].tolist() == ['a', '1.5', '2.0']
+    assert cells['value_num'].tolist()[1:] == [1.5, 2.0]
+    assert np.isnan(cells['value_num'][0])
+
+
+def test_cell_table(store, tmpdir):
+    cell_table_dir = Path(str(tmpdir)).joinpath('cells')
+    with CellTableWriter(cell_table_dir, max_buffer_size=10) as cell_table:
+        for pmc_id in ['PMC1201', 'PMC1202', 'PMC3301']:
+            tables, info = _get_tables(pmc_id)
+            pmc_tables.write_archive_tables(tables, info, store, sinks=[cell_table])
+    assert {p.name for p in cell_table_dir.iterdir()} == {'pmc_prefix=PMC12', 'pmc_prefix=PMC33'}
+
+    df = read_cell_table(cell_table_dir)
+    assert len(df) == 3 * 6
+    assert set(df['pmc_prefix']) == {'PMC12', 'PMC33'}
+
+    df = read_cell_table(cell_table_dir, columns=['table_key', 'value_num'],
+                         filters=[('pmc_prefix', '=', 'PMC33'), ('value_num', '>', 0.5)])
+    assert df.values.tolist() == [['/PMC3301/file.csv/T2-0', 1.0],
+                                  ['/PMC3301/file.nxml/T1-0', 0.51]]
+
+    df = read_cell_table(cell_table_dir, columns=['table_key'],
+                         filters=[[('value_text', 'in', ['BRAF', 'KRAS'])],
+                                  [('pmc_prefix', '=', 'PMC12'), ('col', '=', 1)]])
+    assert list(df.columns) == ['table_key']
+    assert len(df) == 3 * 2 + 2 * 2
+
+    df = search_cells(cell_table_dir, r'p\.v\d+e', flags=re.IGNORECASE)
+    assert sorted(df['table_key']) == [f'/{pmc_id}/file.nxml/T1-0'
+                                       for pmc_id in ['PMC1201', 'PMC1202', 'PMC3301']]
+    assert set(df['header_path']) == {'Mutation'}
+
+
+def test_cell_table_rewrite_and_compact(store, tmpdir):
+    cell_table_dir = Path(str(tmpdir)).joinpath('cells')
+    with CellTableWriter(cell_table_dir) as cell_table:
+        for pmc_id in ['PMC1201', 'PMC1202']:
+            tables, info = _get_tables(pmc_id)
+            pmc_tables.write_archive_tables(tables, info, store, sinks=[cell_table])
+        cell_table.flush()
+        # Write the first archive again, once before and once after flushing
+        tables, info = _get_tables('PMC1201')
+        tables[0][2].iloc[0, 1] = 'p.V600K'
+        for _ in range(2):
+            pmc_tables.write_archive_tables(tables, info, store, sinks=[cell_table])
+        cell_table.flush()
+        pmc_tables.write_archive_tables(tables, info, store, sinks=[cell_table])
+        cell_table.flush()
+        partition_dir = cell_table_dir.joinpath('pmc_prefix=PMC12')
+        assert len(list(partition_dir.glob('part-*.parquet'))) == 3
+        cells = read_cell_table(cell_table_dir)
+        assert len(cells) == 2 * 6
+        assert list(cells.columns) == ['table_key', 'row', 'col', 'header_path', 'value_text',
+                                       'value_num', 'pmc_prefix']
+        # The cells of earlier writes are not returned
+        df = search_cells(cell_table_dir, r'p\.V600')
+        assert sorted(df['value_text']) == ['p.V600E', 'p.V600K']
+        assert df.loc[df['value_text'] == 'p.V600K', 'table_key'].tolist() == [
+            '/PMC1201/file.nxml/T1-0']
+
+        cell_table.compact()
+        assert [p.name for p in partition_dir.glob('part-*.parquet')] == ['part-00002.parquet']
+        columns = ['table_key', 'row', 'col', 'value_text']
+        assert sorted(read_cell_table(cell_table_dir, columns=columns).values.tolist()) == \
+            sorted(cells[columns].values.tolist())
+        assert len(search_cells(cell_table_dir, r'p\.V600')) == 2
+        # Writes after compacting still take precedence
+        tables[0][2].iloc[0, 1] = 'p.V600D'
+        pmc_tables.write_archive_tables(tables, info, store, sinks=[cell_table])
+    df = search_cells(cell_table_dir, r'p\.V600')
+    assert sorted(df['value_text']) == ['p.V600D', 'p.V600E']
+
+
+def test_read_empty_cell_table(tmpdir):
+    df = read_cell_table(Path(str(tmpdir)), columns=['table_key', 'value_text'])
+    assert df.empty
+    assert list(df.columns) == ['table_key', 'value_text']
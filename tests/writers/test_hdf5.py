@@ -5,6 +5,7 @@ from pathlib import Path
 import pandas as pd
 import pytest
 
+from pmc_tables.errors import ReservedAttributeError
 from pmc_tables.writers import (read_hdf5_metadata, read_hdf5_table, write_hdf5_metadata,
                                 write_hdf5_table)
 
@@ -54,3 +55,17 @@ def test_hdf5_table_and_metadata_2(df, metadata, store):
     assert metadata == metadata_
     df_ = read_hdf5_table('df_1', store)
     assert df.equals(df_)
+
+
+def test_hdf5_metadata_reserved_attribute(store):
+    with pytest.raises(ReservedAttributeError):
+        write_hdf5_metadata('metadata_1', {'attr1': 100, 'CLASS': 'GROUP'}, store)
+    assert store.get_node('metadata_1') is None
+
+
+@pytest.mark.parametrize("metadata", METADATAS)
+def test_hdf5_metadata_update(metadata, store):
+    write_hdf5_metadata('/group/metadata_1', metadata, store)
+    write_hdf5_metadata('/group/metadata_1', {'attr1': 200, 'attr3': ['a', 'b']}, store)
+    metadata_ = read_hdf5_metadata('/group/metadata_1', store)
+    assert metadata_ == {**metadata, 'attr1': 200, 'attr3': ['a', 'b']}
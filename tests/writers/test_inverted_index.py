@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from pmc_tables.writers import InvertedIndex, InvertedIndexWriter, tokenize_text
+
+TABLES = [
+    ('/PMC1/file.nxml/T1-0',
+     {'caption': 'Mutations in BRCA1 and TP53.', 'footer': 'WT, wild type'},
+     pd.DataFrame([['BRCA1', 'c.68_69delAG', 0.1], ['TP53', 'p.R175H', 0.2]],
+                  columns=['Gene', 'Mutation', 'Frequency'])),
+    ('/PMC1/file.nxml/T2-0',
+     {'caption': 'Patient characteristics', 'footer': ''},
+     pd.DataFrame([['Age', 52], ['Sex', 'F']], columns=['Characteristic', 'Value'])),
+    ('/PMC2/file.nxml/T1-0',
+     {'caption': 'Genes', 'footer': ''},
+     pd.DataFrame([['KRAS', 'G12D'], ['tp53', 'R175H']], columns=['Gene', 'Mutation'])),
+    ('/PMC3/file.nxml/T1-0', {'caption': 'Failed table (TP53)', 'footer': ''}, None),
+]
+
+
+@pytest.mark.parametrize("text, terms", [
+    ('Mutations in BRCA1 and TP53.', {'mutations', 'in', 'brca1', 'and', 'tp53'}),
+    ('p.R175H, c.68_69delAG (1.5%)', {'p.r175h', 'c.68_69delag'}),
+    ('12 0.05 1-2', set()),
+])
+def test_tokenize_text(text, terms):
+    assert tokenize_text(text) == terms
+
+
+@pytest.mark.parametrize("max_buffer_size", [1, 100])
+def test_inverted_index(max_buffer_size, tmpdir):
+    index_dir = Path(str(tmpdir)).joinpath('index')
+    with InvertedIndexWriter(index_dir, max_buffer_size=max_buffer_size) as writer:
+        writer.add_archive(TABLES[:2], {'pmc_id': 'PMC1'})
+        writer.add_archive(TABLES[2:3], {'pmc_id': 'PMC2'})
+        writer.add_archive(TABLES[3:], {'pmc_id': 'PMC3'})
+
+    index = InvertedIndex(index_dir)
+    results = index.lookup(['TP53', 'brca1', 'R175H', 'frequency', 'wild', 'EGFR'])
+    assert results == {
+        'tp53': {'/PMC1/file.nxml/T1-0', '/PMC2/file.nxml/T1-0', '/PMC3/file.nxml/T1-0'},
+        'brca1': {'/PMC1/file.nxml/T1-0'},
+        'r175h': {'/PMC2/file.nxml/T1-0'},
+        'frequency': {'/PMC1/file.nxml/T1-0'},
+        'wild': {'/PMC1/file.nxml/T1-0'},
+    }
+    assert index.search(['KRAS', 'sex']) == {'/PMC1/file.nxml/T2-0', '/PMC2/file.nxml/T1-0'}
+    assert index.search(['EGFR']) == set()
+
+
+def test_inverted_index_compact(tmpdir):
+    index_dir = Path(str(tmpdir)).joinpath('index')
+    with InvertedIndexWriter(index_dir, max_buffer_size=1) as writer:
+        writer.add_archive(TABLES[:2], {'pmc_id': 'PMC1'})
+        writer.add_archive(TABLES[2:3], {'pmc_id': 'PMC2'})
+        # The second version of the table no longer mentions BRCA1
+        writer.add_archive([(TABLES[0][0], {'caption': 'Mutations in TP53'}, None)],
+                           {'pmc_id': 'PMC1'})
+        assert InvertedIndex(index_dir).search(['BRCA1']) == {'/PMC1/file.nxml/T1-0'}
+        writer.compact()
+        assert [p.name for p in index_dir.glob('segment-*')] == ['segment-00003']
+        index = InvertedIndex(index_dir)
+        assert index.search(['BRCA1']) == set()
+        assert index.lookup(['TP53', 'sex', 'kras']) == {
+            'tp53': {'/PMC1/file.nxml/T1-0', '/PMC2/file.nxml/T1-0'},
+            'sex': {'/PMC1/file.nxml/T2-0'},
+            'kras': {'/PMC2/file.nxml/T1-0'},
+        }
+        # Segments written after compacting are numbered after the merged segment
+        writer.add_archive(TABLES[3:], {'pmc_id': 'PMC3'})
+    assert sorted(p.name for p in index_dir.glob('segment-*')) == [
+        'segment-00003', 'segment-00004']
+    assert len(InvertedIndex(index_dir).search(['TP53'])) == 3
+
+
+def test_empty_inverted_index(tmpdir):
+    assert InvertedIndex(Path(str(tmpdir))).search(['TP53']) == set()
@@ -0,0 +1,119 @@
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import pmc_tables
+from pmc_tables.writers import (ParquetStore, delete_hdf5_node, read_hdf5_metadata, read_hdf5_table,
+                                write_hdf5_metadata, write_hdf5_table)
+
+ARCHIVE_FILE = Path(__file__).resolve().parent.parent.joinpath(
+    'loaders', 'test_pmc', 'output', '00', '0a', 'PMC2203987.zip')
+
+DFS = [
+    pd.DataFrame([[1, 1.01, 'a'], [2, 2.02, 'b']], columns=['c1', 'c2', 'c3']),
+    pd.DataFrame([[1.0, 'a'], [np.nan, None], [3.0, 'c']], columns=['n', 'name']),
+    pd.DataFrame([[1, 'a'], [2, 'b']], columns=['x', 'x'], index=[3, 5]),
+]
+
+
+@pytest.fixture
+def store(tmpdir):
+    with ParquetStore(Path(str(tmpdir)).joinpath('store')) as store:
+        yield store
+
+
+@pytest.mark.parametrize("df", DFS)
+def test_parquet_table(df, store):
+    write_hdf5_table('/PMC1/df_1', df, store)
+    assert read_hdf5_table('/PMC1/df_1', store).equals(df)
+    store.close()
+    with ParquetStore(store.path, mode='r') as store_:
+        df_ = read_hdf5_table('/PMC1/df_1', store_)
+        assert df_.equals(df)
+        assert list(df_.columns) == list(df.columns)
+
+
+def test_parquet_packs_tables(store):
+    for i in range(10):
+        write_hdf5_table(f'/PMC{i}/t1', DFS[0], store)
+        write_hdf5_table(f'/PMC{i}/t2', DFS[1], store)
+    store.flush()
+    parquet_files = sorted(store.path.glob('schema=*/*.parquet'))
+    assert len(parquet_files) == 2
+    for parquet_file in parquet_files:
+        assert pq.ParquetFile(parquet_file.as_posix()).num_row_groups == 10
+    # Integer columns with missing values are stored as integers
+    schemas = {str(pq.read_schema(f.as_posix()).field('c1').type) for f in parquet_files}
+    assert 'int64' in schemas
+    assert len(store) == 20
+
+
+def test_parquet_read_row_groups(store):
+    for i in range(3):
+        write_hdf5_table(f'/PMC{i}/t1', DFS[0], store)
+        write_hdf5_table(f'/PMC{i}/t2', DFS[1], store)
+    write_hdf5_table('/PMC3/t1', DFS[0].iloc[:0], store)
+    keys = ['/PMC2/t1', '/PMC1/t2', '/PMC3/t1', '/PMC0/t1']
+    results = list(store.read_row_groups(keys))
+    assert sorted(record['key'] for record, _ in results) == sorted(keys)
+    for record, row_group in results:
+        if record['key'] == '/PMC3/t1':
+            assert row_group is None
+        else:
+            assert row_group.num_rows == store.get_shape(record['key'])[0]
+    with pytest.raises(KeyError):
+        list(store.read_row_groups(['/PMC9/t1']))
+
+
+def test_parquet_index_segments(store):
+    write_hdf5_table('/PMC1/t1', DFS[0], store)
+    write_hdf5_table('/PMC2/t1', DFS[1], store)
+    store.flush()
+    write_hdf5_metadata('/PMC1/t1', {'caption': 'Table 1'}, store)
+    delete_hdf5_node('/PMC2', store)
+    store.flush()
+    # Only the changes are written when flushing
+    segment_files = sorted(p.name for p in store.path.glob('_index-*.parquet'))
+    assert segment_files == ['_index-00001.parquet', '_index-00002.parquet']
+    assert pq.read_table(store.path.joinpath(segment_files[1]).as_posix()).num_rows == 2
+    assert not store.path.joinpath('_index.parquet').exists()
+    with ParquetStore(store.path, mode='r') as store_:
+        assert store_.keys() == ['/PMC1/t1']
+        assert read_hdf5_metadata('/PMC1/t1', store_) == {'caption': 'Table 1'}
+    # Segments are merged when the store is closed
+    store.close()
+    assert not list(store.path.glob('_index-*.parquet'))
+    with ParquetStore(store.path, mode='r') as store_:
+        assert store_.keys() == ['/PMC1/t1']
+        assert read_hdf5_table('/PMC1/t1', store_).equals(DFS[0])
+        assert read_hdf5_metadata('/PMC1/t1', store_) == {'caption': 'Table 1'}
+
+
+def test_parquet_metadata_and_delete(store):
+    metadata = {'attr1': 100, 'attr2': 'some test', 'fixers_applied': ['fix_column_names']}
+    write_hdf5_table('/PMC1/t1', DFS[0], store)
+    write_hdf5_metadata('/PMC1/t1', metadata, store)
+    write_hdf5_metadata('/PMC1', {'pmc_id': 'PMC1'}, store)
+    assert read_hdf5_metadata('/PMC1/t1', store) == metadata
+    assert delete_hdf5_node('/PMC1', store)
+    assert '/PMC1/t1' not in store
+    assert store.get_node('/PMC1') is None
+
+
+def test_save_archive_to_parquet_store(tmpdir):
+    tmpdir = Path(str(tmpdir))
+    with zipfile.ZipFile(ARCHIVE_FILE) as archive, \
+            pd.HDFStore(tmpdir.joinpath('store.h5').as_posix(), mode='w') as store, \
+            ParquetStore(tmpdir.joinpath('parquet')) as parquet_store:
+        info = pmc_tables.save_archive_to_hdf5(archive, store)
+        pmc_tables.save_archive_to_hdf5(archive, parquet_store)
+        # Archives which have already been written are skipped
+        assert pmc_tables.save_archive_to_hdf5(archive, parquet_store) is None
+        assert read_hdf5_metadata(f"/{info['pmc_id']}", parquet_store)['status'] == 'success'
+        assert sorted(store.keys()) == parquet_store.keys()
+        for key in store.keys():
+            assert store.get(key).equals(parquet_store.get(key))
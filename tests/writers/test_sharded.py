@@ -0,0 +1,78 @@
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import pmc_tables
+from pmc_tables.writers import (ShardedHDFStore, delete_hdf5_node, get_shard_id, read_hdf5_metadata,
+                                read_hdf5_table, write_hdf5_metadata, write_hdf5_table)
+
+ARCHIVE_FILE = Path(__file__).resolve().parent.parent.joinpath(
+    'loaders', 'test_pmc', 'output', '00', '0a', 'PMC2203987.zip')
+
+DF = pd.DataFrame([[1, 1.01, 'a'], [2, 2.02, 'b']], columns=['c1', 'c2', 'c3'])
+
+
+@pytest.fixture
+def store(tmpdir):
+    with ShardedHDFStore(Path(str(tmpdir)).joinpath('store'), num_shards=4) as store:
+        yield store
+
+
+@pytest.mark.parametrize("key, num_shards", [('/PMC1/1', 4), ('/PMC1/1', 1), ('PMC1', 16)])
+def test_get_shard_id(key, num_shards):
+    shard_id = get_shard_id(key, num_shards)
+    assert 0 <= shard_id < num_shards
+    assert shard_id == get_shard_id('/PMC1/table-2', num_shards)
+
+
+def test_sharded_table_and_metadata(store):
+    metadata = {'attr1': 100, 'attr2': 'some test'}
+    for i in range(8):
+        write_hdf5_table(f'/PMC{i}/t1', DF, store)
+        write_hdf5_metadata(f'/PMC{i}', metadata, store)
+    assert len(store) == 8
+    assert store.keys() == sorted(f'/PMC{i}/t1' for i in range(8))
+    assert store.get_shape('/PMC3/t1') == DF.shape
+    for i in range(8):
+        assert read_hdf5_table(f'/PMC{i}/t1', store).equals(DF)
+        assert read_hdf5_metadata(f'/PMC{i}', store) == metadata
+    assert len({f.name for f in store.path.glob('shard-*.h5')}) > 1
+
+
+def test_sharded_reopen_and_delete(store):
+    write_hdf5_table('/PMC1/t1', DF, store)
+    store.close()
+    with pytest.raises(ValueError):
+        ShardedHDFStore(store.path, num_shards=2)
+    with ShardedHDFStore(store.path) as store_:
+        assert store_.num_shards == 4
+        assert '/PMC1/t1' in store_
+        assert delete_hdf5_node('/PMC1', store_)
+        assert '/PMC1/t1' not in store_
+        assert not delete_hdf5_node('/PMC1', store_)
+        with pytest.raises(KeyError):
+            store_.get('/PMC1/t1')
+
+
+def test_sharded_delete_special_characters(store):
+    for key in ['/PMC1/a_b/t1', '/PMC1/axb/t1', '/PMC1/a_b0/t1']:
+        write_hdf5_table(key, DF, store)
+    # `_` is not a wildcard, and only children of the node are removed
+    assert delete_hdf5_node('/PMC1/a_b', store)
+    assert store.keys() == ['/PMC1/a_b0/t1', '/PMC1/axb/t1']
+
+
+def test_save_archive_to_sharded_store(tmpdir):
+    tmpdir = Path(str(tmpdir))
+    with zipfile.ZipFile(ARCHIVE_FILE) as archive, \
+            pd.HDFStore(tmpdir.joinpath('store.h5').as_posix(), mode='w') as store, \
+            ShardedHDFStore(tmpdir.joinpath('sharded'), num_shards=2) as sharded_store:
+        info = pmc_tables.save_archive_to_hdf5(archive, store)
+        pmc_tables.save_archive_to_hdf5(archive, sharded_store)
+        pmc_id = f"/{info['pmc_id']}"
+        assert read_hdf5_metadata(pmc_id, store) == read_hdf5_metadata(pmc_id, sharded_store)
+        assert sorted(store.keys()) == sharded_store.keys()
+        for key in store.keys():
+            assert store.get(key).equals(sharded_store.get(key))
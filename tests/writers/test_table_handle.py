@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from pmc_tables.writers import (FrameCache, ParquetStore, TableHandle, iter_table_handles,
+                                write_hdf5_metadata, write_hdf5_table)
+
+DF = pd.DataFrame({'c1': range(10), 'c2': [i / 10 for i in range(10)]})
+
+METADATA = {'attr1': 100, 'attr2': 'some test'}
+
+
+@pytest.fixture
+def tables(store):
+    """Write three copies of `DF` to the shared `store`."""
+    for i in range(3):
+        write_hdf5_table(f'/PMC{i}/t1', DF, store)
+        write_hdf5_metadata(f'/PMC{i}/t1', METADATA, store)
+
+
+@pytest.mark.usefixtures('tables')
+def test_table_handle(store):
+    handle = TableHandle(store, 'PMC1/t1', FrameCache())
+    assert handle.key == '/PMC1/t1'
+    assert handle.shape == DF.shape
+    assert handle.columns == list(DF.columns)
+    assert handle.get_metadata('attr1') == 100
+    assert handle.get_metadata('missing') is None
+    assert handle.metadata == METADATA
+    assert handle.read().equals(DF)
+    assert handle.read(columns=['c2'], start=2, stop=5).equals(DF[['c2']].iloc[2:5])
+
+
+@pytest.mark.usefixtures('tables')
+def test_table_handle_where(store):
+    handle = TableHandle(store, '/PMC0/t1', FrameCache())
+    if isinstance(store, ParquetStore):
+        with pytest.raises(ValueError):
+            handle.read(where='index >= 5')
+    else:
+        assert handle.read(where='index >= 5').equals(DF.iloc[5:])
+
+
+@pytest.mark.usefixtures('tables')
+def test_iter_table_handles(store):
+    handles = list(iter_table_handles(store, '/PMC1'))
+    assert [handle.key for handle in handles] == ['/PMC1/t1']
+    assert len(list(iter_table_handles(store))) == 3
+
+
+@pytest.mark.usefixtures('tables')
+def test_frame_cache(store):
+    cache = FrameCache()
+    handle = TableHandle(store, '/PMC0/t1', cache)
+    df = handle.read(columns=['c1'])
+    assert handle.read(columns=['c1']) is df
+    assert (cache.num_hits, cache.num_misses) == (1, 1)
+    handle.read(columns=['c2'])
+    assert len(cache) == 2
+    # Make room for two DataFrames only, and evict the least recently used one
+    cache.max_size = cache.size
+    handle.read(columns=['c1'])
+    handle.read(columns=['c1'], stop=10)
+    assert len(cache) == 2
+    assert cache.size <= cache.max_size
+    num_misses = cache.num_misses
+    handle.read(columns=['c1'])
+    handle.read(columns=['c2'])
+    assert cache.num_misses == num_misses + 1
+
+
+def test_frame_cache_counts_strings():
+    cache = FrameCache(max_size=100_000)
+    df = pd.DataFrame({'text': ['x' * 1000] * 1000})
+    # The strings alone take up more than `max_size`
+    cache.put(('t', ), df)
+    assert len(cache) == 0
+    cache.put(('t', ), df.iloc[:10])
+    assert cache.size > 10 * 1000